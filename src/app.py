@@ -1,49 +1,284 @@
-import uvicorn
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import uuid
+from functools import cache
+
 from starlette.applications import Starlette
-from starlette.responses import HTMLResponse
+from starlette.responses import PlainTextResponse
 from starlette.routing import Route, WebSocketRoute
 from starlette.staticfiles import StaticFiles
 from starlette.websockets import WebSocket
 
-from langchain_openai_voice import OpenAIVoiceReactAgent
-from server.utils import websocket_stream
+from config import (
+    BRANDS,
+    DEBUG,
+    DRAIN_TIMEOUT,
+    EVENT_LOG_DIR,
+    EVENT_LOG_FORMAT,
+    LOG_LEVEL,
+    MODEL,
+    OPENAI_REALTIME_URL,
+    PORT,
+    RECORD_CALLS,
+    SPECULATIVE_TOOLS,
+    UPSTREAM_POOL_SIZE,
+    WORKERS,
+    brand_name,
+)
+from langchain_openai_voice import DEFAULT_URL, OpenAIVoiceReactAgent
+from langchain_openai_voice.metrics import REGISTRY
+from langchain_openai_voice.pool import RealtimeConnectionPool
+from langchain_openai_voice.session import SESSION_TEMPLATES
+from server.codecs import CODEC_PARAMS, BrowserAudio
+from server.event_log import EventLog
 from server.prompt import INSTRUCTIONS
-from server.tools import TOOLS
+from server.recorder import CallRecorder
+from server.save_recording import RECORDINGS_DIR, recording_status, save_recording
+from server.serving import (
+    ADMITTED_EVENT,
+    CALLS,
+    QUEUED_EVENT,
+    REJECTED_EVENT,
+    TRY_AGAIN_LATER,
+    WORKER_METRICS_ENV,
+    WorkerMetrics,
+    serve,
+)
+from server.tools import TOOL_CACHE, TOOLS, serper_api
+from server.utils import CachedPage, configure_logging, websocket_stream
+from server.vad import preload_vad
 
-from server.save_recording import save_recording
+configure_logging(LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
-brand_name = "Tesla"
+EVENT_LOG = EventLog(EVENT_LOG_DIR, EVENT_LOG_FORMAT) if EVENT_LOG_FORMAT else None
 
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-  
-    instructions = INSTRUCTIONS.replace("{MARKA_ADI}", brand_name)
+# serve() birden çok worker başlattıysa /metrics hepsinin sayaçlarını döndürür
+WORKER_METRICS = (
+    WorkerMetrics(REGISTRY, os.environ[WORKER_METRICS_ENV])
+    if os.getenv(WORKER_METRICS_ENV)
+    else None
+)
+
+UPSTREAM_POOL = (
+    RealtimeConnectionPool(size=UPSTREAM_POOL_SIZE) if UPSTREAM_POOL_SIZE else None
+)
+
+REGISTRY.read_counter(
+    "voice_tool_cache_hits_total", "Tool calls answered from the cache.",
+    lambda: TOOL_CACHE.hits,
+)
+REGISTRY.read_counter(
+    "voice_tool_cache_misses_total", "Tool calls the cache had to make upstream.",
+    lambda: TOOL_CACHE.misses,
+)
+REGISTRY.gauge(
+    "voice_calls_active", "Calls in progress on this worker.", lambda: CALLS.active
+)
+REGISTRY.read_counter(
+    "voice_calls_rejected_total",
+    "Calls turned away because this worker was full, overloaded or draining.",
+    lambda: CALLS.rejections,
+    label="reason",
+)
+REGISTRY.read_counter(
+    "voice_calls_admitted_total", "Calls admitted on this worker.",
+    lambda: CALLS.admitted,
+)
+REGISTRY.read_counter(
+    "voice_calls_queued_total", "Calls that waited for a free slot.",
+    lambda: CALLS.queued,
+)
+REGISTRY.gauge(
+    "voice_calls_waiting", "Calls waiting for a free slot now.", lambda: CALLS.waiting
+)
+REGISTRY.gauge(
+    "voice_event_loop_lag_seconds",
+    "Smoothed event loop lag used to shed new calls.",
+    lambda: CALLS.loop_lag,
+)
+if EVENT_LOG is not None:
+    REGISTRY.gauge(
+        "voice_event_log_written", "Session events written to the event log.",
+        lambda: EVENT_LOG.written,
+    )
+    REGISTRY.gauge(
+        "voice_event_log_dropped",
+        "Session events dropped because the event log fell behind.",
+        lambda: EVENT_LOG.dropped,
+    )
+if UPSTREAM_POOL is not None:
+    REGISTRY.gauge(
+        "voice_upstream_pool_idle",
+        "Idle pre-warmed upstream connections.",
+        UPSTREAM_POOL.idle_count,
+    )
+    REGISTRY.gauge(
+        "voice_upstream_pool_hits", "Calls served by a warm connection.",
+        lambda: UPSTREAM_POOL.hits,
+    )
 
-    browser_receive_stream = websocket_stream(websocket)
-    
-    agent = OpenAIVoiceReactAgent(
-        model="gpt-4o-realtime-preview",
+
+@cache
+def agent_for(brand: str) -> OpenAIVoiceReactAgent:
+    """Marka başına bir kez kurulan ajan; session.update çerçevesi de bir kez üretilir."""
+    instructions = INSTRUCTIONS.replace("{MARKA_ADI}", brand)
+    return OpenAIVoiceReactAgent(
+        model=MODEL,
+        url=OPENAI_REALTIME_URL or DEFAULT_URL,
         tools=TOOLS,
+        tool_cache=TOOL_CACHE,
+        speculative_tools=SPECULATIVE_TOOLS,
+        connection_pool=UPSTREAM_POOL,
         instructions=instructions,
-        temperature=0.1,  
+        session_template=SESSION_TEMPLATES.get(
+            model=MODEL, instructions=instructions, tools=TOOLS
+        ),
+        temperature=0.1,
     )
 
-    await agent.aconnect(browser_receive_stream, websocket.send_text)
+
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    brand = websocket.query_params.get("brand", brand_name)
+    if brand not in BRANDS:
+        await websocket.close(code=1008, reason="unknown brand")
+        return
+
+    queued = False
+
+    async def on_queued(position: int) -> None:
+        nonlocal queued
+        queued = True
+        message = {"type": QUEUED_EVENT, "position": position}
+        await websocket.send_text(json.dumps(message))
+
+    reason = await CALLS.acquire(on_queued)
+    if reason is not None:
+        # bu worker dolu, aşırı yüklü ya da kapanıyor; tarayıcıya ne zaman
+        # yeniden deneyeceği söylenir, kuyrukta beklerken ayrılmış olabilir
+        rejection = {
+            "type": REJECTED_EVENT,
+            "reason": reason,
+            "retry_after": CALLS.retry_after_s(reason),
+        }
+        with contextlib.suppress(Exception):
+            await websocket.send_text(json.dumps(rejection))
+            await websocket.close(code=TRY_AGAIN_LATER, reason=reason)
+        return
+
+    try:
+        if queued:
+            await websocket.send_text(json.dumps({"type": ADMITTED_EVENT}))
+        # tarayıcı ?codec=pcmu ile (ya da ilk mesajda session.codec ile) ikili ses
+        # çerçevelerinin kodeğini seçer; onay gelene kadar ikili ses göndermez
+        codec_request = {
+            name: websocket.query_params[name]
+            for name in CODEC_PARAMS
+            if name in websocket.query_params
+        }
+        browser_audio = BrowserAudio(codec_request or None)
+        if codec_request:
+            # onay, ilk çerçeve okunmadan gider
+            await websocket.send_text(browser_audio.accepted_event())
+        browser_receive_stream = browser_audio.decoded(
+            websocket_stream(websocket), websocket.send_text
+        )
+        agent = agent_for(brand)
+
+        # ?audio=binary: mic and speaker PCM travel as binary websocket messages
+        binary_audio = websocket.query_params.get("audio") == "binary"
+
+        async def send_output_chunk(chunk: str | bytes) -> None:
+            if isinstance(chunk, bytes):
+                for frame in browser_audio.encode(chunk):
+                    await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(chunk)
+
+        session_id = uuid.uuid4().hex
+        recorder = CallRecorder(session_id, RECORDINGS_DIR) if RECORD_CALLS else None
+        if recorder is not None:
+            # tarayıcıya kaydın sunucuda tutulduğunu bildiriyoruz, ayrıca yüklemesin
+            await websocket.send_text(
+                json.dumps({"type": "recording.started", "session_id": session_id})
+            )
+
+        async with recorder or contextlib.nullcontext():
+            await agent.aconnect(
+                browser_receive_stream,
+                send_output_chunk,
+                binary_audio=binary_audio,
+                recorder=recorder,
+                events=EVENT_LOG.session(session_id) if EVENT_LOG is not None else None,
+            )
+    finally:
+        CALLS.release()
+
+
+INDEX_PAGE = CachedPage("src/server/static/index.html")
+
 
 async def homepage(request):
-    with open("src/server/static/index.html") as f:
-        html = f.read()
-    return HTMLResponse(html)
+    return INDEX_PAGE.response(request)
+
+
+async def metrics(request):
+    text = await WORKER_METRICS.render() if WORKER_METRICS else REGISTRY.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
 
 
 routes = [
     Route("/", homepage),
     WebSocketRoute("/ws", websocket_endpoint),
     Route("/save_recording", save_recording, methods=["POST"]),
+    Route("/save_recording/{job_id}", recording_status),
+    Route("/metrics", metrics),
 ]
 
-app = Starlette(debug=True, routes=routes)
+
+
+def preload() -> None:
+    # ilk görüşmenin ihtiyaç duyduğu ağır modüller (webrtcvad, langchain_community)
+    # içe aktarılırken yüklenmez; worker bağlantı kabul ederken arka planda yüklenir
+    preload_vad()
+    try:
+        serper_api()
+    except (ImportError, ValueError) as e:
+        # anahtar eksikse ya da langchain_community kurulu değilse arama hata verir
+        logger.warning("serper aracı hazırlanamadı: %s", e)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    preloading = asyncio.create_task(asyncio.to_thread(preload))
+    publishing = (
+        asyncio.create_task(WORKER_METRICS.run()) if WORKER_METRICS else None
+    )
+    # olay günlüğünün yazıcı görevi worker'ın olay döngüsünde çalışır
+    async with EVENT_LOG or contextlib.nullcontext():
+        yield
+    await preloading
+    if UPSTREAM_POOL is not None:
+        # havuzda bekleyen hazır bağlantılar kapatılır
+        await UPSTREAM_POOL.aclose()
+    if publishing is not None:
+        publishing.cancel()
+        await asyncio.gather(publishing, return_exceptions=True)
+
+
+app = Starlette(debug=DEBUG, routes=routes, lifespan=lifespan)
 app.mount("/", StaticFiles(directory="src/server/static"), name="static")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=3000)
+    serve(
+        "app:app",
+        host="0.0.0.0",
+        port=PORT,
+        workers=WORKERS,
+        drain_timeout=DRAIN_TIMEOUT,
+        log_level=LOG_LEVEL.lower(),
+    )
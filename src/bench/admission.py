@@ -0,0 +1,149 @@
+"""
+Admission control under a burst of calls larger than a worker takes.
+
+Starts app.py against the local Realtime stand-in with a small
+MAX_CALLS_PER_WORKER and waiting queue, then connects --clients simulated
+browsers within --ramp seconds. Calls beyond the limit wait in the queue
+for a slot, and are turned away with a session.rejected message and close
+code 1013 once the queue is full, their wait times out, or the event loop
+lags more than --max-loop-lag-ms. Reports:
+
+- admitted, queued and rejected calls, rejections by reason, and the
+  retry_after the server asked for
+- first-audio latency of the admitted calls, which should stay within
+  --slo-ms of the script's response delay however large the burst
+- the admission counters from the server's /metrics
+
+Exits non-zero when a client failed for any other reason or the admitted
+calls' first-audio p99 is over the SLO.
+
+    python -m bench.admission --clients 40 --max-calls 10 --max-waiting 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import urllib.request
+
+from bench.audio import load_pcm, wav_paths
+from bench.fake_realtime import (
+    FakeRealtimeServer,
+    add_script_arguments,
+    script_from_args,
+)
+from bench.loadtest import REPO_ROOT, ClientResult, percentile_ms, run_client, start_app
+
+METRIC_PREFIXES = ("voice_calls_", "voice_event_loop_lag_seconds")
+
+
+def scrape(port: int) -> dict[str, float]:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        text = response.read().decode()
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith(METRIC_PREFIXES):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+async def run(args: argparse.Namespace) -> dict:
+    pcms = [load_pcm(path) for path in wav_paths(args.audio)]
+    results = [ClientResult() for _ in range(args.clients)]
+
+    async with FakeRealtimeServer(script_from_args(args)) as upstream:
+        process = start_app(
+            args.port,
+            upstream.url,
+            {
+                "MAX_CALLS_PER_WORKER": str(args.max_calls),
+                "MAX_WAITING_CALLS": str(args.max_waiting),
+                "CALL_WAIT_TIMEOUT": str(args.wait_timeout),
+                "MAX_LOOP_LAG_MS": str(args.max_loop_lag_ms),
+                "EVENT_LOG": "",
+            },
+        )
+        try:
+
+            async def client(index: int) -> None:
+                await asyncio.sleep(index * args.ramp / max(1, args.clients))
+                await run_client(
+                    f"ws://127.0.0.1:{args.port}",
+                    pcms[index % len(pcms)],
+                    duration=args.duration,
+                    chunk_ms=args.mic_chunk_ms,
+                    binary=True,
+                    result=results[index],
+                )
+
+            await asyncio.gather(*(client(i) for i in range(args.clients)))
+            counters = await asyncio.to_thread(scrape, args.port)
+        finally:
+            process.terminate()
+            process.wait()
+
+    admitted = [r for r in results if r.rejected is None and r.error is None]
+    latencies = [latency for r in admitted for latency in r.latencies]
+    rejections: dict[str, int] = {}
+    for r in results:
+        if r.rejected is not None:
+            rejections[r.rejected] = rejections.get(r.rejected, 0) + 1
+    retry_after = [r.retry_after for r in results if r.retry_after is not None]
+    report = {
+        "clients": args.clients,
+        "admitted": len(admitted),
+        "queued": sum(r.queued for r in results),
+        "admitted_after_queueing": sum(r.queued for r in admitted),
+        "rejected": sum(rejections.values()),
+        "rejections": rejections,
+        "retry_after_s": [min(retry_after), max(retry_after)] if retry_after else [],
+        "errors": [r.error for r in results if r.error is not None],
+        "responses": len(latencies),
+        "first_audio_p50_ms": round(percentile_ms(latencies, 50), 1),
+        "first_audio_p99_ms": round(percentile_ms(latencies, 99), 1),
+        "metrics": counters,
+    }
+    failures = []
+    if report["errors"]:
+        failures.append(f"{len(report['errors'])} clients failed")
+    limit = args.response_delay_ms + args.slo_ms
+    if not report["first_audio_p99_ms"] <= limit:
+        failures.append(f"first audio p99 {report['first_audio_p99_ms']} over {limit}")
+    report["failures"] = failures
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip(),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds to connect")
+    parser.add_argument("--duration", type=float, default=6.0, help="seconds per call")
+    parser.add_argument("--max-calls", type=int, default=10, help="per worker")
+    parser.add_argument("--max-waiting", type=int, default=10)
+    parser.add_argument("--wait-timeout", type=float, default=10.0, help="seconds")
+    parser.add_argument("--max-loop-lag-ms", type=float, default=250, help="0 disables")
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="allowed p99 over the delay")
+    parser.add_argument("--audio", default=os.path.join(REPO_ROOT, "recordings"))
+    parser.add_argument("--mic-chunk-ms", type=int, default=100, help="mic chunk size")
+    parser.add_argument("--port", type=int, default=3100, help="for the spawned app")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    add_script_arguments(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>24}: {value}")
+    if report["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 24000
+
+
+def load_pcm(path: str, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Read a 16-bit WAV as mono PCM16 at `sample_rate`, the format the browser sends."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit WAV files are supported")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate:
+        if rate % sample_rate == 0:
+            factor = rate // sample_rate
+            usable = len(samples) - len(samples) % factor
+            samples = samples[:usable].reshape(-1, factor).mean(axis=1)
+        else:
+            positions = np.arange(0, len(samples), rate / sample_rate)
+            samples = np.interp(positions, np.arange(len(samples)), samples)
+    return samples.astype("<i2").tobytes()
+
+
+def wav_paths(path: str) -> list[str]:
+    """A single WAV file, or every WAV file in a directory."""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.lower().endswith(".wav")
+        )
+    return [path]
@@ -0,0 +1,136 @@
+"""
+Upstream message rate and CPU cost of mic audio batching.
+
+Runs --sessions in-process calls of the agent against the local Realtime
+stand-in. Each call streams a recording in real time as --chunk-ms binary
+frames, the size a browser worklet or telephony gateway sends, once with
+`mic_batch_ms=None` (one append event per frame) and once with the
+default batching. Reports append events and bytes per second reaching the
+upstream, process CPU, and mic-to-upstream latency. The stand-in runs in
+the same process, so its parsing cost is part of the CPU figure.
+
+    python -m bench.batching --sessions 20 --duration 10 --chunk-ms 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections.abc import AsyncIterator
+
+from bench.audio import load_pcm, wav_paths
+from bench.fake_realtime import FakeRealtimeServer, FakeScript
+from bench.loadtest import REPO_ROOT
+from langchain_openai_voice import OpenAIVoiceReactAgent
+from langchain_openai_voice.metrics import MIC_TO_UPSTREAM
+
+MIC_TO_UPSTREAM_SECONDS = MIC_TO_UPSTREAM.labels()
+
+
+class _CallEnded(Exception):
+    pass
+
+
+async def mic_frames(pcm: bytes, chunk_ms: int, duration: float) -> AsyncIterator[bytes]:
+    chunk = chunk_ms * 48
+    start = time.perf_counter()
+    n = 0
+    while time.perf_counter() - start < duration:
+        offset = n * chunk % (len(pcm) - chunk)
+        n += 1
+        await asyncio.sleep(max(0.0, start + n * chunk_ms / 1000 - time.perf_counter()))
+        yield pcm[offset : offset + chunk]
+    # aconnect only returns when a stream fails
+    raise _CallEnded
+
+
+async def discard(chunk: str | bytes) -> None:
+    pass
+
+
+def _quantile_ms(counts: list[int], quantile: float) -> float:
+    # upper bound of the histogram bucket the quantile falls in
+    total = sum(counts)
+    seen = 0
+    for upper, count in zip(MIC_TO_UPSTREAM_SECONDS.buckets, counts):
+        seen += count
+        if total and seen >= quantile * total:
+            return upper * 1000
+    return float("inf") if total else 0.0
+
+
+async def run_variant(name: str, pcms: list[bytes], args: argparse.Namespace) -> dict:
+    async with FakeRealtimeServer(FakeScript()) as upstream:
+        agent = OpenAIVoiceReactAgent(
+            model="fake",
+            api_key="fake",
+            url=upstream.url,
+            tools=[],
+            vad_mode=None if args.no_vad else 3,
+            mic_batch_ms=None if name == "unbatched" else tuple(args.batch_ms),
+        )
+
+        async def call(index: int) -> None:
+            frames = mic_frames(pcms[index % len(pcms)], args.chunk_ms, args.duration)
+            try:
+                await agent.aconnect(frames, discard, binary_audio=True)
+            except _CallEnded:
+                pass
+
+        counts_before = list(MIC_TO_UPSTREAM_SECONDS.counts)
+        cpu_before = time.process_time()
+        start = time.perf_counter()
+        await asyncio.gather(*(call(i) for i in range(args.sessions)))
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_before
+        stats = upstream.stats
+    counts = [
+        after - before
+        for after, before in zip(MIC_TO_UPSTREAM_SECONDS.counts, counts_before)
+    ]
+
+    return {
+        "variant": name,
+        "append_events_per_s": round(stats.appended_events / elapsed, 1),
+        "append_kb_per_s": round(stats.appended_bytes / elapsed / 1024, 1),
+        "cpu_percent": round(100 * cpu / elapsed, 1),
+        "cpu_us_per_audio_s": round(
+            cpu / max(1e-9, args.sessions * args.duration) * 1e6, 1
+        ),
+        "mic_to_upstream_p50_ms": _quantile_ms(counts, 0.5),
+        "mic_to_upstream_p99_ms": _quantile_ms(counts, 0.99),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    pcms = [load_pcm(path) for path in wav_paths(args.audio)]
+    return [await run_variant(name, pcms, args) for name in ("unbatched", "batched")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[1],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per variant")
+    parser.add_argument("--chunk-ms", type=int, default=10, help="mic frame size")
+    parser.add_argument(
+        "--batch-ms", type=int, nargs=2, default=[40, 100], help="min and max window"
+    )
+    parser.add_argument("--no-vad", action="store_true", help="forward silence as well")
+    parser.add_argument("--audio", default=os.path.join(REPO_ROOT, "recordings"))
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    reports = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print(", ".join(f"{key}={value}" for key, value in report.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+CPU cost against bandwidth saved for the browser-leg audio codecs.
+
+Pushes a recording through every codec in `server.codecs.CODECS` the way a
+call does: mic audio arrives as --chunk-ms frames and is decoded to 24 kHz
+PCM16, model audio leaves as 100 ms PCM16 deltas and is encoded. Reports
+wire bytes per second of audio next to the base64 JSON events the browser
+used to send, server CPU per second of audio for each direction, and the
+signal-to-noise ratio of the round trip.
+
+    python -m bench.codecs --chunk-ms 100
+"""
+
+import argparse
+import base64
+import json
+import os
+import time
+
+import numpy as np
+
+from bench.audio import SAMPLE_RATE, load_pcm, wav_paths
+from bench.loadtest import REPO_ROOT
+from server.codecs import CODECS, open_codec
+
+VARIANTS = [
+    {"codec": "pcm16"},
+    {"codec": "pcmu", "sample_rate": 24000},
+    {"codec": "pcmu", "sample_rate": 8000},
+    {"codec": "opus"},
+]
+
+
+def _frames(data: bytes, size: int) -> list[bytes]:
+    return [data[offset : offset + size] for offset in range(0, len(data), size)]
+
+
+def _snr_db(reference: bytes, decoded: bytes, delay: int) -> float:
+    a = np.frombuffer(reference, dtype="<i2").astype(np.float64)
+    b = np.frombuffer(decoded, dtype="<i2").astype(np.float64)[delay:]
+    n = min(len(a), len(b))
+    noise = np.sum((a[:n] - b[:n]) ** 2)
+    return float("inf") if not noise else float(10 * np.log10(np.sum(a[:n] ** 2) / noise))
+
+
+def measure(request: dict, pcm: bytes, chunk_ms: int, repeat: int) -> dict:
+    audio_s = len(pcm) / 2 / SAMPLE_RATE * repeat
+
+    # the browser's side of the leg, outside the measured server CPU
+    browser = open_codec(request)
+    mic = [
+        packet
+        for chunk in _frames(pcm, chunk_ms * SAMPLE_RATE * 2 // 1000)
+        for packet in browser.encode(chunk)
+    ]
+    deltas = _frames(pcm, SAMPLE_RATE * 2 // 10)
+
+    decode_cpu = 0.0
+    encode_cpu = 0.0
+    wire = 0
+    decoded = b""
+    for _ in range(repeat):
+        codec = open_codec(request)
+        start = time.process_time()
+        decoded = b"".join([codec.decode(frame) for frame in mic])
+        decode_cpu += time.process_time() - start
+
+        codec = open_codec(request)
+        start = time.process_time()
+        packets = [packet for delta in deltas for packet in codec.encode(delta)]
+        encode_cpu += time.process_time() - start
+        wire = sum(len(packet) for packet in packets)
+
+    json_event = json.dumps(
+        {"type": "input_audio_buffer.append", "audio": base64.b64encode(pcm).decode()}
+    )
+    per_s = len(pcm) / 2 / SAMPLE_RATE
+    # 8 kHz mu-law interpolates towards each new sample, one 24 kHz sample late
+    delay = 1 if request.get("sample_rate") == 8000 else 0
+    return {
+        "codec": request["codec"],
+        "sample_rate": request.get("sample_rate", SAMPLE_RATE),
+        "wire_kb_per_s": round(wire / per_s / 1024, 1),
+        "json_base64_kb_per_s": round(len(json_event) / per_s / 1024, 1),
+        "saved_vs_json_percent": round(100 * (1 - wire / len(json_event)), 1),
+        "decode_us_per_audio_s": round(decode_cpu / audio_s * 1e6, 1),
+        "encode_us_per_audio_s": round(encode_cpu / audio_s * 1e6, 1),
+        "snr_db": round(_snr_db(pcm, decoded, delay), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[1],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--audio", default=os.path.join(REPO_ROOT, "recordings"))
+    parser.add_argument("--chunk-ms", type=int, default=100, help="mic frame size")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    pcm = b"".join(load_pcm(path) for path in wav_paths(args.audio))
+    reports = [
+        measure(request, pcm, args.chunk_ms, args.repeat)
+        for request in VARIANTS
+        if request["codec"] in CODECS
+    ]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print(", ".join(f"{key}={value}" for key, value in report.items()))
+
+
+if __name__ == "__main__":
+    main()
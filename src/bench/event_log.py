@@ -0,0 +1,159 @@
+"""
+Event loop latency and throughput of the session event log.
+
+Runs --sessions simulated calls in one event loop. Each wakes up every
+--tick-ms like a call forwarding mic frames, records how late it woke up,
+and emits --events-per-s session events (transcripts and tool calls of a
+realistic size). Variants:
+
+- none: events are not recorded at all, the baseline
+- logging: every event goes through a logging.FileHandler on the loop,
+  what writing them out synchronously would cost
+- jsonl, sqlite: the batched `server.event_log.EventLog`
+
+Reports the wake-up lateness the calls saw, the cost of one emit on the
+loop, events written and dropped, and process CPU.
+
+    python -m bench.event_log --sessions 300 --duration 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from server.event_log import EventLog
+
+VARIANTS = ["none", "logging", "jsonl", "sqlite"]
+
+EVENTS = [
+    ("user", {"text": "Tesla İzmir mağazası hafta sonu kaçta açılıyor?"}),
+    ("model", {"text": "Kemalpaşa'daki mağazamız cumartesi 10:00'da açılıyor."}),
+    (
+        "tool_call",
+        {
+            "call_id": "call_0123456789",
+            "name": "google_serper_results_json",
+            "arguments": '{"query": "Tesla İzmir Kemalpaşa mağaza adresi"}',
+            "output": json.dumps({"results": [{"title": "Tesla İzmir"}] * 8}),
+            "ms": 412.3,
+        },
+    ),
+]
+
+
+def _quantile(values: list[float], quantile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(quantile * len(values)))]
+
+
+async def run_variant(variant: str, args: argparse.Namespace, directory: str) -> dict:
+    log = None
+    file_logger = None
+    if variant in ("jsonl", "sqlite"):
+        log = EventLog(os.path.join(directory, variant), variant)
+    elif variant == "logging":
+        os.makedirs(os.path.join(directory, variant), exist_ok=True)
+        file_logger = logging.getLogger(f"bench.event_log.{variant}")
+        file_logger.propagate = False
+        file_logger.setLevel(logging.INFO)
+        file_logger.addHandler(
+            logging.FileHandler(os.path.join(directory, variant, "events.log"))
+        )
+
+    lateness: list[float] = []
+    emit_seconds = 0.0
+    emitted = 0
+
+    async def call(index: int) -> None:
+        nonlocal emit_seconds, emitted
+        session = log.session(f"s{index}") if log is not None else None
+        interval = args.tick_ms / 1000
+        emit_every = max(1, round(1 / (args.events_per_s * interval)))
+        start = time.perf_counter() + index * interval / args.sessions
+        tick = 0
+        while True:
+            tick += 1
+            target = start + tick * interval
+            if target - start > args.duration:
+                return
+            await asyncio.sleep(max(0.0, target - time.perf_counter()))
+            lateness.append(time.perf_counter() - target)
+            if tick % emit_every:
+                continue
+            event_type, fields = EVENTS[(tick // emit_every) % len(EVENTS)]
+            emitted += 1
+            before = time.perf_counter()
+            if session is not None:
+                session.emit(event_type, **fields)
+            elif file_logger is not None:
+                event = {"ts": time.time(), "session": f"s{index}", "type": event_type}
+                file_logger.info(json.dumps({**event, **fields}, ensure_ascii=False))
+            emit_seconds += time.perf_counter() - before
+
+    async with log or contextlib.nullcontext():
+        cpu_before = time.process_time()
+        await asyncio.gather(*(call(i) for i in range(args.sessions)))
+        cpu_s = time.process_time() - cpu_before
+        close_start = time.perf_counter()
+    close_s = time.perf_counter() - close_start
+    written = emitted if variant == "logging" else 0
+    if file_logger is not None:
+        for handler in file_logger.handlers:
+            handler.close()
+    return {
+        "variant": variant,
+        "sessions": args.sessions,
+        "events_emitted": emitted,
+        "events_per_s": round(emitted / args.duration),
+        "events_written": log.written if log is not None else written,
+        "events_dropped": log.dropped if log is not None else 0,
+        "files": len(os.listdir(os.path.join(directory, variant)))
+        if variant != "none"
+        else 0,
+        "emit_us": round(emit_seconds / max(1, emitted) * 1e6, 2),
+        "lateness_p50_ms": round(_quantile(lateness, 0.5) * 1000, 2),
+        "lateness_p99_ms": round(_quantile(lateness, 0.99) * 1000, 2),
+        "lateness_max_ms": round(max(lateness) * 1000, 2),
+        "cpu_percent": round(100 * cpu_s / args.duration, 1),
+        "close_ms": round(close_s * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip(),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--tick-ms", type=int, default=20, help="wake-up per call")
+    parser.add_argument("--events-per-s", type=float, default=2.0, help="per call")
+    parser.add_argument("--variant", choices=VARIANTS, action="append")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="event-log-bench-")
+    try:
+        reports = [
+            asyncio.run(run_variant(variant, args, directory))
+            for variant in args.variant or VARIANTS
+        ]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print(", ".join(f"{key}={value}" for key, value in report.items()))
+
+
+if __name__ == "__main__":
+    main()
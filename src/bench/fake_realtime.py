@@ -0,0 +1,344 @@
+"""
+Local stand-in for the OpenAI Realtime API.
+
+Speaks the subset of the protocol `OpenAIVoiceReactAgent.aconnect` handles,
+with timing taken from a `FakeScript`. Every `turn_audio_ms` of appended mic
+audio counts as one user turn: the server answers with speech_started,
+speech_stopped and a transcript, then either a function call or an audio
+response streamed as response.audio.delta events.
+
+    python -m bench.fake_realtime --port 9000 --response-delay-ms 300
+"""
+
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field, fields
+from typing import Self
+
+import numpy as np
+import websockets
+
+SAMPLE_RATE = 24000
+
+
+@dataclass
+class FakeScript:
+    turn_audio_ms: int = 1500
+    """Mic audio that makes up one user turn."""
+    response_delay_ms: int = 300
+    """speech_stopped -> first response.audio.delta."""
+    response_audio_ms: int = 2000
+    chunk_ms: int = 100
+    """Audio carried by each response.audio.delta."""
+    speed: float = 1.0
+    """How much faster than real time deltas are streamed."""
+    tool_call_every: int = 0
+    """Every n-th turn starts with a function call, 0 disables them."""
+    tool_name: str = "google_serper_results_json"
+    tool_arguments: str = '{"query": "Tesla İzmir Kemalpaşa mağaza adresi"}'
+    argument_delta_ms: int = 0
+    """Stream the tool arguments as 8-character deltas this far apart, 0 sends them at once."""
+    transcript: str = "Size nasıl yardımcı olabilirim?"
+    kill_after_ms: int = 0
+    """Abort every connection this long after it opens, 0 never."""
+
+
+@dataclass
+class FakeStats:
+    sessions: int = 0
+    active_sessions: int = 0
+    appended_bytes: int = 0
+    appended_events: int = 0
+    turns: int = 0
+    responses: int = 0
+    tool_calls: int = 0
+    truncations: int = 0
+    kills: int = 0
+    replayed_items: int = 0
+    event_types: dict[str, int] = field(default_factory=dict)
+
+
+class FakeRealtimeSession:
+    def __init__(
+        self,
+        websocket,
+        script: FakeScript,
+        stats: FakeStats,
+        on_event: Callable[[dict], None] | None = None,
+    ) -> None:
+        self.websocket = websocket
+        self.script = script
+        self.stats = stats
+        self.on_event = on_event
+        self._ids = itertools.count(1)
+        self._audio_bytes = 0
+        self._turns = 0
+        self._response: asyncio.Task | None = None
+        self._chunk = _tone(script.chunk_ms)
+
+    @property
+    def responding(self) -> bool:
+        return self._response is not None and not self._response.done()
+
+    def _id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    async def send(self, event: dict) -> None:
+        event.setdefault("event_id", self._id("event"))
+        await self.websocket.send(json.dumps(event))
+
+    async def run(self) -> None:
+        killer = None
+        if self.script.kill_after_ms:
+            killer = asyncio.get_running_loop().call_later(
+                self.script.kill_after_ms / 1000, self.kill
+            )
+        await self.send({"type": "session.created", "session": {}})
+        try:
+            async for raw_event in self.websocket:
+                await self.handle(json.loads(raw_event))
+        finally:
+            if killer is not None:
+                killer.cancel()
+            if self._response is not None:
+                self._response.cancel()
+
+    def kill(self) -> None:
+        """Drop the TCP connection without a close frame, like a network failure."""
+        self.stats.kills += 1
+        self.websocket.transport.abort()
+
+    async def handle(self, event: dict) -> None:
+        if self.on_event is not None:
+            self.on_event(event)
+        event_type = event.get("type")
+        counts = self.stats.event_types
+        counts[event_type] = counts.get(event_type, 0) + 1
+        if event_type == "session.update":
+            await self.send({"type": "session.updated", "session": event["session"]})
+        elif event_type == "input_audio_buffer.append":
+            audio = base64.b64decode(event["audio"])
+            self.stats.appended_events += 1
+            self.stats.appended_bytes += len(audio)
+            self._audio_bytes += len(audio)
+            turn_bytes = self.script.turn_audio_ms * SAMPLE_RATE * 2 // 1000
+            if self._audio_bytes >= turn_bytes:
+                self._audio_bytes = 0
+                await self.turn()
+        elif event_type == "conversation.item.create":
+            self.stats.replayed_items += 1
+        elif event_type == "response.create":
+            self._start(self.respond_audio())
+        elif event_type == "conversation.item.truncate":
+            self.stats.truncations += 1
+            await self.send(
+                {
+                    "type": "conversation.item.truncated",
+                    "item_id": event["item_id"],
+                    "content_index": event.get("content_index", 0),
+                    "audio_end_ms": event["audio_end_ms"],
+                }
+            )
+
+    def _start(self, coro) -> None:
+        if self._response is not None and not self._response.done():
+            self._response.cancel()
+        self._response = asyncio.create_task(coro)
+
+    async def turn(self) -> None:
+        self._turns += 1
+        self.stats.turns += 1
+        item_id = self._id("item")
+        await self.send({"type": "input_audio_buffer.speech_started", "item_id": item_id})
+        await self.send({"type": "input_audio_buffer.speech_stopped", "item_id": item_id})
+        await self.send(
+            {
+                "type": "conversation.item.input_audio_transcription.completed",
+                "item_id": item_id,
+                "transcript": f"kullanıcı turu {self._turns}",
+            }
+        )
+        every = self.script.tool_call_every
+        if every and self._turns % every == 0:
+            self._start(self.respond_tool_call())
+        else:
+            self._start(self.respond_audio())
+
+    async def respond_tool_call(self) -> None:
+        response_id = self._id("resp")
+        call_id = self._id("call")
+        self.stats.tool_calls += 1
+        await self.send({"type": "response.created", "response": {"id": response_id}})
+        await asyncio.sleep(self.script.response_delay_ms / 1000)
+        await self.send(
+            {
+                "type": "response.output_item.added",
+                "response_id": response_id,
+                "item": {
+                    "type": "function_call",
+                    "call_id": call_id,
+                    "name": self.script.tool_name,
+                    "arguments": "",
+                },
+            }
+        )
+        arguments = self.script.tool_arguments
+        if self.script.argument_delta_ms:
+            for offset in range(0, len(arguments), 8):
+                await self.send(
+                    {
+                        "type": "response.function_call_arguments.delta",
+                        "response_id": response_id,
+                        "call_id": call_id,
+                        "delta": arguments[offset : offset + 8],
+                    }
+                )
+                await asyncio.sleep(self.script.argument_delta_ms / 1000)
+        await self.send(
+            {
+                "type": "response.function_call_arguments.done",
+                "response_id": response_id,
+                "item_id": self._id("item"),
+                "call_id": call_id,
+                "name": self.script.tool_name,
+                "arguments": arguments,
+            }
+        )
+        await self.send(
+            {"type": "response.done", "response": {"id": response_id, "status": "completed"}}
+        )
+
+    async def respond_audio(self) -> None:
+        response_id = self._id("resp")
+        item_id = self._id("item")
+        self.stats.responses += 1
+        await self.send({"type": "response.created", "response": {"id": response_id}})
+        try:
+            await asyncio.sleep(self.script.response_delay_ms / 1000)
+            delta = base64.b64encode(self._chunk).decode()
+            interval = self.script.chunk_ms / 1000 / self.script.speed
+            n_chunks = max(1, self.script.response_audio_ms // self.script.chunk_ms)
+            for _ in range(n_chunks):
+                # "type" first, like the real API, so sniffing works the same
+                await self.websocket.send(
+                    f'{{"type":"response.audio.delta","event_id":"{self._id("event")}",'
+                    f'"response_id":"{response_id}","item_id":"{item_id}",'
+                    f'"output_index":0,"content_index":0,"delta":"{delta}"}}'
+                )
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            # barge-in: report the cancelled response without blocking the cancel
+            asyncio.ensure_future(self._send_done(response_id, "cancelled"))
+            raise
+        await self.send({"type": "response.audio.done", "item_id": item_id})
+        await self.send(
+            {
+                "type": "response.audio_transcript.done",
+                "item_id": item_id,
+                "transcript": self.script.transcript,
+            }
+        )
+        await self._send_done(response_id, "completed")
+
+    async def _send_done(self, response_id: str, status: str) -> None:
+        try:
+            await self.send(
+                {"type": "response.done", "response": {"id": response_id, "status": status}}
+            )
+        except websockets.ConnectionClosed:
+            pass
+
+
+def _tone(chunk_ms: int) -> bytes:
+    t = np.arange(SAMPLE_RATE * chunk_ms // 1000) / SAMPLE_RATE
+    return (np.sin(2 * np.pi * 440 * t) * 6000).astype("<i2").tobytes()
+
+
+class FakeRealtimeServer:
+    """
+    Runs FakeRealtimeSession for every connection; use as an async context manager.
+
+    `on_event` is called with every event the clients send, in order.
+    """
+
+    def __init__(
+        self,
+        script: FakeScript | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        on_event: Callable[[dict], None] | None = None,
+    ) -> None:
+        self.script = script or FakeScript()
+        self.host = host
+        self.port = port
+        self.on_event = on_event
+        self.stats = FakeStats()
+        self._sessions: set[FakeRealtimeSession] = set()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    @property
+    def responding(self) -> bool:
+        """Whether any session is producing a response right now."""
+        return any(session.responding for session in self._sessions)
+
+    async def _handle(self, websocket, path: str | None = None) -> None:
+        self.stats.sessions += 1
+        self.stats.active_sessions += 1
+        session = FakeRealtimeSession(websocket, self.script, self.stats, self.on_event)
+        self._sessions.add(session)
+        try:
+            await session.run()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._sessions.discard(session)
+            self.stats.active_sessions -= 1
+
+    async def __aenter__(self) -> Self:
+        self._server = await websockets.serve(
+            self._handle, self.host, self.port, max_size=None
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+
+def add_script_arguments(parser: argparse.ArgumentParser) -> None:
+    for script_field in fields(FakeScript):
+        parser.add_argument(
+            "--" + script_field.name.replace("_", "-"),
+            type=type(script_field.default),
+            default=script_field.default,
+        )
+
+
+def script_from_args(args: argparse.Namespace) -> FakeScript:
+    return FakeScript(**{f.name: getattr(args, f.name) for f in fields(FakeScript)})
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    add_script_arguments(parser)
+    args = parser.parse_args()
+
+    script = script_from_args(args)
+    async with FakeRealtimeServer(script, args.host, args.port) as server:
+        print(f"fake realtime server on {server.url}: {asdict(script)}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,334 @@
+"""
+Load test for the /ws endpoint against the local Realtime stand-in.
+
+Starts `bench.fake_realtime`, launches app.py under uvicorn pointed at it (or
+uses --target), then drives N simulated browsers that stream WAV audio from
+recordings/ in real time and play back whatever comes back.
+
+Reported per run:
+- first-audio latency: input_audio_buffer.speech_started -> first model audio
+  frame, p50/p99 (includes the script's --response-delay-ms)
+- audio frames/s sent and received across all clients
+- server CPU and resident memory per concurrent session
+- upstream reconnects and their recovery time, with --kill-after-ms
+- calls the server queued or turned away (code 1013), by reason
+
+    python -m bench.loadtest --clients 50 --duration 30
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+import websockets
+
+from bench.audio import SAMPLE_RATE, load_pcm, wav_paths
+from bench.fake_realtime import (
+    FakeRealtimeServer,
+    add_script_arguments,
+    script_from_args,
+)
+from server.serving import TRY_AGAIN_LATER
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+@dataclass
+class ClientResult:
+    latencies: list[float] = field(default_factory=list)
+    recoveries_ms: list[float] = field(default_factory=list)
+    frames_sent: int = 0
+    frames_received: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    queued: bool = False
+    rejected: str | None = None
+    retry_after: float | None = None
+    error: str | None = None
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of a process (and its children) from /proc."""
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.peak_rss = 0
+
+    def _pids(self) -> list[int]:
+        pids = [self.pid]
+        try:
+            with open(f"/proc/{self.pid}/task/{self.pid}/children") as f:
+                pids += [int(child) for child in f.read().split()]
+        except OSError:
+            pass
+        return pids
+
+    def cpu_seconds(self) -> float:
+        total = 0
+        for pid in self._pids():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    stat = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            # utime and stime are fields 14 and 15, 1-based, in clock ticks
+            total += int(stat[11]) + int(stat[12])
+        return total / CLOCK_TICKS
+
+    def rss_bytes(self) -> int:
+        total = 0
+        for pid in self._pids():
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+            except OSError:
+                continue
+        self.peak_rss = max(self.peak_rss, total)
+        return total
+
+    async def track_peak(self, interval: float = 0.5) -> None:
+        while True:
+            self.rss_bytes()
+            await asyncio.sleep(interval)
+
+
+async def run_client(
+    url: str,
+    pcm: bytes,
+    *,
+    duration: float,
+    chunk_ms: int,
+    binary: bool,
+    result: ClientResult,
+) -> None:
+    chunk_bytes = SAMPLE_RATE * 2 * chunk_ms // 1000
+    speech_started_at: float | None = None
+    # a call the server queued lasts `duration` from its admission
+    call_started = time.perf_counter()
+
+    async def send_audio(websocket) -> None:
+        start = time.perf_counter()
+        offset = 0
+        sent = 0
+        while time.perf_counter() - call_started < duration:
+            chunk = pcm[offset : offset + chunk_bytes]
+            offset = offset + chunk_bytes if offset + chunk_bytes < len(pcm) else 0
+            if binary:
+                await websocket.send(chunk)
+            else:
+                await websocket.send(
+                    json.dumps(
+                        {
+                            "type": "input_audio_buffer.append",
+                            "audio": base64.b64encode(chunk).decode(),
+                        }
+                    )
+                )
+            result.frames_sent += 1
+            result.bytes_sent += len(chunk)
+            sent += 1
+            # pace against the wall clock so slow sends do not accumulate drift
+            await asyncio.sleep(max(0.0, start + sent * chunk_ms / 1000 - time.perf_counter()))
+
+    async def receive(websocket) -> None:
+        nonlocal speech_started_at, call_started
+        # the close code is read by send_audio, which fails right after
+        with contextlib.suppress(websockets.ConnectionClosed):
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    audio = True
+                    result.bytes_received += len(message)
+                else:
+                    event = json.loads(message)
+                    audio = event.get("type") == "response.audio.delta"
+                    if event.get("type") == "input_audio_buffer.speech_started":
+                        speech_started_at = time.perf_counter()
+                    elif event.get("type") == "session.reconnected":
+                        result.recoveries_ms.append(event["recovery_ms"])
+                    elif event.get("type") == "session.queued":
+                        result.queued = True
+                    elif event.get("type") == "session.admitted":
+                        call_started = time.perf_counter()
+                    elif event.get("type") == "session.rejected":
+                        result.rejected = event["reason"]
+                        result.retry_after = event["retry_after"]
+                if audio:
+                    result.frames_received += 1
+                    if speech_started_at is not None:
+                        result.latencies.append(time.perf_counter() - speech_started_at)
+                        speech_started_at = None
+
+    query = "?audio=binary" if binary else ""
+    try:
+        async with websockets.connect(f"{url}/ws{query}", max_size=None) as websocket:
+            receiver = asyncio.create_task(receive(websocket))
+            try:
+                await send_audio(websocket)
+            except websockets.ConnectionClosed:
+                # let the receiver read what came before the close frame
+                await asyncio.wait([receiver], timeout=1.0)
+                raise
+            finally:
+                receiver.cancel()
+    except websockets.ConnectionClosed as e:
+        if e.rcvd is not None and e.rcvd.code == TRY_AGAIN_LATER:
+            # turned away by admission control, not a failure
+            result.rejected = result.rejected or e.rcvd.reason
+        else:
+            result.error = repr(e)
+    except (OSError, websockets.WebSocketException) as e:
+        result.error = repr(e)
+
+
+def percentile_ms(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q) * 1000) if values else float("nan")
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"server did not start listening on port {port}")
+
+
+def start_app(port: int, upstream_url: str, extra_env: dict[str, str] | None = None):
+    env = {
+        **os.environ,
+        "OPENAI_REALTIME_URL": upstream_url,
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "fake"),
+        "RECORD_CALLS": "0",
+        "LOG_LEVEL": "WARNING",
+        **(extra_env or {}),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", "src",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    wait_for_port(port)
+    return process
+
+
+async def run(args: argparse.Namespace) -> dict:
+    pcms = [load_pcm(path) for path in wav_paths(args.audio)]
+    results = [ClientResult() for _ in range(args.clients)]
+
+    async with FakeRealtimeServer(script_from_args(args)) as upstream:
+        process = None
+        target = args.target
+        if target is None:
+            process = start_app(args.port, upstream.url)
+            target = f"ws://127.0.0.1:{args.port}"
+        pid = process.pid if process is not None else args.server_pid
+        sampler = ProcessSampler(pid) if pid else None
+
+        try:
+            rss_before = sampler.rss_bytes() if sampler else 0
+            cpu_before = sampler.cpu_seconds() if sampler else 0.0
+            peak_task = asyncio.create_task(sampler.track_peak()) if sampler else None
+            start = time.perf_counter()
+
+            async def client(index: int) -> None:
+                await asyncio.sleep(index * args.ramp / max(1, args.clients))
+                await run_client(
+                    target,
+                    pcms[index % len(pcms)],
+                    duration=args.duration,
+                    chunk_ms=args.mic_chunk_ms,
+                    binary=not args.text,
+                    result=results[index],
+                )
+
+            await asyncio.gather(*(client(i) for i in range(args.clients)))
+            elapsed = time.perf_counter() - start
+            cpu = (sampler.cpu_seconds() - cpu_before) if sampler else float("nan")
+            if peak_task is not None:
+                peak_task.cancel()
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+        latencies = [latency for r in results for latency in r.latencies]
+        recoveries = [ms / 1000 for r in results for ms in r.recoveries_ms]
+        rejections: dict[str, int] = {}
+        for r in results:
+            if r.rejected is not None:
+                rejections[r.rejected] = rejections.get(r.rejected, 0) + 1
+        return {
+            "clients": args.clients,
+            "errors": sum(r.error is not None for r in results),
+            "queued": sum(r.queued for r in results),
+            "rejected": sum(rejections.values()),
+            "rejections": rejections,
+            "elapsed_s": round(elapsed, 2),
+            "responses": len(latencies),
+            "first_audio_p50_ms": round(percentile_ms(latencies, 50), 1),
+            "first_audio_p99_ms": round(percentile_ms(latencies, 99), 1),
+            "frames_sent_per_s": round(sum(r.frames_sent for r in results) / elapsed, 1),
+            "frames_received_per_s": round(
+                sum(r.frames_received for r in results) / elapsed, 1
+            ),
+            "bytes_sent": sum(r.bytes_sent for r in results),
+            "reconnects": len(recoveries),
+            "recovery_p50_ms": round(percentile_ms(recoveries, 50), 1),
+            "recovery_p99_ms": round(percentile_ms(recoveries, 99), 1),
+            "cpu_percent_per_session": round(100 * cpu / elapsed / args.clients, 3),
+            "rss_mb_per_session": (
+                round((sampler.peak_rss - rss_before) / 2**20 / args.clients, 3)
+                if sampler
+                else float("nan")
+            ),
+            "upstream": {
+                key: value
+                for key, value in asdict(upstream.stats).items()
+                if key != "event_types"
+            },
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[1],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per client")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds to connect all clients")
+    parser.add_argument("--audio", default=os.path.join(REPO_ROOT, "recordings"))
+    parser.add_argument("--mic-chunk-ms", type=int, default=100, help="mic chunk size")
+    parser.add_argument("--text", action="store_true", help="base64 JSON instead of binary frames")
+    parser.add_argument("--port", type=int, default=3100, help="port for the spawned app")
+    parser.add_argument("--target", help="ws://host:port of an already running server")
+    parser.add_argument("--server-pid", type=int, help="pid of --target, for CPU/RSS")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    add_script_arguments(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>26}: {value}")
+
+
+if __name__ == "__main__":
+    main()
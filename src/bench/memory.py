@@ -0,0 +1,176 @@
+"""
+Resident memory per session over hour-long calls.
+
+Runs --sessions in-process calls of the agent against the local Realtime
+stand-in, each streaming the recordings in a loop until --minutes of mic
+audio have been sent. Audio is pushed as fast as the pipeline takes it, so
+an hour-long call takes a fraction of that on the wall clock; the stand-in
+answers every turn with a transcript and audio, every --tool-call-every
+turn with a tool call, and the caller barges in now and then. Every
+--sample-minutes of call time the process RSS and the bytes held by the
+sessions' ConversationState are sampled. RSS per session should stay flat
+once the first turns have warmed up the allocator.
+
+    python -m bench.memory --sessions 8 --minutes 60
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import time
+from collections.abc import AsyncIterator
+
+from bench.audio import load_pcm, wav_paths
+from bench.fake_realtime import FakeRealtimeServer, FakeScript
+from bench.loadtest import REPO_ROOT, ProcessSampler
+from bench.replay import REPLAY_TOOLS
+from langchain_openai_voice import OpenAIVoiceReactAgent
+from langchain_openai_voice.state import ConversationState, live_state_bytes
+
+SAMPLE_RATE = 24000
+
+
+class _CallEnded(Exception):
+    pass
+
+
+async def discard(chunk: str | bytes) -> None:
+    pass
+
+
+async def mic_frames(
+    pcm: bytes, chunk_ms: int, minutes: float, progress: list[float], index: int
+) -> AsyncIterator[str | bytes]:
+    chunk = chunk_ms * SAMPLE_RATE * 2 // 1000
+    total = int(minutes * 60 * 1000 / chunk_ms)
+    for n in range(total):
+        offset = n * chunk % (len(pcm) - chunk)
+        yield pcm[offset : offset + chunk]
+        if n % 97 == 96:
+            # a barge-in report from the browser's playback worklet
+            yield json.dumps(
+                {"type": "playback.truncated", "played_samples": SAMPLE_RATE // 2}
+            )
+        progress[index] = (n + 1) * chunk_ms / 60000
+        # let the upstream and the tool tasks keep up
+        await asyncio.sleep(0)
+    # aconnect only returns when a stream fails
+    raise _CallEnded
+
+
+async def run(args: argparse.Namespace) -> dict:
+    pcms = [load_pcm(path) for path in wav_paths(args.audio)]
+    script = FakeScript(
+        response_delay_ms=0,
+        response_audio_ms=1000,
+        speed=1e9,
+        tool_call_every=args.tool_call_every,
+    )
+    sampler = ProcessSampler(os.getpid())
+    progress = [0.0] * args.sessions
+    states = [
+        ConversationState(
+            max_items=args.max_items,
+            max_audio_items=args.max_audio_items,
+            max_text_chars=args.max_text_chars,
+        )
+        for _ in range(args.sessions)
+    ]
+
+    async with FakeRealtimeServer(script) as upstream:
+        agent = OpenAIVoiceReactAgent(
+            model="fake",
+            api_key="fake",
+            url=upstream.url,
+            tools=REPLAY_TOOLS,
+            vad_mode=None,
+        )
+
+        async def call(index: int) -> None:
+            frames = mic_frames(
+                pcms[index % len(pcms)], args.chunk_ms, args.minutes, progress, index
+            )
+            try:
+                await agent.aconnect(
+                    frames, discard, binary_audio=True, state=states[index]
+                )
+            except _CallEnded:
+                pass
+
+        gc.collect()
+        baseline_rss = sampler.rss_bytes()
+        samples = []
+        start = time.perf_counter()
+        calls = asyncio.gather(*(call(i) for i in range(args.sessions)))
+        next_sample = 0.0
+        while not calls.done():
+            await asyncio.sleep(0.05)
+            call_minutes = min(progress)
+            if call_minutes < next_sample and not calls.done():
+                continue
+            gc.collect()
+            rss = sampler.rss_bytes()
+            samples.append(
+                {
+                    "call_minutes": round(call_minutes, 1),
+                    "wall_s": round(time.perf_counter() - start, 1),
+                    "rss_mb": round(rss / 2**20, 1),
+                    "rss_kb_per_session": round((rss - baseline_rss) / 1024 / args.sessions),
+                    "state_bytes_per_session": live_state_bytes() // args.sessions,
+                }
+            )
+            next_sample = call_minutes + args.sample_minutes
+        await calls
+        stats = upstream.stats
+
+    per_session = [sample["rss_kb_per_session"] for sample in samples]
+    # growth between the first sample past warm-up and the last one
+    warm = next(
+        (s for s in samples if s["call_minutes"] >= args.sample_minutes), samples[0]
+    )
+    return {
+        "sessions": args.sessions,
+        "call_minutes": args.minutes,
+        "turns": stats.turns,
+        "tool_calls": stats.tool_calls,
+        "truncations": stats.truncations,
+        "state_bytes_per_session": max(s["state_bytes_per_session"] for s in samples),
+        "state_report": states[0].memory_report(),
+        "rss_kb_per_session_max": max(per_session),
+        "rss_kb_per_session_growth_after_warmup": per_session[-1]
+        - warm["rss_kb_per_session"],
+        "samples": samples,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[1],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--audio", default=os.path.join(REPO_ROOT, "recordings"))
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--minutes", type=float, default=60, help="mic audio per call")
+    parser.add_argument("--sample-minutes", type=float, default=10)
+    parser.add_argument("--chunk-ms", type=int, default=100, help="mic frame size")
+    parser.add_argument("--tool-call-every", type=int, default=3)
+    parser.add_argument("--max-items", type=int, default=24)
+    parser.add_argument("--max-audio-items", type=int, default=64)
+    parser.add_argument("--max-text-chars", type=int, default=4000)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for sample in report.pop("samples"):
+        print(", ".join(f"{key}={value}" for key, value in sample.items()))
+    for key, value in report.items():
+        print(f"{key:>40}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Microbenchmark for the per-session stream merge.
+
+Runs --sessions concurrent merges of a mic-like stream (one item every
+--mic-ms), a speaker-like stream (one item every --speaker-ms) and an idle
+tool stream, once with the task-per-item merge that used to live in
+`langchain_openai_voice.utils` and once with `merge_streams`. Reports tasks
+created, CPU time per merged item and event-loop lag.
+
+    python -m bench.merge --sessions 300 --duration 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator
+
+import numpy as np
+
+from langchain_openai_voice.utils import merge_streams
+
+
+async def legacy_amerge(**streams: AsyncIterator) -> AsyncIterator[tuple[str, object]]:
+    """The previous amerge: one task per item, asyncio.wait over all of them."""
+    nexts: dict[asyncio.Task, str] = {
+        asyncio.create_task(anext(stream)): key for key, stream in streams.items()
+    }
+    while nexts:
+        done, _ = await asyncio.wait(nexts, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            key = nexts.pop(task)
+            stream = streams[key]
+            try:
+                yield key, task.result()
+                nexts[asyncio.create_task(anext(stream))] = key
+            except StopAsyncIteration:
+                pass
+            except Exception:
+                for task in nexts:
+                    task.cancel()
+                raise
+
+
+async def ticking(interval: float, payload: bytes, stop: asyncio.Event) -> AsyncIterator[bytes]:
+    start = time.perf_counter()
+    n = 0
+    while not stop.is_set():
+        n += 1
+        await asyncio.sleep(max(0.0, start + n * interval - time.perf_counter()))
+        yield payload
+
+
+async def idle(stop: asyncio.Event) -> AsyncIterator[bytes]:
+    await stop.wait()
+    return
+    yield
+
+
+async def measure_lag(stop: asyncio.Event, lags: list[float], interval: float = 0.01) -> None:
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - before - interval)
+
+
+async def run_variant(name: str, args: argparse.Namespace) -> dict:
+    loop = asyncio.get_running_loop()
+    created = 0
+    default_factory = loop.get_task_factory()
+
+    def counting_factory(loop, coro, **kwargs):
+        nonlocal created
+        created += 1
+        if default_factory is not None:
+            return default_factory(loop, coro, **kwargs)
+        return asyncio.Task(coro, loop=loop, **kwargs)
+
+    stop = asyncio.Event()
+    merged = 0
+    lags: list[float] = []
+    mic = bytes(args.mic_ms * 48)
+    speaker = bytes(args.speaker_ms * 48)
+
+    async def session() -> None:
+        nonlocal merged
+        streams = {
+            "input_mic": ticking(args.mic_ms / 1000, mic, stop),
+            "output_speaker": ticking(args.speaker_ms / 1000, speaker, stop),
+            "tool_outputs": idle(stop),
+        }
+        merge = legacy_amerge(**streams) if name == "legacy" else merge_streams(streams)
+        # every source ends shortly after `stop`, which ends the merge
+        async for _ in merge:
+            merged += 1
+
+    lag_task = asyncio.create_task(measure_lag(stop, lags))
+    loop.set_task_factory(counting_factory)
+    cpu_before = time.process_time()
+    start = time.perf_counter()
+    sessions = [asyncio.create_task(session()) for _ in range(args.sessions)]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*sessions)
+    loop.set_task_factory(default_factory)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_before
+    await lag_task
+
+    return {
+        "variant": name,
+        "items_merged": merged,
+        "tasks_created": created,
+        "tasks_per_item": round(created / max(1, merged), 3),
+        "cpu_us_per_item": round(cpu / max(1, merged) * 1e6, 2),
+        "cpu_percent": round(100 * cpu / elapsed, 1),
+        "loop_lag_p50_ms": round(float(np.percentile(lags, 50)) * 1000, 2),
+        "loop_lag_p99_ms": round(float(np.percentile(lags, 99)) * 1000, 2),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    return [await run_variant(name, args) for name in ("legacy", "merge_streams")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[1],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per variant")
+    parser.add_argument("--mic-ms", type=int, default=20, help="mic item interval")
+    parser.add_argument("--speaker-ms", type=int, default=40, help="speaker item interval")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    reports = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print(", ".join(f"{key}={value}" for key, value in report.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Replays recorded calls through the agent and diffs them against golden timelines.
+
+Streams every WAV under --audio through `OpenAIVoiceReactAgent.aconnect`
+against an in-process Realtime stand-in, at real time (--speed 1), N times
+faster (--speed N) or as fast as the pipeline goes (--speed max). The
+replayed caller waits for each answer before speaking on, so the timeline
+does not depend on the speed and one golden file per recording serves all
+modes. A timeline holds:
+
+- speech_ms: the mic audio the VAD gate forwarded, as [start, end] ms spans
+  of the recording
+- upstream: the non-audio events the agent sent to the model, in order
+- downstream: the events the browser received, runs of audio collapsed
+- tool_calls: name and arguments of every tool call the agent ran, with the
+  output it sent back for the same call_id
+
+With --update the timelines are written to --golden, otherwise they are
+compared and any difference fails the run. --replays and --processes run
+many replays in parallel, which doubles as a throughput benchmark for the
+server-side audio path.
+
+    python -m bench.replay --update
+    python -m bench.replay --speed max --replays 64 --processes 4
+"""
+
+import argparse
+import asyncio
+import base64
+import difflib
+import json
+import math
+import os
+import sys
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from functools import partial
+from typing import Any
+
+from langchain_core.tools import StructuredTool
+
+from bench.audio import load_pcm, wav_paths
+from bench.fake_realtime import FakeRealtimeServer, FakeScript
+from bench.loadtest import REPO_ROOT
+from langchain_openai_voice import OpenAIVoiceReactAgent
+from server.event_log import SessionEvents
+
+AUDIO_INPUT_EVENT = "input_audio_buffer.append"
+FRAME_BYTES = 20 * 48
+"""One VADGate frame of 24 kHz PCM16; forwarded audio is made of whole frames."""
+
+REPLAY_SCRIPT = FakeScript(
+    turn_audio_ms=1500,
+    response_delay_ms=300,
+    response_audio_ms=1000,
+    chunk_ms=100,
+    tool_call_every=2,
+)
+SETTLE_S = 0.05
+"""How long the stand-in must stay idle before the caller speaks on."""
+
+
+async def _search(query: str) -> dict:
+    return {"query": query, "results": [{"title": "Tesla İzmir", "address": "Kemalpaşa"}]}
+
+
+REPLAY_TOOLS = [
+    StructuredTool.from_function(
+        coroutine=_search,
+        name=REPLAY_SCRIPT.tool_name,
+        description="Deterministic stand-in for the web search tool.",
+    )
+]
+
+
+class _ReplayEnded(Exception):
+    pass
+
+
+class _ToolCallLog(SessionEvents):
+    """Session events that keep the tool calls the agent ran instead of logging."""
+
+    __slots__ = ("calls",)
+
+    def __init__(self) -> None:
+        self.calls: dict[str, dict] = {}
+
+    def emit(self, type: str, **fields: Any) -> None:
+        if type == "tool_call":
+            self.calls[fields["call_id"]] = {
+                "name": fields["name"],
+                "arguments": fields["arguments"],
+            }
+
+
+@dataclass
+class Timeline:
+    recording: str
+    speech_ms: list[list[int]] = field(default_factory=list)
+    upstream: list[str] = field(default_factory=list)
+    downstream: list[str] = field(default_factory=list)
+    tool_calls: list[dict] = field(default_factory=list)
+
+
+@dataclass
+class ReplayResult:
+    timeline: Timeline
+    audio_s: float
+    wall_s: float
+    append_events: int
+
+
+def parse_speed(value: str) -> float:
+    return math.inf if value == "max" else float(value)
+
+
+def script_for(speed: float) -> FakeScript:
+    """REPLAY_SCRIPT with its delays scaled to the replay speed."""
+    if math.isinf(speed):
+        return replace(REPLAY_SCRIPT, response_delay_ms=0, speed=1e9)
+    return replace(
+        REPLAY_SCRIPT,
+        response_delay_ms=round(REPLAY_SCRIPT.response_delay_ms / speed),
+        speed=speed,
+    )
+
+
+def speech_spans(pcm: bytes, forwarded: bytes) -> list[list[int]]:
+    """Locate the forwarded frames in the recording and merge them into spans."""
+    spans: list[list[int]] = []
+    position = 0
+    for offset in range(0, len(forwarded) - FRAME_BYTES + 1, FRAME_BYTES):
+        frame = forwarded[offset : offset + FRAME_BYTES]
+        index = position
+        while index + FRAME_BYTES <= len(pcm) and pcm[index : index + FRAME_BYTES] != frame:
+            index += FRAME_BYTES
+        if index + FRAME_BYTES > len(pcm):
+            break
+        if spans and spans[-1][1] == index:
+            spans[-1][1] = index + FRAME_BYTES
+        else:
+            spans.append([index, index + FRAME_BYTES])
+        position = index + FRAME_BYTES
+    return [[start // 48, end // 48] for start, end in spans]
+
+
+def _collapse(entries: list[str]) -> list[str]:
+    collapsed: list[str] = []
+    run = 0
+    for i, entry in enumerate(entries):
+        run += 1
+        if i + 1 == len(entries) or entries[i + 1] != entry:
+            collapsed.append(f"{entry} x{run}" if run > 1 else entry)
+            run = 0
+    return collapsed
+
+
+async def replay(
+    path: str, pcm: bytes, *, speed: float = 1.0, chunk_ms: int = 20
+) -> ReplayResult:
+    """Stream one recording through the agent and record its timeline."""
+    timeline = Timeline(recording=os.path.basename(path))
+    forwarded: list[bytes] = []
+    downstream: list[str] = []
+    turn_started = asyncio.Event()
+    tool_log = _ToolCallLog()
+    # call_id and output of every function_call_output, in the order sent
+    tool_outputs: list[tuple[str, str]] = []
+
+    def on_upstream(event: dict) -> None:
+        t = event.get("type")
+        if t == AUDIO_INPUT_EVENT:
+            forwarded.append(base64.b64decode(event["audio"]))
+            return
+        if t == "session.update":
+            return
+        item = event.get("item") or {}
+        if item.get("type") == "function_call_output":
+            tool_outputs.append((item["call_id"], item["output"]))
+        timeline.upstream.append(f"{t}:{item['type']}" if item else t)
+
+    async def on_downstream(chunk: str | bytes) -> None:
+        if isinstance(chunk, bytes):
+            downstream.append("audio")
+            return
+        t = json.loads(chunk).get("type")
+        downstream.append(t)
+        if t == "input_audio_buffer.speech_started":
+            turn_started.set()
+
+    async with FakeRealtimeServer(script_for(speed), on_event=on_upstream) as upstream:
+
+        async def settle() -> None:
+            # until the stand-in has answered and nothing is in flight
+            idle_since = time.perf_counter()
+            while time.perf_counter() - idle_since < SETTLE_S / min(speed, 10):
+                await asyncio.sleep(0.005)
+                if upstream.responding:
+                    idle_since = time.perf_counter()
+
+        async def mic() -> AsyncIterator[bytes]:
+            chunk = chunk_ms * 48
+            interval = chunk_ms / 1000 / speed
+            clock = time.perf_counter()
+            for offset in range(0, len(pcm), chunk):
+                yield pcm[offset : offset + chunk]
+                if turn_started.is_set():
+                    await settle()
+                    turn_started.clear()
+                    clock = time.perf_counter()
+                else:
+                    clock += interval
+                await asyncio.sleep(max(0.0, clock - time.perf_counter()))
+            await settle()
+            # aconnect only returns when a stream fails
+            raise _ReplayEnded
+
+        agent = OpenAIVoiceReactAgent(
+            model="replay", api_key="fake", url=upstream.url, tools=REPLAY_TOOLS
+        )
+        start = time.perf_counter()
+        try:
+            await agent.aconnect(
+                mic(), on_downstream, binary_audio=True, events=tool_log
+            )
+        except _ReplayEnded:
+            pass
+        wall_s = time.perf_counter() - start
+
+    timeline.speech_ms = speech_spans(pcm, b"".join(forwarded))
+    # an output without a matching call shows up as a call without a name
+    timeline.tool_calls = [
+        {
+            **tool_log.calls.get(call_id, {"name": None, "arguments": None}),
+            "output": output,
+        }
+        for call_id, output in tool_outputs
+    ]
+    timeline.downstream = _collapse(downstream)
+    return ReplayResult(timeline, len(pcm) / 48000, wall_s, len(forwarded))
+
+
+def golden_path(golden_dir: str, recording: str) -> str:
+    return os.path.join(golden_dir, os.path.splitext(recording)[0] + ".json")
+
+
+def diff_timeline(timeline: Timeline, golden: dict) -> list[str]:
+    """Unified diffs of every section that differs from the golden timeline."""
+    diffs = []
+    for section, value in asdict(timeline).items():
+        expected = golden.get(section)
+        if value == expected:
+            continue
+        diffs.extend(
+            difflib.unified_diff(
+                [json.dumps(line, ensure_ascii=False) for line in expected or []],
+                [json.dumps(line, ensure_ascii=False) for line in value],
+                f"golden/{section}",
+                f"replay/{section}",
+                lineterm="",
+            )
+        )
+    return diffs
+
+
+def _replay_group(paths: list[str], speed: float, chunk_ms: int) -> dict:
+    pcms = {path: load_pcm(path) for path in set(paths)}
+
+    async def main() -> list[ReplayResult]:
+        return await asyncio.gather(
+            *(replay(path, pcms[path], speed=speed, chunk_ms=chunk_ms) for path in paths)
+        )
+
+    cpu_before = time.process_time()
+    results = asyncio.run(main())
+    return {
+        "cpu_s": time.process_time() - cpu_before,
+        "results": [asdict(result) for result in results],
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    recordings = wav_paths(args.audio)
+    paths = [recordings[i % len(recordings)] for i in range(args.replays or len(recordings))]
+    groups = [paths[i :: args.processes] for i in range(args.processes)]
+    start = time.perf_counter()
+    if args.processes == 1:
+        outputs = [_replay_group(paths, args.speed, args.chunk_ms)]
+    else:
+        with ProcessPoolExecutor(args.processes) as pool:
+            work = partial(_replay_group, speed=args.speed, chunk_ms=args.chunk_ms)
+            outputs = list(pool.map(work, [group for group in groups if group]))
+    wall_s = time.perf_counter() - start
+    results = [result for output in outputs for result in output["results"]]
+
+    mismatches: dict[str, list[str]] = {}
+    for result in results:
+        timeline = Timeline(**result["timeline"])
+        path = golden_path(args.golden, timeline.recording)
+        if args.update:
+            os.makedirs(args.golden, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(asdict(timeline), f, ensure_ascii=False, indent=2)
+                f.write("\n")
+            continue
+        if not os.path.exists(path):
+            mismatches[timeline.recording] = [f"no golden timeline at {path}"]
+            continue
+        with open(path, encoding="utf-8") as f:
+            diffs = diff_timeline(timeline, json.load(f))
+        if diffs:
+            mismatches.setdefault(timeline.recording, diffs)
+
+    audio_s = sum(result["audio_s"] for result in results)
+    cpu_s = sum(output["cpu_s"] for output in outputs)
+    return {
+        "replays": len(results),
+        "speed": "max" if math.isinf(args.speed) else args.speed,
+        "audio_s": round(audio_s, 1),
+        "wall_s": round(wall_s, 2),
+        "realtime_factor": round(audio_s / wall_s, 1),
+        "cpu_ms_per_audio_s": round(cpu_s / audio_s * 1000, 2),
+        "append_events": sum(result["append_events"] for result in results),
+        "golden": "updated" if args.update else ("mismatch" if mismatches else "match"),
+        "mismatches": mismatches,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip(),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--audio", default=os.path.join(REPO_ROOT, "recordings"))
+    parser.add_argument("--golden", default=os.path.join(REPO_ROOT, "recordings", "golden"))
+    parser.add_argument("--speed", type=parse_speed, default="1", help="N or max")
+    parser.add_argument("--chunk-ms", type=int, default=20, help="mic frame size")
+    parser.add_argument("--replays", type=int, default=0, help="0 replays each file once")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--update", action="store_true", help="write the golden timelines")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        for key, value in report.items():
+            if key != "mismatches":
+                print(f"{key:>20}: {value}")
+        for recording, diffs in report["mismatches"].items():
+            print(f"\n{recording}:")
+            print("\n".join(diffs))
+    if report["mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Concurrent-call capacity of the production serving mode per worker count.
+
+For every --workers value, starts `python src/app.py` with WORKERS set,
+pointed at the local Realtime stand-in, and steps the number of simulated
+callers up by --step until a step fails: any client error, a call turned
+away, or first-audio p99 more than --slo-ms above the script's response
+delay. Capacity is the last step that passed. Clients are spread over
+--client-processes so the load generator is not the bottleneck.
+
+    python -m bench.scaling --workers 1,2,4 --step 25 --step-duration 15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+
+from bench.audio import load_pcm, wav_paths
+from bench.fake_realtime import (
+    FakeRealtimeServer,
+    add_script_arguments,
+    script_from_args,
+)
+from bench.loadtest import (
+    REPO_ROOT,
+    ClientResult,
+    percentile_ms,
+    run_client,
+    wait_for_port,
+)
+
+
+def _client_group(
+    url: str, paths: list[str], clients: int, offset: int, args: dict
+) -> list[dict]:
+    pcms = [load_pcm(path) for path in paths]
+    results = [ClientResult() for _ in range(clients)]
+
+    async def client(index: int) -> None:
+        await asyncio.sleep(index * args["ramp"] / max(1, clients))
+        await run_client(
+            url,
+            pcms[(offset + index) % len(pcms)],
+            duration=args["step_duration"],
+            chunk_ms=args["mic_chunk_ms"],
+            binary=True,
+            result=results[index],
+        )
+
+    async def main() -> None:
+        await asyncio.gather(*(client(i) for i in range(clients)))
+
+    asyncio.run(main())
+    return [asdict(result) for result in results]
+
+
+def start_server(port: int, workers: int, upstream_url: str) -> subprocess.Popen:
+    env = {
+        # calls have ended when a step finishes, nothing to drain
+        "DRAIN_TIMEOUT": "0",
+        **os.environ,
+        "WORKERS": str(workers),
+        "PORT": str(port),
+        "OPENAI_REALTIME_URL": upstream_url,
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "fake"),
+        "RECORD_CALLS": "0",
+        "LOG_LEVEL": "WARNING",
+    }
+    process = subprocess.Popen(
+        [sys.executable, os.path.join("src", "app.py")],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    wait_for_port(port)
+    return process
+
+
+async def run_step(
+    pool: ProcessPoolExecutor, url: str, paths: list[str], clients: int, args
+) -> dict:
+    loop = asyncio.get_running_loop()
+    groups = min(args.client_processes, clients)
+    sizes = [clients // groups + (i < clients % groups) for i in range(groups)]
+    offsets = [sum(sizes[:i]) for i in range(groups)]
+    options = vars(args)
+    batches = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                pool, _client_group, url, paths, size, offset, options
+            )
+            for size, offset in zip(sizes, offsets)
+        )
+    )
+    results = [result for batch in batches for result in batch]
+    latencies = [latency for r in results for latency in r["latencies"]]
+    return {
+        "clients": clients,
+        "errors": sum(r["error"] is not None for r in results),
+        "rejected": sum(r["rejected"] is not None for r in results),
+        "responses": len(latencies),
+        "first_audio_p50_ms": round(percentile_ms(latencies, 50), 1),
+        "first_audio_p99_ms": round(percentile_ms(latencies, 99), 1),
+    }
+
+
+def step_passed(step: dict, args) -> bool:
+    limit = args.response_delay_ms + args.slo_ms
+    return (
+        step["errors"] == 0
+        and step["rejected"] == 0
+        and step["responses"] > 0
+        and step["first_audio_p99_ms"] <= limit
+    )
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    paths = wav_paths(args.audio)
+    reports = []
+    with ProcessPoolExecutor(args.client_processes) as pool:
+        async with FakeRealtimeServer(script_from_args(args)) as upstream:
+            for workers in args.workers:
+                process = start_server(args.port, workers, upstream.url)
+                steps = []
+                try:
+                    clients = args.step
+                    while clients <= args.max_clients:
+                        step = await run_step(
+                            pool, f"ws://127.0.0.1:{args.port}", paths, clients, args
+                        )
+                        steps.append(step)
+                        if not step_passed(step, args):
+                            break
+                        clients += args.step
+                finally:
+                    process.terminate()
+                    process.wait()
+                passed = [step["clients"] for step in steps if step_passed(step, args)]
+                reports.append(
+                    {
+                        "workers": workers,
+                        "capacity": max(passed, default=0),
+                        "steps": steps,
+                    }
+                )
+    return reports
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    default_workers = ",".join(
+        str(n) for n in sorted({1, *(2**i for i in range(1, 8) if 2**i <= cpus), cpus})
+    )
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[1],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--workers", default=default_workers, help="comma separated")
+    parser.add_argument("--step", type=int, default=25, help="callers added per step")
+    parser.add_argument("--max-clients", type=int, default=1000)
+    parser.add_argument("--step-duration", type=float, default=15.0, help="seconds")
+    parser.add_argument("--ramp", type=float, default=3.0, help="seconds to connect a step")
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="allowed p99 over the delay")
+    parser.add_argument("--client-processes", type=int, default=max(1, cpus // 2))
+    parser.add_argument("--audio", default=os.path.join(REPO_ROOT, "recordings"))
+    parser.add_argument("--mic-chunk-ms", type=int, default=100, help="mic chunk size")
+    parser.add_argument("--port", type=int, default=3200, help="port for the spawned app")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    add_script_arguments(parser)
+    args = parser.parse_args()
+    args.workers = [int(n) for n in args.workers.split(",")]
+
+    reports = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print(f"workers={report['workers']:>3}  capacity={report['capacity']} calls")
+            for step in report["steps"]:
+                print("    " + ", ".join(f"{k}={v}" for k, v in step.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Cold start of the server: import time and time to the first accepted call.
+
+Imports `app` in a fresh interpreter under `-X importtime` and reports the
+total, the slowest top-level imports, and whether any of the modules that
+must stay lazy (--lazy) got loaded; `config`, which the Streamlit launcher
+imports, must not load the server stack at all. Then starts `python
+src/app.py` --runs times against the local Realtime stand-in and measures,
+from process start:
+
+- accept_ms: the first /ws handshake that succeeds
+- ready_ms: the session.codec.accepted answer, sent once the call's
+  upstream session is open and the agent reads the browser's messages
+
+Exits non-zero when a lazy module was imported or a --max-* budget is
+exceeded, so it can guard against regressions.
+
+    python -m bench.startup --runs 5 --max-import-ms 1500 --max-ready-ms 4000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import websockets
+
+from bench.fake_realtime import FakeRealtimeServer, FakeScript
+from bench.loadtest import REPO_ROOT
+from server.codecs import CODEC_ACCEPTED_EVENT, CODEC_EVENT
+
+LAZY_MODULES = ["webrtcvad", "pkg_resources", "langchain_community", "aiohttp"]
+CONFIG_FORBIDDEN = ["starlette", "langchain_core", "langchain_openai_voice", "server"]
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env(**extra: str) -> dict[str, str]:
+    return {
+        **os.environ,
+        "PYTHONPATH": os.path.join(REPO_ROOT, "src"),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "fake"),
+        "RECORD_CALLS": "0",
+        "EVENT_LOG": "",
+        "LOG_LEVEL": "WARNING",
+        **extra,
+    }
+
+
+def measure_import(module: str) -> dict:
+    """Import `module` in a fresh interpreter, return its import profile."""
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT,
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = 0
+    top = []
+    children = []
+    # a module is reported after everything it imported, one level deeper
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        cumulative, depth, name = int(match[2]), len(match[3]) // 2, match[4]
+        if depth == 1:
+            children.append((cumulative, name))
+        elif depth == 0:
+            if name == module:
+                total_us = cumulative
+                top = sorted(children, reverse=True)
+            children = []
+    return {
+        "import_ms": round(total_us / 1000, 1),
+        "slowest": {name: round(us / 1000, 1) for us, name in top[:8]},
+        "modules": json.loads(result.stdout.splitlines()[-1]),
+    }
+
+
+def loaded(modules: list[str], names: list[str]) -> list[str]:
+    return [
+        name
+        for name in names
+        if any(module == name or module.startswith(name + ".") for module in modules)
+    ]
+
+
+async def measure_start(port: int, upstream_url: str, timeout: float) -> dict:
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        os.path.join("src", "app.py"),
+        cwd=REPO_ROOT,
+        env=_env(PORT=str(port), OPENAI_REALTIME_URL=upstream_url, DRAIN_TIMEOUT="0"),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with asyncio.timeout(timeout):
+            while True:
+                try:
+                    websocket = await websockets.connect(f"ws://127.0.0.1:{port}/ws")
+                    break
+                except (OSError, websockets.InvalidHandshake):
+                    await asyncio.sleep(0.01)
+            accepted = time.perf_counter()
+            try:
+                codec_request = {"type": CODEC_EVENT, "codec": "pcm16"}
+                await websocket.send(json.dumps(codec_request))
+                async for message in websocket:
+                    if isinstance(message, str) and CODEC_ACCEPTED_EVENT in message:
+                        break
+            finally:
+                await websocket.close()
+            ready = time.perf_counter()
+    finally:
+        process.terminate()
+        await process.wait()
+    return {
+        "accept_ms": round((accepted - started) * 1000, 1),
+        "ready_ms": round((ready - started) * 1000, 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    app_import = measure_import("app")
+    config_import = measure_import("config")
+    starts = []
+    async with FakeRealtimeServer(FakeScript()) as upstream:
+        for _ in range(args.runs):
+            starts.append(await measure_start(args.port, upstream.url, args.timeout))
+
+    report = {
+        "import_ms": app_import["import_ms"],
+        "slowest_imports_ms": app_import["slowest"],
+        "lazy_modules_loaded": loaded(app_import["modules"], args.lazy),
+        "config_import_ms": config_import["import_ms"],
+        "config_loads_server": loaded(config_import["modules"], CONFIG_FORBIDDEN),
+        "accept_ms": statistics.median(start["accept_ms"] for start in starts),
+        "ready_ms": statistics.median(start["ready_ms"] for start in starts),
+        "runs": starts,
+    }
+    failures = []
+    if report["lazy_modules_loaded"]:
+        failures.append(f"importing app loaded {report['lazy_modules_loaded']}")
+    if report["config_loads_server"]:
+        failures.append(f"importing config loaded {report['config_loads_server']}")
+    for key in ("import_ms", "accept_ms", "ready_ms"):
+        budget = getattr(args, f"max_{key}")
+        if budget and report[key] > budget:
+            failures.append(f"{key} {report[key]} over the budget of {budget}")
+    report["failures"] = failures
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip(),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--port", type=int, default=3100, help="for the spawned app")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per server start")
+    parser.add_argument("--lazy", nargs="*", default=LAZY_MODULES)
+    parser.add_argument("--max-import-ms", type=float, default=0, help="0 disables")
+    parser.add_argument("--max-accept-ms", type=float, default=0, help="0 disables")
+    parser.add_argument("--max-ready-ms", type=float, default=0, help="0 disables")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>20}: {value}")
+    if report["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Ortam değişkenlerinden okunan ayarlar.
+
+Sunucu ile Streamlit başlatıcısı bu modülü paylaşır; Streamlit süreci sunucu
+yığınını yüklemesin diye burada yalnızca standart kütüphane ve dotenv
+kullanılır.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+brand_name = "Tesla"
+
+# Aynı süreçte hizmet verilen markalar; tarayıcı ?brand= ile seçer
+BRANDS = [brand.strip() for brand in os.getenv("BRANDS", brand_name).split(",")]
+MODEL = "gpt-4o-realtime-preview"
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# RECORD_CALLS=1 ile görüşmeler sunucu tarafında, canlı ses akışından kaydedilir;
+# arayanların sesi diske yazıldığından varsayılan olarak kapalıdır
+RECORD_CALLS = os.getenv("RECORD_CALLS", "0") == "1"
+
+# EVENT_LOG=jsonl ya da EVENT_LOG=sqlite ile görüşme olayları (konuşma metinleri,
+# araç çağrıları, hatalar) analiz için EVENT_LOG_DIR altına yazılır; arayanların
+# söyledikleri diske yazıldığından varsayılan olarak kapalıdır
+EVENT_LOG_FORMAT = os.getenv("EVENT_LOG", "")
+EVENT_LOG_DIR = os.getenv("EVENT_LOG_DIR", "logs")
+
+# Realtime API adresi; yük testlerinde bench.fake_realtime sunucusuna yönlendirilir,
+# boşsa OpenAI'nin adresi kullanılır
+OPENAI_REALTIME_URL = os.getenv("OPENAI_REALTIME_URL", "")
+
+# OpenAI bağlantılarını önceden açık ve yapılandırılmış tutan havuz (0: kapalı)
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "0"))
+
+# Argümanları akarken erken başlatılabilecek, yan etkisiz araçlar (virgülle ayrılmış)
+SPECULATIVE_TOOLS = frozenset(
+    name.strip() for name in os.getenv("SPECULATIVE_TOOLS", "").split(",") if name.strip()
+)
+
+SERPER_API_KEY = os.getenv("SERPER_API_KEY")
+
+# Üretim modu: WORKERS süreç, worker başına en fazla MAX_CALLS_PER_WORKER görüşme
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Kapatılırken canlı görüşmelerin bitmesi için beklenecek en uzun süre (saniye)
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "600"))
+DEBUG = os.getenv("DEBUG", "0") == "1"
+PORT = int(os.getenv("PORT", "3000"))
@@ -1,26 +1,65 @@
 import asyncio
 import json
-import websockets
+import logging
+import time
+import weakref
 
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, AsyncIterator, Any, Callable, Coroutine
-from langchain_openai_voice.utils import amerge
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Collection,
+    Coroutine,
+)
+from typing import Any
+from langchain_openai_voice.batching import MicBatcher
+from langchain_openai_voice.cache import ToolResultCache, make_cache_key
+from langchain_openai_voice.metrics import SessionMetrics
+from langchain_openai_voice.pool import RealtimeConnectionPool, open_realtime_websocket
+from langchain_openai_voice.reconnect import (
+    RECONNECTED_EVENT,
+    ReconnectPolicy,
+    UpstreamLink,
+)
+from langchain_openai_voice.session import SESSION_TEMPLATES, SessionTemplate
+from langchain_openai_voice.speculation import ArgumentStream, argument_schema
+from langchain_openai_voice.state import ConversationState
+from langchain_openai_voice.utils import (
+    QueuedWriter,
+    QueuePolicy,
+    base64_decoded_len,
+    encode_audio_event,
+    extract_json_string,
+    merge_streams,
+    sniff_event_type,
+    timestamped,
+)
 
 from langchain_core.tools import BaseTool
 from langchain_core._api import beta
 from langchain_core.utils import secret_from_env
 
-from pydantic import BaseModel, Field, SecretStr, PrivateAttr
+from pydantic import BaseModel, ConfigDict, Field, SecretStr, PrivateAttr
 
 import base64
-from server.utils import is_speech
+from websockets.client import WebSocketClientProtocol
+from server.event_log import SessionEvents
+from server.recorder import CallRecorder
+from server.vad import VADGate
 
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_MODEL = "gpt-4o-realtime-preview-2024-12-17"
 DEFAULT_URL = "wss://api.openai.com/v1/realtime"
 
+AUDIO_INPUT_EVENT = "input_audio_buffer.append"
+AUDIO_OUTPUT_EVENT = "response.audio.delta"
+PLAYBACK_TRUNCATED_EVENT = "playback.truncated"
+"""Sent by the browser on barge-in with the number of samples it played."""
+
 EVENTS_TO_IGNORE = {
-    "response.function_call_arguments.delta",
     "rate_limits.updated",
     "response.audio_transcript.delta",
     "response.created",
@@ -30,69 +69,391 @@ EVENTS_TO_IGNORE = {
     "response.audio.done",
     "session.created",
     "session.updated",
-    "response.done",
     "response.output_item.done",
 }
 
 
 @asynccontextmanager
-async def connect(*, api_key: str, model: str, url: str) -> AsyncGenerator[
+async def connect(
+    *,
+    api_key: str,
+    model: str,
+    url: str,
+    passthrough: Collection[str] = (),
+    session: SessionTemplate | dict[str, Any] | None = None,
+    pool: RealtimeConnectionPool | None = None,
+    metrics: SessionMetrics | None = None,
+    reconnect: ReconnectPolicy | None = None,
+    state: ConversationState | None = None,
+) -> AsyncGenerator[
     tuple[
         Callable[[dict[str, Any] | str], Coroutine[Any, Any, None]],
-        AsyncIterator[dict[str, Any]],
+        AsyncIterator[dict[str, Any] | str],
     ],
     None,
 ]:
+    """
+    Open a Realtime API websocket.
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "OpenAI-Beta": "realtime=v1",
-    }
+    Events whose type is in `passthrough` are yielded as the raw string
+    received, without being parsed. All other events are yielded as dicts.
+
+    `session` is sent as the initial session.update; a `SessionTemplate`
+    sends its pre-serialized frame. With a `pool`, a connection already
+    configured with it is checked out when available. `metrics` counts the
+    bytes sent and received. With `reconnect`, a dropped connection is
+    replaced without ending the stream, see `UpstreamLink`; the items it
+    replays are recorded in `state` when given.
+    """
 
     url = url or DEFAULT_URL
-    url += f"?model={model}"
 
-    websocket = await websockets.connect(url, extra_headers=headers)
-    
+    if isinstance(session, SessionTemplate):
+        update_event = session.update_event
+    elif session is not None:
+        update_event = json.dumps({"type": "session.update", "session": session})
+    else:
+        update_event = None
+
+    keepalive = {
+        "ping_interval": reconnect.ping_interval if reconnect else 20.0,
+        "ping_timeout": reconnect.ping_timeout if reconnect else 20.0,
+    }
 
+    async def open_websocket() -> WebSocketClientProtocol:
+        if pool is not None and update_event is not None:
+            return await pool.acquire(
+                api_key=api_key,
+                model=model,
+                url=url,
+                update_event=update_event,
+                **keepalive,
+            )
+        websocket = await open_realtime_websocket(
+            api_key=api_key, model=model, url=url, **keepalive
+        )
+        if update_event is not None:
+            await websocket.send(update_event)
+        return websocket
+
+    link = UpstreamLink(
+        await open_websocket(),
+        open_websocket,
+        passthrough=passthrough,
+        metrics=metrics,
+        policy=reconnect,
+        state=state,
+    )
     try:
+        yield link.send, link.events()
+    finally:
+        await link.aclose()
 
-        async def send_event(event: dict[str, Any] | str) -> None:
-            formatted_event = json.dumps(event) if isinstance(event, dict) else event
-            await websocket.send(formatted_event)
 
-        async def event_stream() -> AsyncIterator[dict[str, Any]]:
-            async for raw_event in websocket:
-                yield json.loads(raw_event)
+def _coalesce_mic(
+    queued: tuple[float, str | bytes], item: tuple[float, str | bytes]
+) -> tuple[float, bytes] | None:
+    # consecutive binary mic frames are contiguous PCM; keep the older timestamp
+    if isinstance(queued[1], bytes) and isinstance(item[1], bytes):
+        return queued[0], queued[1] + item[1]
+    return None
 
-        stream: AsyncIterator[dict[str, Any]] = event_stream()
 
-        yield send_event, stream
-    finally:
-        await websocket.close()
+def _is_audio_delta(event: dict[str, Any] | str) -> bool:
+    if isinstance(event, str):
+        return sniff_event_type(event, (AUDIO_OUTPUT_EVENT,)) is not None
+    return event.get("type") == AUDIO_OUTPUT_EVENT
+
+
+QUEUE_POLICIES = {
+    # a slow upstream socket merges mic frames instead of stalling the browser
+    "input_mic": QueuePolicy(maxsize=32, on_full="coalesce", coalesce=_coalesce_mic),
+    # a browser that fell this far behind skips old audio, never control events
+    "output_speaker": QueuePolicy(
+        maxsize=256, on_full="drop_oldest", droppable=_is_audio_delta
+    ),
+    "tool_outputs": QueuePolicy(maxsize=16),
+}
+
+
+def _is_browser_audio(chunk: str | bytes) -> bool:
+    return isinstance(chunk, bytes) or _is_audio_delta(chunk)
+
+
+def _coalesce_upstream(
+    queued: tuple[dict[str, Any] | str, float | None],
+    item: tuple[dict[str, Any] | str, float | None],
+) -> tuple[str, float | None] | None:
+    # consecutive raw mic appends merge into one; keep the older timestamp
+    (event, received_at), (new_event, _) = queued, item
+    if not (isinstance(event, str) and isinstance(new_event, str)):
+        return None
+    if not (
+        sniff_event_type(event, (AUDIO_INPUT_EVENT,))
+        and sniff_event_type(new_event, (AUDIO_INPUT_EVENT,))
+    ):
+        return None
+    audio = extract_json_string(event, "audio")
+    new_audio = extract_json_string(new_event, "audio")
+    if audio is None or new_audio is None:
+        return None
+    pcm = base64.b64decode(audio) + base64.b64decode(new_audio)
+    return encode_audio_event(AUDIO_INPUT_EVENT, "audio", pcm), received_at
+
+
+# each sink is drained by its own task, so neither side waits for the other
+SINK_POLICIES = {
+    # a stalled browser skips old audio, never control events
+    "browser_out": QueuePolicy(
+        maxsize=256, on_full="drop_oldest", droppable=_is_browser_audio
+    ),
+    # a stalled upstream merges mic appends instead of holding up playback
+    "upstream_out": QueuePolicy(
+        maxsize=64, on_full="coalesce", coalesce=_coalesce_upstream
+    ),
+}
+
+
+def gate_audio(
+    gate: VADGate | None, audio: str, recorder: CallRecorder | None = None
+) -> str | None:
+    """
+    Run a base64 mic payload through the recorder and the VAD gate.
+
+    Returns None when everything was dropped, `audio` itself when the chunk
+    passed unchanged, and a re-encoded payload otherwise.
+    """
+    if gate is None and recorder is None:
+        return audio
+    chunk = base64.b64decode(audio)
+    if recorder is not None:
+        recorder.write_input(chunk)
+    if gate is None:
+        return audio
+    kept = gate.process(chunk)
+    if not kept:
+        return None
+    if len(kept) == len(chunk):
+        return audio
+    return base64.b64encode(kept).decode()
+
+
+TOOL_PROCESS_CONCURRENCY = 16
+"""Upper bound on tool calls running at once across all sessions of the process."""
+
+# one per event loop: a semaphore binds to the loop that first waits on it, and
+# tests and `bench.replay --processes` call asyncio.run more than once
+_process_tool_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _process_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _process_tool_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(TOOL_PROCESS_CONCURRENCY)
+        _process_tool_semaphores[loop] = semaphore
+    return semaphore
 
 
 class VoiceToolExecutor(BaseModel):
     """
     Can accept function calls and emits function call outputs to a stream.
+
+    Calls run concurrently, at most `max_concurrency` per session and
+    `TOOL_PROCESS_CONCURRENCY` per process. Outputs are emitted as they
+    finish, followed by a single response.create once every call of the
+    model response has been answered and the response itself is done.
+
+    Tools in `speculative_tools` are started while the model is still
+    streaming the arguments, as soon as every required argument is complete.
+    When the final arguments arrive the running call is kept if they match,
+    counting omitted arguments at their defaults, and discarded otherwise;
+    after `max_wasted_speculations` discards the session stops speculating.
+    Only list tools without side effects.
     """
 
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     tools_by_name: dict[str, BaseTool]
-    _trigger_future: asyncio.Future = PrivateAttr(default_factory=asyncio.Future)
-    _lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+    cache: ToolResultCache | None = None
+    """Shared result cache, usually one per process."""
+    metrics: SessionMetrics | None = None
+    events: SessionEvents | None = None
+    """Event log receiving every answered call with its output and duration."""
+    max_concurrency: int = 4
+    timeout: float | None = 30.0
+    """Default per-call timeout in seconds, None waits forever."""
+    tool_timeouts: dict[str, float] = Field(default_factory=dict)
+    """Per-tool overrides of `timeout`, keyed by tool name."""
+    speculative_tools: frozenset[str] = frozenset()
+    """Names of read-only tools that may start before their arguments are final."""
+    max_wasted_speculations: int = 3
+    """Discarded speculative calls after which the session stops speculating."""
+
+    _outputs: asyncio.Queue = PrivateAttr(default_factory=asyncio.Queue)
+    _tasks: dict[str, asyncio.Task] = PrivateAttr(default_factory=dict)
+    _semaphore: asyncio.Semaphore = PrivateAttr()
+    _response_active: bool = PrivateAttr(default=False)
+    _unflushed: int = PrivateAttr(default=0)
+    # call_id -> streamed arguments of a speculative tool, until it is started
+    _streams: dict[str, tuple[BaseTool, ArgumentStream]] = PrivateAttr(
+        default_factory=dict
+    )
+    # call_id -> arguments of the running speculative call with defaults filled
+    # in, the tool's defaults, and the task
+    _speculations: dict[str, tuple[dict, dict, asyncio.Task]] = PrivateAttr(
+        default_factory=dict
+    )
+    _wasted: int = PrivateAttr(default=0)
+
+    def model_post_init(self, context: Any, /) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @staticmethod
+    def _output_event(tool_call: dict, output: str) -> dict:
+        return {
+            "type": "conversation.item.create",
+            "item": {
+                "id": tool_call["call_id"],
+                "call_id": tool_call["call_id"],
+                "type": "function_call_output",
+                "output": output,
+            },
+        }
+
+    def tool_call_started(self, item: dict) -> None:
+        """Start following the arguments of a function call item the model opened."""
+        tool = self.tools_by_name.get(item.get("name"))
+        if (
+            tool is None
+            or tool.name not in self.speculative_tools
+            or self._wasted >= self.max_wasted_speculations
+        ):
+            return
+        self._streams[item["call_id"]] = (tool, ArgumentStream())
+
+    def add_arguments_delta(self, event: dict) -> None:
+        """Feed a response.function_call_arguments.delta, maybe starting the call."""
+        call_id = event.get("call_id")
+        entry = self._streams.get(call_id)
+        if entry is None:
+            return
+        tool, stream = entry
+        args = stream.feed(event.get("delta", ""))
+        if args is None:
+            return
+        required, defaults = argument_schema(tool)
+        if not (stream.closed or required <= args.keys()):
+            return
+        del self._streams[call_id]
+        tool_call = {"call_id": call_id, "name": tool.name}
+        task = self._start_tool(tool, args, tool_call)
+        self._speculations[call_id] = ({**defaults, **args}, defaults, task)
+        if self.metrics is not None:
+            self.metrics.speculation(tool.name, "started")
+
+    def _take_speculation(self, tool_call: dict) -> asyncio.Task | None:
+        self._streams.pop(tool_call["call_id"], None)
+        speculation = self._speculations.pop(tool_call["call_id"], None)
+        if speculation is None:
+            return None
+        effective_args, defaults, task = speculation
+        try:
+            final_args = json.loads(tool_call["arguments"])
+        except json.JSONDecodeError:
+            final_args = None
+        # the call must be the one the final arguments would start, a field
+        # missing from them runs with its default
+        confirmed = (
+            isinstance(final_args, dict)
+            and {**defaults, **final_args} == effective_args
+        )
+        if not confirmed:
+            self._discard(task)
+            return None
+        if self.metrics is not None:
+            self.metrics.speculation(tool_call["name"], "confirmed")
+        return task
 
-    async def _trigger_func(self) -> dict:  # returns a tool call
-        return await self._trigger_future
+    def _discard(self, task: asyncio.Task) -> None:
+        task.cancel()
+        self._wasted += 1
+        if self.metrics is not None:
+            self.metrics.speculation(task.get_name(), "discarded")
 
     async def add_tool_call(self, tool_call: dict) -> None:
-        # lock to avoid simultaneous tool calls racing and missing
-        # _trigger_future being
-        async with self._lock:
-            if self._trigger_future.done():
-                # TODO: handle simultaneous tool calls better
-                raise ValueError("Tool call adding already in progress")
-
-            self._trigger_future.set_result(tool_call)
+        self._response_active = True
+        started = time.perf_counter()
+        try:
+            task = self._take_speculation(tool_call) or await self._create_tool_call_task(
+                tool_call
+            )
+        except ValueError as e:
+            # immediately answer with the error, no task is started
+            output = self._output_event(tool_call, f"Error: {e!s}")
+            self._log_call(tool_call, output, started)
+            self._emit(output)
+            return
+        self._tasks[tool_call["call_id"]] = task
+        task.add_done_callback(
+            lambda task: self._on_tool_done(tool_call, task, started)
+        )
+
+    def response_done(self) -> None:
+        """Mark the model response that requested the pending calls as done."""
+        self._response_active = False
+        # calls of the response that never got their final arguments
+        for *_, task in self._speculations.values():
+            self._discard(task)
+        self._speculations.clear()
+        self._streams.clear()
+        self._maybe_flush()
+
+    def cancel(self) -> None:
+        """Cancel running tool calls, e.g. when the user barges in."""
+        for call_id, task in self._tasks.items():
+            task.cancel()
+            self._outputs.put_nowait(
+                self._output_event(
+                    {"call_id": call_id}, "Error: cancelled, the user interrupted"
+                )
+            )
+        self._tasks.clear()
+        self._unflushed = 0
+        for *_, task in self._speculations.values():
+            self._discard(task)
+        self._speculations.clear()
+        self._streams.clear()
+
+    def _emit(self, event: dict) -> None:
+        self._outputs.put_nowait(event)
+        self._unflushed += 1
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if self._unflushed and not self._tasks and not self._response_active:
+            self._outputs.put_nowait({"type": "response.create", "response": {}})
+            self._unflushed = 0
+
+    def _on_tool_done(self, tool_call: dict, task: asyncio.Task, started: float) -> None:
+        # cancelled calls were already answered by cancel()
+        if task.cancelled() or self._tasks.pop(tool_call["call_id"], None) is None:
+            return
+        self._log_call(tool_call, task.result(), started)
+        self._emit(task.result())
+
+    def _log_call(self, tool_call: dict, output: dict, started: float) -> None:
+        if self.events is None:
+            return
+        # from the final arguments, a speculative call may have started earlier
+        self.events.emit(
+            "tool_call",
+            call_id=tool_call["call_id"],
+            name=tool_call["name"],
+            arguments=tool_call["arguments"],
+            output=output["item"]["output"],
+            ms=round((time.perf_counter() - started) * 1000, 1),
+        )
 
     async def _create_tool_call_task(self, tool_call: dict) -> asyncio.Task[dict]:
         tool = self.tools_by_name.get(tool_call["name"])
@@ -111,58 +472,50 @@ class VoiceToolExecutor(BaseModel):
                 f"failed to parse arguments `{tool_call['arguments']}`. Must be valid JSON."
             )
 
-        async def run_tool() -> dict:
-            result = await tool.ainvoke(args)
+        return self._start_tool(tool, args, tool_call)
+
+    def _start_tool(self, tool: BaseTool, args: dict, tool_call: dict) -> asyncio.Task[dict]:
+        timeout = self.tool_timeouts.get(tool.name, self.timeout)
+
+        async def invoke() -> str:
+            async with self._semaphore, _process_semaphore():
+                result = await tool.ainvoke(args)
             try:
-                result_str = json.dumps(result)
+                return json.dumps(result)
             except TypeError:
                 # not json serializable, use str
-                result_str = str(result)
-            return {
-                "type": "conversation.item.create",
-                "item": {
-                    "id": tool_call["call_id"],
-                    "call_id": tool_call["call_id"],
-                    "type": "function_call_output",
-                    "output": result_str,
-                },
-            }
-
-        task = asyncio.create_task(run_tool())
+                return str(result)
+
+        async def run_tool() -> dict:
+            if self.cache is not None:
+                call = self.cache.get_or_call(make_cache_key(tool.name, args), invoke)
+            else:
+                call = invoke()
+            start = time.perf_counter()
+            try:
+                result_str = await asyncio.wait_for(call, timeout)
+            except TimeoutError:
+                result_str = f"Error: tool {tool.name} timed out after {timeout}s"
+            except Exception as e:
+                # the model is told about the failure instead of the call hanging
+                logger.warning("tool %s failed", tool.name, exc_info=True)
+                result_str = f"Error: {e!s}"
+            if self.metrics is not None:
+                self.metrics.tool_done(tool.name, time.perf_counter() - start)
+            return self._output_event(tool_call, result_str)
+
+        task = asyncio.create_task(run_tool(), name=tool.name)
         return task
 
     async def output_iterator(self) -> AsyncIterator[dict]:  # yield events
-        trigger_task = asyncio.create_task(self._trigger_func())
-        tasks = set([trigger_task])
         while True:
-            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-            for task in done:
-                tasks.remove(task)
-                if task == trigger_task:
-                    async with self._lock:
-                        self._trigger_future = asyncio.Future()
-                    trigger_task = asyncio.create_task(self._trigger_func())
-                    tasks.add(trigger_task)
-                    tool_call = task.result()
-                    try:
-                        new_task = await self._create_tool_call_task(tool_call)
-                        tasks.add(new_task)
-                    except ValueError as e:
-                        yield {
-                            "type": "conversation.item.create",
-                            "item": {
-                                "id": tool_call["call_id"],
-                                "call_id": tool_call["call_id"],
-                                "type": "function_call_output",
-                                "output": (f"Error: {str(e)}"),
-                            },
-                        }
-                else:
-                    yield task.result()
+            yield await self._outputs.get()
 
 
 @beta()
 class OpenAIVoiceReactAgent(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     model: str
     api_key: SecretStr = Field(
         alias="openai_api_key",
@@ -171,115 +524,343 @@ class OpenAIVoiceReactAgent(BaseModel):
     instructions: str | None = None
     tools: list[BaseTool] | None = None
     url: str = Field(default=DEFAULT_URL)
+    audio_passthrough: bool = True
+    """Forward audio events as raw strings instead of parsing and re-encoding them."""
+    input_sample_rate: int = 24000
+    """Sample rate of the PCM16 audio in input_audio_buffer.append events."""
+    vad_mode: int | None = 3
+    """webrtcvad aggressiveness used to drop silent mic audio, None disables it."""
+    tool_cache: ToolResultCache | None = None
+    """Result cache shared by the tool executors of all sessions."""
+    connection_pool: RealtimeConnectionPool | None = None
+    """Pool of pre-configured upstream connections shared by all sessions."""
+    session_template: SessionTemplate | None = None
+    """Prebuilt session configuration; by default looked up in SESSION_TEMPLATES."""
+    reconnect: ReconnectPolicy | None = ReconnectPolicy()
+    """Reconnect policy for dropped upstream connections, None ends the call instead."""
+    speculative_tools: frozenset[str] = frozenset()
+    """Read-only tools started from streamed arguments, see `VoiceToolExecutor`."""
+    mic_batch_ms: tuple[int, int] | None = (40, 100)
+    """Min and max window of mic audio per upstream append event, None sends every chunk."""
 
     async def aconnect(
         self,
-        input_stream: AsyncIterator[str],
-        send_output_chunk: Callable[[str], Coroutine[Any, Any, None]],
+        input_stream: AsyncIterator[str | bytes],
+        send_output_chunk: Callable[[str | bytes], Coroutine[Any, Any, None]],
+        *,
+        binary_audio: bool = False,
+        recorder: CallRecorder | None = None,
+        state: ConversationState | None = None,
+        events: SessionEvents | None = None,
     ) -> None:
         """
         Connect to the OpenAI API and send and receive messages.
 
-        input_stream: AsyncIterator[str]
+        input_stream: AsyncIterator[str | bytes]
             Stream of input events to send to the model. Usually transports input_audio_buffer.append events from the microphone.
-        output: Callable[[str], None]
+            Bytes items are taken as raw PCM16 mic audio.
+        output: Callable[[str | bytes], None]
             Callback to receive output events from the model. Usually sends response.audio.delta events to the speaker.
+        binary_audio: bool
+            Send model audio to `output` as raw PCM16 bytes instead of response.audio.delta events.
+        recorder: CallRecorder | None
+            Opened recorder that receives a copy of the mic and model audio.
+        state: ConversationState | None
+            Bounded record of the conversation and played audio, created per call if not given.
+        events: SessionEvents | None
+            Event log receiving transcripts, tool calls and errors of the call.
 
         """
         # formatted_tools: list[BaseTool] = [
         #     tool if isinstance(tool, BaseTool) else tool_converter.wr(tool)  # type: ignore
         #     for tool in self.tools or []
         # ]
-        tools_by_name = {tool.name: tool for tool in self.tools}
-        tool_executor = VoiceToolExecutor(tools_by_name=tools_by_name)
-        
-        
-
-        async with connect(
-            model=self.model, api_key=self.api_key.get_secret_value(), url=self.url
-        ) as (
-            model_send,
-            model_receive_stream,
-        ):
-            # sent tools and instructions with initial chunk
-            tool_defs = [
-                {
-                    "type": "function",
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": {"type": "object", "properties": tool.args},
-                }
-                for tool in tools_by_name.values()
-            ]
-            await model_send(
-                {
-                    "type": "session.update",
-                    "session": {
-                        "instructions": self.instructions,
-                        "input_audio_transcription": {
-                            "model": "gpt-4o-transcribe",
-                            "language": "tr", 
-                            "prompt": "Profesyonel müşteri temsilcisi görüşmelerine ait ses kaydı transkripsiyonu. Lütfen, kullanıcının söylediği ifadeleri olduğu gibi, herhangi bir yorum, özet veya yeniden ifade yapmadan metne dökün. Özellikle, yer adları, Türkiye'deki il/ilçe isimleri gibi özel isimleri orijinal biçimleriyle koruyun. Eğer ses girişi boşsa, sadece sessizlik ya da anlamsız seslerden oluşuyorsa, hiçbir transkripsiyon üretmeyin. Cevabınızı uzatmadan, mantıklı bir cümleyle tamamlayınız.Cevabınız sırasında kullanıcı bir şeyler söylerse, DURMAYIN. Sesli yanıtınızı her zaman tamamlayın.",
-
-                        },
-                        "turn_detection": {
-                            "type": "server_vad",
-                            "threshold": 0.6,
-                            "prefix_padding_ms": 300,
-                            "silence_duration_ms": 500,
-                            "create_response": True,
-                        },
-                        "tools": tool_defs,
-                        # "temperature": 0.6,
-                    },
-                }
+        # tools and instructions are sent with the initial session.update,
+        # serialized once per configuration
+        template = self.session_template or SESSION_TEMPLATES.get(
+            model=self.model, instructions=self.instructions, tools=self.tools or []
+        )
+        tool_executor = VoiceToolExecutor(
+            tools_by_name=template.tools_by_name,
+            cache=self.tool_cache,
+            speculative_tools=self.speculative_tools,
+            events=events,
+        )
+        vad_gate = (
+            VADGate(sample_rate=self.input_sample_rate, mode=self.vad_mode)
+            if self.vad_mode is not None
+            else None
+        )
+        if state is None:
+            state = ConversationState(
+                max_items=self.reconnect.history_items if self.reconnect else 24
             )
-            
-            
-            async for stream_key, data_raw in amerge(
-                input_mic=input_stream,
-                output_speaker=model_receive_stream,
-                tool_outputs=tool_executor.output_iterator(),
-            ):
-                try:
-                    data = json.loads(data_raw) if isinstance(data_raw, str) else data_raw
-                except json.JSONDecodeError:
-                    print("error decoding data:", data_raw)
-                    continue
-
-                if stream_key == "input_mic":
-                    if data.get("type") == "input_audio_buffer.append" and "audio" in data:
-                        audio_bytes = base64.b64decode(data["audio"])
-                        
-                        if not is_speech(audio_bytes, sample_rate=16000):
+        batcher = (
+            MicBatcher(self.input_sample_rate, *self.mic_batch_ms)
+            if self.mic_batch_ms is not None
+            else None
+        )
+        batch_started_at = 0.0
+        flush_timer: asyncio.TimerHandle | None = None
+        overdue_flushes: set[asyncio.Task] = set()
+
+        passthrough = (AUDIO_OUTPUT_EVENT,) if self.audio_passthrough else ()
+
+        metrics = SessionMetrics()
+        tool_executor.metrics = metrics
+
+        async def deliver_browser(chunk: str | bytes) -> None:
+            await send_output_chunk(chunk)
+            metrics.browser_out.value += len(chunk)
+
+        browser_writer = QueuedWriter(
+            "browser_out",
+            deliver_browser,
+            SINK_POLICIES["browser_out"],
+            on_depth=metrics.queue_depth,
+            on_drop=metrics.queue_dropped,
+        )
+        send_browser = browser_writer.write
+
+        async def deliver_upstream(
+            item: tuple[dict[str, Any] | str, float | None],
+        ) -> None:
+            event, received_at = item
+            await model_send(event)
+            if received_at is not None:
+                metrics.mic_sent(received_at)
+
+        upstream_writer = QueuedWriter(
+            "upstream_out",
+            deliver_upstream,
+            SINK_POLICIES["upstream_out"],
+            on_depth=metrics.queue_depth,
+        )
+
+        async def send_upstream(
+            event: dict[str, Any] | str, received_at: float | None = None
+        ) -> None:
+            # `received_at` marks mic audio, timed when it actually goes out
+            await upstream_writer.write((event, received_at))
+
+        try:
+            async with connect(
+                model=self.model,
+                api_key=self.api_key.get_secret_value(),
+                url=self.url,
+                passthrough=passthrough,
+                session=template,
+                pool=self.connection_pool,
+                metrics=metrics,
+                reconnect=self.reconnect,
+                state=state,
+            ) as (
+                model_send,
+                model_receive_stream,
+            ), upstream_writer:
+
+                async def send_mic(pcm: bytes, received_at: float) -> None:
+                    # raw PCM16 from the mic, base64-encoded once per batch for the API
+                    nonlocal batch_started_at
+                    if recorder is not None:
+                        recorder.write_input(pcm)
+                    if vad_gate is not None:
+                        pcm = vad_gate.process(pcm)
+                    if batcher is not None:
+                        if not pcm:
+                            # the gate may only be waiting for a full frame
+                            if vad_gate is None or vad_gate.forwarding:
+                                return
+                            pcm = batcher.end()
+                        else:
+                            if not batcher.pending:
+                                batch_started_at = received_at
+                            pcm = batcher.push(pcm)
+                        received_at = batch_started_at
+                        batch_settled()
+                    if pcm:
+                        await send_upstream(
+                            encode_audio_event(AUDIO_INPUT_EVENT, "audio", pcm), received_at
+                        )
+
+                async def flush_mic() -> None:
+                    # audio held for a batch goes out before any later mic event
+                    pcm = batcher.flush() if batcher is not None else None
+                    if batcher is not None:
+                        batch_settled()
+                    if pcm:
+                        await send_upstream(
+                            encode_audio_event(AUDIO_INPUT_EVENT, "audio", pcm),
+                            batch_started_at,
+                        )
+
+                def batch_settled() -> None:
+                    # a partial batch is due max_ms after its first chunk, even if
+                    # the mic goes quiet (mute, end of utterance) and nothing follows
+                    nonlocal flush_timer
+                    if batcher.pending and flush_timer is None:
+                        due = batch_started_at + batcher.max_ms / 1000
+                        flush_timer = asyncio.get_running_loop().call_later(
+                            max(0.0, due - time.perf_counter()), flush_overdue
+                        )
+                    elif not batcher.pending and flush_timer is not None:
+                        flush_timer.cancel()
+                        flush_timer = None
+
+                def flush_overdue() -> None:
+                    nonlocal flush_timer
+                    flush_timer = None
+                    task = asyncio.create_task(flush_mic())
+                    overdue_flushes.add(task)
+                    # a failed send ends the main loop too, this marks it retrieved
+                    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                    task.add_done_callback(overdue_flushes.discard)
+
+                async for stream_key, data_raw in merge_streams(
+                    {
+                        "input_mic": timestamped(input_stream),
+                        "output_speaker": model_receive_stream,
+                        "tool_outputs": tool_executor.output_iterator(),
+                    },
+                    QUEUE_POLICIES,
+                    on_depth=metrics.queue_depth,
+                    on_drop=metrics.queue_dropped,
+                ):
+                    if stream_key == "input_mic":
+                        received_at, data_raw = data_raw
+                        metrics.browser_in.value += len(data_raw)
+
+                    if isinstance(data_raw, bytes):
+                        await send_mic(data_raw, received_at)
+                        continue
+
+                    # fast path: audio frames are forwarded as the original string
+                    if self.audio_passthrough and isinstance(data_raw, str):
+                        if stream_key == "output_speaker":
+                            # connect() only yields strings for passthrough events
+                            delta = extract_json_string(data_raw, "delta") or ""
+                            metrics.audio_delta()
+                            state.add_audio(
+                                extract_json_string(data_raw, "item_id"),
+                                base64_decoded_len(delta) // 2,
+                            )
+                            if binary_audio or recorder is not None:
+                                pcm = base64.b64decode(delta)
+                                if recorder is not None:
+                                    recorder.write_output(pcm)
+                            if not binary_audio:
+                                await send_browser(data_raw)
+                            elif pcm:
+                                await send_browser(pcm)
+                            continue
+                        if stream_key == "input_mic" and sniff_event_type(
+                            data_raw, (AUDIO_INPUT_EVENT,)
+                        ):
+                            audio = extract_json_string(data_raw, "audio")
+                            if batcher is not None and audio:
+                                await send_mic(base64.b64decode(audio), received_at)
+                                continue
+                            gated = gate_audio(vad_gate, audio, recorder) if audio else audio
+                            if gated is None:
+                                continue
+                            if gated is audio:
+                                await send_upstream(data_raw, received_at)
+                            else:
+                                await send_upstream(
+                                    {"type": AUDIO_INPUT_EVENT, "audio": gated}, received_at
+                                )
                             continue
-                    await model_send(data)
-                elif stream_key == "tool_outputs":
-                    print("tool output", data)
-                    await model_send(data)
-                    await model_send({"type": "response.create", "response": {}})
-                elif stream_key == "output_speaker":
-                    t = data["type"]
-                    if t == "response.audio.delta" and "delta" in data:
-                        audio_bytes = base64.b64decode(data["delta"])
-                        
-                        await send_output_chunk(json.dumps(data))
-                    elif t == "input_audio_buffer.speech_started":
-                        print("interrupt")
-                        await send_output_chunk(json.dumps(data))
-                    elif t == "error":
-                        print("error:", data)
-                    elif t == "response.function_call_arguments.done":
-                        print("tool call", data)
-                        await tool_executor.add_tool_call(data)
-                    elif t == "response.audio_transcript.done":
-                        print("model:", data["transcript"])
-                    elif t == "conversation.item.input_audio_transcription.completed":
-                        print("user:", data["transcript"])
-                    elif t in EVENTS_TO_IGNORE:
-                        pass
-                    else:
-                        print(t)
 
+                    try:
+                        data = json.loads(data_raw) if isinstance(data_raw, str) else data_raw
+                    except json.JSONDecodeError:
+                        logger.warning("error decoding data: %s", data_raw)
+                        continue
+
+                    if stream_key == "input_mic":
+                        if batcher is not None and data.get("type") == AUDIO_INPUT_EVENT:
+                            if data.get("audio"):
+                                await send_mic(base64.b64decode(data["audio"]), received_at)
+                            continue
+                        await flush_mic()
+                        if data.get("type") == PLAYBACK_TRUNCATED_EVENT:
+                            # browser-side event, only used to truncate the model's audio
+                            truncate = state.truncate(int(data.get("played_samples", 0)))
+                            if truncate is not None:
+                                await send_upstream(truncate)
+                            continue
+                        if data.get("type") == AUDIO_INPUT_EVENT and "audio" in data:
+                            gated = gate_audio(vad_gate, data["audio"], recorder)
+                            if gated is None:
+                                continue
+                            data["audio"] = gated
+                            await send_upstream(data, received_at)
+                            continue
+                        await send_upstream(data)
+                    elif stream_key == "tool_outputs":
+                        logger.info("tool output %s", data)
+                        await send_upstream(data)
+                    elif stream_key == "output_speaker":
+                        t = data["type"]
+                        if t == AUDIO_OUTPUT_EVENT and "delta" in data:
+                            metrics.audio_delta()
+                            state.add_audio(
+                                data.get("item_id"), base64_decoded_len(data["delta"]) // 2
+                            )
+                            if binary_audio or recorder is not None:
+                                pcm = base64.b64decode(data["delta"])
+                                if recorder is not None:
+                                    recorder.write_output(pcm)
+                            if binary_audio:
+                                await send_browser(pcm)
+                            else:
+                                await send_browser(json.dumps(data))
+                        elif t == "input_audio_buffer.speech_started":
+                            logger.info("interrupt")
+                            tool_executor.cancel()
+                            await send_browser(json.dumps(data))
+                        elif t == "input_audio_buffer.speech_stopped":
+                            metrics.speech_stopped()
+                        elif t == RECONNECTED_EVENT:
+                            # item ids of the dropped session are gone upstream
+                            state.forget_audio()
+                            await send_browser(json.dumps(data))
+                        elif t == "error":
+                            logger.error("error: %s", data)
+                            if events is not None:
+                                events.emit("error", error=data.get("error"))
+                        elif t == "response.output_item.added":
+                            if data["item"].get("type") == "function_call":
+                                tool_executor.tool_call_started(data["item"])
+                        elif t == "response.function_call_arguments.delta":
+                            tool_executor.add_arguments_delta(data)
+                        elif t == "response.function_call_arguments.done":
+                            logger.info("tool call %s", data)
+                            await tool_executor.add_tool_call(data)
+                        elif t == "response.done":
+                            tool_executor.response_done()
+                        elif t == "response.audio_transcript.done":
+                            logger.info("model: %s", data["transcript"])
+                            if events is not None:
+                                events.emit("model", text=data["transcript"])
+                        elif t == "conversation.item.input_audio_transcription.completed":
+                            logger.info("user: %s", data["transcript"])
+                            if events is not None:
+                                events.emit("user", text=data["transcript"])
+                        elif t in EVENTS_TO_IGNORE:
+                            pass
+                        else:
+                            logger.debug("unhandled event %s", t)
+
+        finally:
+            await browser_writer.aclose()
+            if flush_timer is not None:
+                flush_timer.cancel()
+            for task in overdue_flushes:
+                task.cancel()
+            if vad_gate is not None:
+                metrics.close(vad_gate.frames_total, vad_gate.frames_forwarded)
+            else:
+                metrics.close()
 
 __all__ = ["OpenAIVoiceReactAgent"]
\ No newline at end of file
@@ -0,0 +1,62 @@
+class MicBatcher:
+    """
+    Packs mic PCM into fewer, larger input_audio_buffer.append events.
+
+    The first audio after silence is sent right away, so speech onsets are
+    not delayed. After that the window starts at `min_ms` and doubles with
+    every batch up to `max_ms`. `end()` marks the end of a speech run, e.g.
+    when the VAD gate starts dropping audio, and returns what is left.
+
+    The batcher has no clock of its own: a caller whose audio may stop, e.g.
+    on mute, flushes a partial batch once it is `max_ms` old.
+    """
+
+    def __init__(
+        self, sample_rate: int = 24000, min_ms: int = 40, max_ms: int = 100
+    ) -> None:
+        bytes_per_ms = sample_rate * 2 // 1000
+        self.max_ms = max(max_ms, min_ms)
+        self.min_bytes = min_ms * bytes_per_ms
+        self.max_bytes = self.max_ms * bytes_per_ms
+        self.chunks = 0
+        self.batches = 0
+
+        self._parts: list[bytes] = []
+        self._size = 0
+        self._window = self.min_bytes
+        self._speaking = False
+
+    @property
+    def pending(self) -> int:
+        """Bytes waiting for the current window to fill."""
+        return self._size
+
+    def push(self, pcm: bytes) -> bytes | None:
+        """Add a chunk and return a batch if one should be sent now."""
+        if not pcm:
+            return None
+        self.chunks += 1
+        self._parts.append(pcm)
+        self._size += len(pcm)
+        if not self._speaking:
+            self._speaking = True
+            self._window = self.min_bytes
+            return self.flush()
+        if self._size < self._window:
+            return None
+        self._window = min(self._window * 2, self.max_bytes)
+        return self.flush()
+
+    def end(self) -> bytes | None:
+        self._speaking = False
+        return self.flush()
+
+    def flush(self) -> bytes | None:
+        if not self._size:
+            return None
+        parts = self._parts
+        batch = parts[0] if len(parts) == 1 else b"".join(parts)
+        self._parts = []
+        self._size = 0
+        self.batches += 1
+        return batch
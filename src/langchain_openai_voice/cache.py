@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from langchain_openai_voice.metrics import Histogram
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def make_cache_key(tool_name: str, args: dict) -> str:
+    """Key a tool call by tool name and its arguments as normalized JSON."""
+    normalized = json.dumps(
+        _normalize(args), sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return f"{tool_name}:{normalized}"
+
+
+class ToolResultCache:
+    """
+    Process-wide TTL + LRU cache for serialized tool results.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once there are more than `max_entries` or their results add up to
+    more than `max_bytes`. Identical calls that arrive while one is already in
+    flight wait for it instead of going upstream again, even across sessions.
+    Failures are never cached. Upstream call durations also go to
+    `upstream_latency` when given.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600.0,
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        upstream_latency: Histogram | None = None,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.upstream_latency = upstream_latency
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+        self.size_bytes = 0
+
+        # key -> (expires_at, result)
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "upstream_calls": self.upstream_calls,
+            "upstream_avg_seconds": (
+                self.upstream_seconds / self.upstream_calls
+                if self.upstream_calls
+                else 0.0
+            ),
+        }
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+        size = len(result)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self.size_bytes += size
+        while (
+            len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        _, result = self._entries.pop(key)
+        self.size_bytes -= len(result)
+
+    async def get_or_call(
+        self, key: str, call: Callable[[], Awaitable[str]]
+    ) -> str:
+        """Return the cached result for `key`, calling upstream at most once."""
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._call_upstream(key, call))
+            # the failure is still raised to callers, this only marks it retrieved
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        # shielded so a caller being cancelled does not cancel the shared call
+        return await asyncio.shield(task)
+
+    async def _call_upstream(self, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        start = time.perf_counter()
+        try:
+            result = await call()
+            self.put(key, result)
+            return result
+        finally:
+            seconds = time.perf_counter() - start
+            self.upstream_calls += 1
+            self.upstream_seconds += seconds
+            if self.upstream_latency is not None:
+                self.upstream_latency.observe(seconds)
+            del self._inflight[key]
@@ -0,0 +1,333 @@
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+
+from langchain_openai_voice.state import live_state_bytes
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._children: dict[Labels, Counter | Histogram] = {}
+
+    def _new(self) -> Counter | Histogram:
+        raise NotImplementedError
+
+    def labels(self, **labels: str):
+        key = tuple(sorted(labels.items()))
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new()
+        return child
+
+    def render(self, const: Labels = ()) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples(const)
+
+    def _samples(self, const: Labels) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class CounterFamily(_Family):
+    kind = "counter"
+
+    def _new(self) -> Counter:
+        return Counter()
+
+    def _samples(self, const: Labels) -> Iterator[str]:
+        for labels, counter in self._children.items():
+            yield f"{self.name}{_format_labels(const + labels)} {counter.value}"
+
+
+class HistogramFamily(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]) -> None:
+        super().__init__(name, help)
+        self.buckets = buckets
+
+    def _new(self) -> Histogram:
+        return Histogram(self.buckets)
+
+    def _samples(self, const: Labels) -> Iterator[str]:
+        for labels, histogram in self._children.items():
+            labels = const + labels
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {histogram.sum}"
+            yield f"{self.name}_count{_format_labels(labels)} {histogram.count}"
+
+
+class GaugeFamily(_Family):
+    """Gauge whose value is read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]) -> None:
+        super().__init__(name, help)
+        self.read = read
+
+    def _samples(self, const: Labels) -> Iterator[str]:
+        yield f"{self.name}{_format_labels(const)} {self.read()}"
+
+
+class ReadCounterFamily(_Family):
+    """
+    Counter whose value is read from a callback at scrape time.
+
+    For counts another object keeps anyway. With `label`, the callback
+    returns a dict of counts keyed by that label's value.
+    """
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], float | dict[str, float]],
+        label: str = "",
+    ) -> None:
+        super().__init__(name, help)
+        self.read = read
+        self.label = label
+
+    def _samples(self, const: Labels) -> Iterator[str]:
+        value = self.read()
+        if not self.label:
+            yield f"{self.name}{_format_labels(const)} {value}"
+            return
+        for label_value, count in value.items():
+            labels = const + ((self.label, label_value),)
+            yield f"{self.name}{_format_labels(labels)} {count}"
+
+
+class MetricsRegistry:
+    """Process-wide metric families, rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._families: dict[str, _Family] = {}
+
+    def _register(self, family: _Family) -> _Family:
+        return self._families.setdefault(family.name, family)
+
+    def counter(self, name: str, help: str) -> CounterFamily:
+        return self._register(CounterFamily(name, help))
+
+    def histogram(
+        self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> HistogramFamily:
+        return self._register(HistogramFamily(name, help, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> GaugeFamily:
+        return self._register(GaugeFamily(name, help, read))
+
+    def read_counter(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], float | dict[str, float]],
+        label: str = "",
+    ) -> ReadCounterFamily:
+        return self._register(ReadCounterFamily(name, help, read, label))
+
+    def snapshot(self, **const_labels: str) -> dict[str, list[str]]:
+        """Rendered lines per family, header first, `const_labels` on each sample."""
+        const = tuple(sorted(const_labels.items()))
+        return {
+            name: list(family.render(const)) for name, family in self._families.items()
+        }
+
+    def render(self, **const_labels: str) -> str:
+        return merge_snapshots([self.snapshot(**const_labels)])
+
+
+def merge_snapshots(snapshots: list[dict[str, list[str]]]) -> str:
+    """The Prometheus text of several registry snapshots, e.g. one per process."""
+    families: dict[str, list[str]] = {}
+    for snapshot in snapshots:
+        for name, lines in snapshot.items():
+            if name in families:
+                # the HELP and TYPE lines appear once per family
+                families[name].extend(lines[2:])
+            else:
+                families[name] = list(lines)
+    return "\n".join(line for lines in families.values() for line in lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+SESSIONS = REGISTRY.counter("voice_sessions_total", "Voice sessions started.")
+MIC_TO_UPSTREAM = REGISTRY.histogram(
+    "voice_mic_to_upstream_seconds",
+    "Time from a mic frame arriving from the browser to it being sent upstream.",
+)
+FIRST_AUDIO = REGISTRY.histogram(
+    "voice_first_audio_seconds",
+    "Time from input_audio_buffer.speech_stopped to the first response.audio.delta.",
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    "voice_tool_seconds", "Tool call duration as seen by the session, per tool."
+)
+TOOL_SPECULATIONS = REGISTRY.counter(
+    "voice_tool_speculations_total",
+    "Tool calls started from streamed arguments, per tool and outcome.",
+)
+TOOL_CACHE_UPSTREAM = REGISTRY.histogram(
+    "voice_tool_cache_upstream_seconds",
+    "Duration of the tool calls the result cache had to make upstream.",
+)
+QUEUE_DEPTH = REGISTRY.histogram(
+    "voice_queue_depth", "Sampled depth of per-session queues.", DEPTH_BUCKETS
+)
+QUEUE_DROPPED = REGISTRY.counter(
+    "voice_queue_dropped_total", "Items discarded from full per-session queues."
+)
+AUDIO_BYTES = REGISTRY.counter(
+    "voice_bytes_total", "Bytes moved per direction, as sent on the wire."
+)
+RECONNECT_SECONDS = REGISTRY.histogram(
+    "voice_upstream_reconnect_seconds",
+    "Time from an upstream drop to the replacement session being ready.",
+)
+VAD_FRAMES = REGISTRY.counter(
+    "voice_vad_frames_total", "Mic frames seen by the VAD gate."
+)
+VAD_DROP_RATIO = REGISTRY.histogram(
+    "voice_vad_drop_ratio",
+    "Share of mic frames dropped by the VAD, per session.",
+    RATIO_BUCKETS,
+)
+
+_active_sessions = 0
+REGISTRY.gauge(
+    "voice_sessions_active", "Voice sessions in progress.", lambda: _active_sessions
+)
+REGISTRY.gauge(
+    "voice_session_state_bytes",
+    "Bytes held by the conversation state of all live sessions.",
+    live_state_bytes,
+)
+
+
+class SessionMetrics:
+    """
+    Timers and counters of one voice session, feeding the process registry.
+
+    Everything on the per-frame path is a plain attribute update on objects
+    resolved once in `__init__`.
+    """
+
+    __slots__ = (
+        "_closed",
+        "_first_audio",
+        "_mic_to_upstream",
+        "_queue_depth",
+        "_speech_stopped_at",
+        "browser_in",
+        "browser_out",
+        "upstream_in",
+        "upstream_out",
+    )
+
+    def __init__(self) -> None:
+        global _active_sessions
+        _active_sessions += 1
+        SESSIONS.labels().inc()
+        self.browser_in = AUDIO_BYTES.labels(direction="browser_in")
+        self.browser_out = AUDIO_BYTES.labels(direction="browser_out")
+        self.upstream_in = AUDIO_BYTES.labels(direction="upstream_in")
+        self.upstream_out = AUDIO_BYTES.labels(direction="upstream_out")
+        self._mic_to_upstream = MIC_TO_UPSTREAM.labels()
+        self._first_audio = FIRST_AUDIO.labels()
+        self._queue_depth: dict[str, Histogram] = {}
+        self._speech_stopped_at: float | None = None
+        self._closed = False
+
+    def mic_sent(self, received_at: float) -> None:
+        self._mic_to_upstream.observe(time.perf_counter() - received_at)
+
+    def speech_stopped(self) -> None:
+        self._speech_stopped_at = time.perf_counter()
+
+    def audio_delta(self) -> None:
+        if self._speech_stopped_at is not None:
+            self._first_audio.observe(time.perf_counter() - self._speech_stopped_at)
+            self._speech_stopped_at = None
+
+    def tool_done(self, tool: str, seconds: float) -> None:
+        TOOL_SECONDS.labels(tool=tool).observe(seconds)
+
+    def speculation(self, tool: str, outcome: str) -> None:
+        TOOL_SPECULATIONS.labels(tool=tool, outcome=outcome).inc()
+
+    def queue_depth(self, queue: str, depth: int) -> None:
+        histogram = self._queue_depth.get(queue)
+        if histogram is None:
+            histogram = self._queue_depth[queue] = QUEUE_DEPTH.labels(queue=queue)
+        histogram.observe(depth)
+
+    def reconnected(self, seconds: float) -> None:
+        RECONNECT_SECONDS.labels().observe(seconds)
+
+    def queue_dropped(self, queue: str) -> None:
+        QUEUE_DROPPED.labels(queue=queue).inc()
+
+    def close(self, frames_total: int = 0, frames_forwarded: int = 0) -> None:
+        """End the session, recording its VAD totals."""
+        global _active_sessions
+        if self._closed:
+            return
+        self._closed = True
+        _active_sessions -= 1
+        if frames_total:
+            VAD_FRAMES.labels(result="forwarded").inc(frames_forwarded)
+            VAD_FRAMES.labels(result="dropped").inc(frames_total - frames_forwarded)
+            VAD_DROP_RATIO.labels().observe(1 - frames_forwarded / frames_total)
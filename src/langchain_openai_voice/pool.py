@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import deque
+from typing import Any
+
+import websockets
+from websockets.client import WebSocketClientProtocol
+
+logger = logging.getLogger(__name__)
+
+
+async def open_realtime_websocket(
+    *,
+    api_key: str,
+    model: str,
+    url: str,
+    ping_interval: float | None = 20.0,
+    ping_timeout: float | None = 20.0,
+) -> WebSocketClientProtocol:
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "OpenAI-Beta": "realtime=v1",
+    }
+    return await websockets.connect(
+        f"{url}?model={model}",
+        extra_headers=headers,
+        ping_interval=ping_interval,
+        ping_timeout=ping_timeout,
+    )
+
+
+async def wait_for_event(
+    websocket: WebSocketClientProtocol, event_type: str, timeout: float
+) -> dict[str, Any]:
+    """Read events until one of `event_type` arrives, raising on `error`."""
+    async with asyncio.timeout(timeout):
+        async for raw_event in websocket:
+            event = json.loads(raw_event)
+            if event["type"] == event_type:
+                return event
+            if event["type"] == "error":
+                raise RuntimeError(f"realtime session setup failed: {event}")
+    raise ConnectionError("connection closed during session setup")
+
+
+class RealtimeConnectionPool:
+    """
+    Keeps Realtime API connections open and configured ahead of calls.
+
+    Connections are grouped by a fingerprint of (api key, url, model,
+    serialized session.update frame, keepalive). Each group is topped back up to `size` idle
+    connections in the background every time one is checked out. Idle
+    connections are pinged every `ping_interval` seconds and recycled after
+    `max_age` seconds, since the upstream session clock starts ticking as
+    soon as they are configured.
+
+    A checkout with no idle connection falls back to opening a fresh one.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_age: float = 300.0,
+        ping_interval: float = 20.0,
+        setup_timeout: float = 10.0,
+    ) -> None:
+        self.size = size
+        self.max_age = max_age
+        self.ping_interval = ping_interval
+        self.setup_timeout = setup_timeout
+        self.hits = 0
+        self.misses = 0
+
+        # fingerprint -> idle (created_at, websocket), oldest first
+        self._idle: dict[str, deque[tuple[float, WebSocketClientProtocol]]] = {}
+        # fingerprint -> connect arguments, used to refill
+        self._specs: dict[str, dict[str, Any]] = {}
+        self._refills: dict[str, asyncio.Task] = {}
+        self._background: set[asyncio.Task] = set()
+        self._maintainer: asyncio.Task | None = None
+
+    @staticmethod
+    def fingerprint(
+        *,
+        api_key: str,
+        model: str,
+        url: str,
+        update_event: str,
+        ping_interval: float | None,
+        ping_timeout: float | None,
+    ) -> str:
+        payload = "\0".join(
+            (api_key, url, model, update_event, str(ping_interval), str(ping_timeout))
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def idle_count(self) -> int:
+        return sum(len(idle) for idle in self._idle.values())
+
+    async def acquire(
+        self,
+        *,
+        api_key: str,
+        model: str,
+        url: str,
+        update_event: str,
+        ping_interval: float | None = 20.0,
+        ping_timeout: float | None = 20.0,
+    ) -> WebSocketClientProtocol:
+        """
+        Check out a connection that was already sent `update_event`.
+
+        `ping_interval` and `ping_timeout` are the keepalive of the
+        connection once it carries a call, as for `open_realtime_websocket`.
+        """
+        spec = {
+            "api_key": api_key,
+            "model": model,
+            "url": url,
+            "update_event": update_event,
+            "ping_interval": ping_interval,
+            "ping_timeout": ping_timeout,
+        }
+        key = self.fingerprint(**spec)
+        self._specs[key] = spec
+        self._start_maintainer()
+
+        websocket = self._pop_healthy(key)
+        self._schedule_refill(key)
+        if websocket is not None:
+            self.hits += 1
+            return websocket
+
+        # cold path: same as connecting without a pool
+        self.misses += 1
+        websocket = await open_realtime_websocket(
+            api_key=api_key,
+            model=model,
+            url=url,
+            ping_interval=ping_interval,
+            ping_timeout=ping_timeout,
+        )
+        await websocket.send(update_event)
+        return websocket
+
+    async def prewarm(
+        self,
+        *,
+        api_key: str,
+        model: str,
+        url: str,
+        update_event: str,
+        ping_interval: float | None = 20.0,
+        ping_timeout: float | None = 20.0,
+    ) -> None:
+        """Fill the group for this configuration before the first call arrives."""
+        spec = {
+            "api_key": api_key,
+            "model": model,
+            "url": url,
+            "update_event": update_event,
+            "ping_interval": ping_interval,
+            "ping_timeout": ping_timeout,
+        }
+        key = self.fingerprint(**spec)
+        self._specs[key] = spec
+        self._start_maintainer()
+        self._schedule_refill(key)
+        await asyncio.shield(self._refills[key])
+
+    async def aclose(self) -> None:
+        tasks = [*self._refills.values(), *self._background]
+        if self._maintainer is not None:
+            tasks.append(self._maintainer)
+            self._maintainer = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for idle in self._idle.values():
+            await asyncio.gather(
+                *(websocket.close() for _, websocket in idle), return_exceptions=True
+            )
+        self._idle.clear()
+
+    def _start_maintainer(self) -> None:
+        if self._maintainer is None:
+            self._maintainer = asyncio.create_task(self._maintain())
+
+    def _pop_healthy(self, key: str) -> WebSocketClientProtocol | None:
+        idle = self._idle.get(key)
+        while idle:
+            created_at, websocket = idle.popleft()
+            if websocket.open and time.monotonic() - created_at < self.max_age:
+                return websocket
+            self._discard(websocket)
+        return None
+
+    def _discard(self, websocket: WebSocketClientProtocol) -> None:
+        task = asyncio.create_task(websocket.close())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _schedule_refill(self, key: str) -> None:
+        if key not in self._refills:
+            self._refills[key] = asyncio.create_task(self._refill(key))
+
+    async def _open_warm(self, spec: dict[str, Any]) -> WebSocketClientProtocol:
+        websocket = await open_realtime_websocket(
+            api_key=spec["api_key"],
+            model=spec["model"],
+            url=spec["url"],
+            ping_interval=spec["ping_interval"],
+            ping_timeout=spec["ping_timeout"],
+        )
+        try:
+            await websocket.send(spec["update_event"])
+            await wait_for_event(websocket, "session.updated", self.setup_timeout)
+        except BaseException:
+            self._discard(websocket)
+            raise
+        return websocket
+
+    async def _refill(self, key: str) -> None:
+        idle = self._idle.setdefault(key, deque())
+        try:
+            while len(idle) < self.size:
+                websocket = await self._open_warm(self._specs[key])
+                idle.append((time.monotonic(), websocket))
+        except (OSError, RuntimeError, websockets.WebSocketException) as e:
+            # unreachable, refused or failed setup; the next checkout retries
+            logger.warning("connection pool refill failed: %s", e)
+        finally:
+            del self._refills[key]
+
+    async def _ping(self, websocket: WebSocketClientProtocol) -> bool:
+        try:
+            pong = await websocket.ping()
+            await asyncio.wait_for(pong, self.ping_interval / 2)
+            return True
+        except (TimeoutError, websockets.WebSocketException):
+            return False
+
+    async def _maintain(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            for key, idle in list(self._idle.items()):
+                now = time.monotonic()
+                for entry in list(idle):
+                    created_at, websocket = entry
+                    if not websocket.open or now - created_at >= self.max_age:
+                        idle.remove(entry)
+                        self._discard(websocket)
+                entries = list(idle)
+                alive = await asyncio.gather(
+                    *(self._ping(websocket) for _, websocket in entries)
+                )
+                for entry, ok in zip(entries, alive):
+                    # entries may have been checked out while pinging
+                    if not ok and entry in idle:
+                        idle.remove(entry)
+                        self._discard(entry[1])
+                if len(idle) < self.size:
+                    self._schedule_refill(key)
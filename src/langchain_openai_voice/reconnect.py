@@ -0,0 +1,241 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Collection
+from dataclasses import dataclass
+from typing import Any
+
+import websockets
+from websockets.client import WebSocketClientProtocol
+
+from langchain_openai_voice.metrics import SessionMetrics
+from langchain_openai_voice.state import ConversationState
+from langchain_openai_voice.utils import sniff_event_type
+
+logger = logging.getLogger(__name__)
+
+RECONNECTED_EVENT = "session.reconnected"
+_AUDIO_APPEND = ("input_audio_buffer.append",)
+
+
+@dataclass(frozen=True)
+class ReconnectPolicy:
+    """When and how a dropped upstream connection is re-established."""
+
+    max_attempts: int = 6
+    base_delay: float = 0.1
+    max_delay: float = 3.0
+    """Backoff cap; attempt n waits uniformly in [0, min(max_delay, base_delay * 2**n)]."""
+    connect_timeout: float = 5.0
+    ping_interval: float = 5.0
+    ping_timeout: float = 5.0
+    """A connection that does not answer pings in time counts as dropped."""
+    buffer_ms: int = 5000
+    """Mic audio held while reconnecting; older audio is dropped first."""
+    history_items: int = 24
+    """Recent conversation items replayed into the new session."""
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class UpstreamLink:
+    """
+    The client side of one Realtime API session.
+
+    Without a `policy` this is a thin wrapper around the websocket and a drop
+    ends the call. With one, a dropped connection is replaced transparently:
+    the session config (`open_websocket` sends it) and the recent history are
+    replayed, events sent meanwhile are held and flushed in order, and
+    `events()` yields a `session.reconnected` event. A response that was in
+    flight is reported as a cancelled response.done so that callers waiting
+    for it do not stall.
+
+    Conversation items are recorded in `state` when given, so the session can
+    share one ConversationState with its other users; with a policy and no
+    state the link keeps its own.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocketClientProtocol,
+        open_websocket: Callable[[], Awaitable[WebSocketClientProtocol]],
+        *,
+        passthrough: Collection[str] = (),
+        metrics: SessionMetrics | None = None,
+        policy: ReconnectPolicy | None = None,
+        state: ConversationState | None = None,
+    ) -> None:
+        self.websocket = websocket
+        self.passthrough = passthrough
+        self.metrics = metrics
+        self.policy = policy
+        if state is None and policy is not None:
+            state = ConversationState(max_items=policy.history_items)
+        self.history = state
+        self.reconnects = 0
+        self._open = open_websocket
+        self._closed = False
+        self._reconnecting = False
+        self._response_active = False
+        # held while reconnecting: control events in order, mic audio bounded
+        self._pending: deque[str] = deque()
+        self._audio: deque[str] = deque()
+        self._audio_chars = 0
+        # 24 kHz PCM16 is 48 bytes/ms, 64 characters/ms once base64-encoded
+        self._max_audio_chars = policy.buffer_ms * 64 if policy else 0
+        self.dropped_audio = 0
+        # dropped connections still closing, awaited by aclose()
+        self._closing: set[asyncio.Task] = set()
+
+    async def send(self, event: dict[str, Any] | str) -> None:
+        formatted_event = json.dumps(event) if isinstance(event, dict) else event
+        if (
+            self.history is not None
+            and isinstance(event, dict)
+            and event.get("type") == "conversation.item.create"
+        ):
+            self.history.observe_sent(event)
+        if self._reconnecting:
+            self._hold(formatted_event)
+            return
+        try:
+            await self.websocket.send(formatted_event)
+        except websockets.ConnectionClosed:
+            if self.policy is None or self._closed:
+                raise
+            # events() notices the drop too and reconnects
+            self._hold(formatted_event)
+            return
+        if self.metrics is not None:
+            self.metrics.upstream_out.value += len(formatted_event)
+
+    def _hold(self, formatted_event: str) -> None:
+        if not sniff_event_type(formatted_event, _AUDIO_APPEND):
+            self._pending.append(formatted_event)
+            return
+        self._audio.append(formatted_event)
+        self._audio_chars += len(formatted_event)
+        while self._audio_chars > self._max_audio_chars and len(self._audio) > 1:
+            self._audio_chars -= len(self._audio.popleft())
+            self.dropped_audio += 1
+
+    async def events(self) -> AsyncIterator[dict[str, Any] | str]:
+        """
+        Yield events, raw strings for `passthrough` types and dicts otherwise.
+        """
+        passthrough = self.passthrough
+        while True:
+            try:
+                async for raw_event in self.websocket:
+                    if self.metrics is not None:
+                        self.metrics.upstream_in.value += len(raw_event)
+                    if passthrough and sniff_event_type(raw_event, passthrough):
+                        yield raw_event
+                        continue
+                    event = json.loads(raw_event)
+                    if self.history is not None:
+                        self._observe(event)
+                    yield event
+            except websockets.ConnectionClosedError:
+                if self.policy is None:
+                    raise
+            if self.policy is None or self._closed:
+                return
+            for event in await self._reconnect():
+                yield event
+
+    def _observe(self, event: dict[str, Any]) -> None:
+        t = event.get("type")
+        if t == "response.created":
+            self._response_active = True
+        elif t == "response.done":
+            self._response_active = False
+        self.history.observe(event)
+
+    async def _reconnect(self) -> list[dict[str, Any]]:
+        policy = self.policy
+        started = time.perf_counter()
+        self._reconnecting = True
+        self._close_in_background(self.websocket)
+        logger.warning("upstream connection dropped, reconnecting")
+
+        for attempt in range(policy.max_attempts):
+            await asyncio.sleep(policy.delay(attempt))
+            websocket = None
+            try:
+                async with asyncio.timeout(policy.connect_timeout):
+                    websocket = await self._open()
+                    for frame in self.history.replay():
+                        await websocket.send(frame)
+                    # pop only once sent, a failed attempt keeps them for the next
+                    while self._pending:
+                        await websocket.send(self._pending[0])
+                        self._pending.popleft()
+                    while self._audio:
+                        await websocket.send(self._audio[0])
+                        self._audio_chars -= len(self._audio.popleft())
+                break
+            except (TimeoutError, OSError, websockets.WebSocketException) as e:
+                logger.warning("reconnect attempt %d failed: %s", attempt + 1, e)
+                if websocket is not None:
+                    self._close_in_background(websocket)
+        else:
+            raise ConnectionError(
+                f"upstream reconnect failed after {policy.max_attempts} attempts"
+            )
+
+        self.websocket = websocket
+        self._reconnecting = False
+        self.reconnects += 1
+        elapsed = time.perf_counter() - started
+        if self.metrics is not None:
+            self.metrics.reconnected(elapsed)
+        logger.info("upstream reconnected in %.0f ms", elapsed * 1000)
+
+        events: list[dict[str, Any]] = []
+        if self._response_active:
+            self._response_active = False
+            events.append(
+                {
+                    "type": "response.done",
+                    "response": {
+                        "status": "cancelled",
+                        "status_details": {"type": "cancelled", "reason": "reconnect"},
+                    },
+                }
+            )
+        events.append(
+            {
+                "type": RECONNECTED_EVENT,
+                "attempt": attempt + 1,
+                "recovery_ms": round(elapsed * 1000, 1),
+                "replayed_items": len(self.history.items),
+            }
+        )
+        return events
+
+    def _close_in_background(self, websocket: WebSocketClientProtocol) -> None:
+        # a dead connection can take its close timeout, the reconnect does not wait
+        task = asyncio.create_task(websocket.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closed_in_background)
+
+    def _closed_in_background(self, task: asyncio.Task) -> None:
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("closing a dropped connection failed: %r", task.exception())
+
+    async def aclose(self, close_timeout: float = 1.0) -> None:
+        self._closed = True
+        await self.websocket.close()
+        if not self._closing:
+            return
+        closing = list(self._closing)
+        _, pending = await asyncio.wait(closing, timeout=close_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*closing, return_exceptions=True)
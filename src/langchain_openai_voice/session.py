@@ -0,0 +1,112 @@
+import dataclasses
+import json
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.tools import BaseTool
+
+TRANSCRIPTION_PROMPT = "Profesyonel müşteri temsilcisi görüşmelerine ait ses kaydı transkripsiyonu. Lütfen, kullanıcının söylediği ifadeleri olduğu gibi, herhangi bir yorum, özet veya yeniden ifade yapmadan metne dökün. Özellikle, yer adları, Türkiye'deki il/ilçe isimleri gibi özel isimleri orijinal biçimleriyle koruyun. Eğer ses girişi boşsa, sadece sessizlik ya da anlamsız seslerden oluşuyorsa, hiçbir transkripsiyon üretmeyin. Cevabınızı uzatmadan, mantıklı bir cümleyle tamamlayınız.Cevabınız sırasında kullanıcı bir şeyler söylerse, DURMAYIN. Sesli yanıtınızı her zaman tamamlayın."
+
+
+def tool_definition(tool: BaseTool) -> dict[str, Any]:
+    return {
+        "type": "function",
+        "name": tool.name,
+        "description": tool.description,
+        "parameters": {"type": "object", "properties": tool.args},
+    }
+
+
+def build_session(
+    instructions: str | None, tools: Sequence[BaseTool]
+) -> dict[str, Any]:
+    """The session.update payload sent when a call starts."""
+    return {
+        "instructions": instructions,
+        "input_audio_transcription": {
+            "model": "gpt-4o-transcribe",
+            "language": "tr",
+            "prompt": TRANSCRIPTION_PROMPT,
+        },
+        "turn_detection": {
+            "type": "server_vad",
+            "threshold": 0.6,
+            "prefix_padding_ms": 300,
+            "silence_duration_ms": 500,
+            "create_response": True,
+        },
+        "tools": [tool_definition(tool) for tool in tools],
+        # "temperature": 0.6,
+    }
+
+
+@dataclass(frozen=True)
+class SessionTemplate:
+    """
+    Everything a call needs from its configuration, computed once.
+
+    `session` is shared between calls and must not be modified.
+    """
+
+    session: dict[str, Any]
+    update_event: str
+    """The serialized session.update frame, sent as is."""
+    tools_by_name: dict[str, BaseTool]
+
+    @classmethod
+    def build(
+        cls, instructions: str | None, tools: Sequence[BaseTool]
+    ) -> "SessionTemplate":
+        session = build_session(instructions, tools)
+        return cls(
+            session=session,
+            update_event=json.dumps({"type": "session.update", "session": session}),
+            tools_by_name={tool.name: tool for tool in tools},
+        )
+
+
+class SessionTemplateRegistry:
+    """
+    Session templates keyed by (model, instructions, tool definitions).
+
+    Tools are told apart by what the model sees of them: name, description
+    and argument schema. The `maxsize` most recently used templates are kept,
+    so per-tenant instructions cannot grow the registry without bound.
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        self._templates: OrderedDict[tuple, SessionTemplate] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def get(
+        self, *, model: str, instructions: str | None, tools: Sequence[BaseTool]
+    ) -> SessionTemplate:
+        key = (
+            model,
+            instructions,
+            tuple(
+                (tool.name, tool.description, json.dumps(tool.args, sort_keys=True))
+                for tool in tools
+            ),
+        )
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = SessionTemplate.build(instructions, tools)
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+            return template
+        self._templates.move_to_end(key)
+        if any(template.tools_by_name.get(tool.name) is not tool for tool in tools):
+            # same definitions, other tool objects: calls must reach these ones
+            template = dataclasses.replace(
+                template, tools_by_name={tool.name: tool for tool in tools}
+            )
+        return template
+
+
+SESSION_TEMPLATES = SessionTemplateRegistry()
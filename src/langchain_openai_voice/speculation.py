@@ -0,0 +1,69 @@
+import json
+from typing import Any
+
+from langchain_core.tools import BaseTool
+
+
+class ArgumentStream:
+    """
+    Incremental scanner over streamed function-call arguments.
+
+    A top-level field is complete once the scanner has seen the comma or the
+    closing brace that follows its value; from then on the model can no
+    longer change it. `feed` returns the complete fields whenever a delta
+    completed at least one more of them.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        # whether the closing brace of the object has been streamed
+        self.closed = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, delta: str) -> dict[str, Any] | None:
+        start = len(self.text)
+        self.text += delta
+        end = None
+        for i in range(start, len(self.text)):
+            c = self.text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    end = i
+                    self.closed = True
+            elif c == "," and self._depth == 1:
+                end = i
+        if end is None:
+            return None
+        try:
+            fields = json.loads(self.text[:end] + "}")
+        except json.JSONDecodeError:
+            return None
+        return fields if isinstance(fields, dict) else None
+
+
+def argument_schema(tool: BaseTool) -> tuple[frozenset[str], dict[str, Any]]:
+    """
+    The arguments a call of `tool` cannot do without, all of them if none are
+    marked required, and the defaults of the others.
+    """
+    schema = tool.get_input_schema().model_json_schema()
+    properties = schema.get("properties") or {}
+    required = frozenset(schema.get("required") or properties)
+    defaults = {
+        name: spec["default"] for name, spec in properties.items() if "default" in spec
+    }
+    return required, defaults
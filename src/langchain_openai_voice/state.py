@@ -0,0 +1,232 @@
+import json
+import sys
+import weakref
+from collections.abc import Iterator
+from typing import Any
+
+# kinds of conversation items kept in ConversationState.items
+MESSAGE = 0
+FUNCTION_CALL = 1
+FUNCTION_CALL_OUTPUT = 2
+
+
+class Ring:
+    """
+    Fixed-capacity FIFO over a list allocated up front.
+
+    Appending to a full ring overwrites the oldest entry, so the memory it
+    holds is bounded by `capacity` entries no matter how long a call runs.
+    """
+
+    __slots__ = ("_entries", "_len", "_start")
+
+    def __init__(self, capacity: int) -> None:
+        self._entries: list[Any] = [None] * max(1, capacity)
+        self._start = 0
+        self._len = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._entries)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        capacity = len(self._entries)
+        for i in range(self._len):
+            yield self._entries[(self._start + i) % capacity]
+
+    def append(self, entry: Any) -> Any:
+        """Add `entry` and return the entry it evicted, if any."""
+        capacity = len(self._entries)
+        if self._len < capacity:
+            self._entries[(self._start + self._len) % capacity] = entry
+            self._len += 1
+            return None
+        evicted = self._entries[self._start]
+        self._entries[self._start] = entry
+        self._start = (self._start + 1) % capacity
+        return evicted
+
+    def last(self) -> Any:
+        if not self._len:
+            return None
+        return self._entries[(self._start + self._len - 1) % len(self._entries)]
+
+    def clear(self) -> None:
+        for i in range(len(self._entries)):
+            self._entries[i] = None
+        self._start = 0
+        self._len = 0
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sys.getsizeof(self._entries)
+
+
+class _AudioSpan:
+    __slots__ = ("item_id", "samples", "start")
+
+    def __init__(self, item_id: str, start: int, samples: int) -> None:
+        self.item_id = item_id
+        # offset of the first sample within the session's output audio
+        self.start = start
+        self.samples = samples
+
+
+_live_states: "weakref.WeakSet[ConversationState]" = weakref.WeakSet()
+
+
+class ConversationState:
+    """
+    Compact record of one session's conversation, bounded in memory.
+
+    `items` holds the last `max_items` messages, function calls and outputs
+    as tuples, texts cut to `max_text_chars`; they are replayed into a new
+    upstream session after a reconnect. `audio` maps the assistant audio sent
+    to the browser since the last barge-in onto item ids and sample offsets,
+    for at most `max_audio_items` items, so that what the user actually heard
+    can be truncated.
+    """
+
+    __slots__ = (
+        "__weakref__",
+        "_trimmed",
+        "audio",
+        "audio_sent",
+        "items",
+        "max_text_chars",
+        "sample_rate",
+    )
+
+    def __init__(
+        self,
+        *,
+        max_items: int = 24,
+        max_audio_items: int = 64,
+        max_text_chars: int = 4000,
+        sample_rate: int = 24000,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.max_text_chars = max_text_chars
+        self.items = Ring(max_items)
+        self.audio = Ring(max_audio_items)
+        # samples of assistant audio sent to the browser over the whole session
+        self.audio_sent = 0
+        # samples of spans evicted from `audio` since the last truncation
+        self._trimmed = 0
+        _live_states.add(self)
+
+    # conversation items
+
+    def _text(self, text: str) -> str:
+        return text if len(text) <= self.max_text_chars else text[: self.max_text_chars]
+
+    def observe(self, event: dict[str, Any]) -> None:
+        """Record an item from an event received from the API."""
+        t = event.get("type")
+        if t == "conversation.item.input_audio_transcription.completed":
+            if event.get("transcript"):
+                self.items.append((MESSAGE, "user", self._text(event["transcript"])))
+        elif t == "response.audio_transcript.done":
+            if event.get("transcript"):
+                self.items.append((MESSAGE, "assistant", self._text(event["transcript"])))
+        elif t == "response.function_call_arguments.done":
+            self.items.append(
+                (FUNCTION_CALL, event["call_id"], event["name"], self._text(event["arguments"]))
+            )
+
+    def observe_sent(self, event: dict[str, Any]) -> None:
+        """Record an item the client created, i.e. a tool output."""
+        item = event.get("item") or {}
+        if item.get("type") == "function_call_output":
+            self.items.append(
+                (FUNCTION_CALL_OUTPUT, item["call_id"], self._text(item["output"]))
+            )
+
+    def replay(self) -> list[str]:
+        """conversation.item.create frames that rebuild the items in a new session."""
+        calls = {item[1] for item in self.items if item[0] == FUNCTION_CALL}
+        frames = []
+        for item in self.items:
+            if item[0] == MESSAGE:
+                content_type = "input_text" if item[1] == "user" else "text"
+                body = {
+                    "type": "message",
+                    "role": item[1],
+                    "content": [{"type": content_type, "text": item[2]}],
+                }
+            elif item[0] == FUNCTION_CALL:
+                body = {
+                    "type": "function_call",
+                    "call_id": item[1],
+                    "name": item[2],
+                    "arguments": item[3],
+                }
+            elif item[1] in calls:
+                body = {"type": "function_call_output", "call_id": item[1], "output": item[2]}
+            else:
+                # an output whose call was evicted would be rejected
+                continue
+            frames.append(json.dumps({"type": "conversation.item.create", "item": body}))
+        return frames
+
+    # assistant audio played in the browser
+
+    def add_audio(self, item_id: str | None, n_samples: int) -> None:
+        if not item_id or n_samples <= 0:
+            return
+        last = self.audio.last()
+        if last is not None and last.item_id == item_id:
+            last.samples += n_samples
+        else:
+            evicted = self.audio.append(_AudioSpan(item_id, self.audio_sent, n_samples))
+            if evicted is not None:
+                self._trimmed += evicted.samples
+        self.audio_sent += n_samples
+
+    def forget_audio(self) -> None:
+        """Drop the item ids but keep counting their samples, e.g. after a reconnect."""
+        self._trimmed += sum(span.samples for span in self.audio)
+        self.audio.clear()
+
+    def truncate(self, played_samples: int) -> dict | None:
+        """Return the truncate event for `played_samples`, or None if all was heard."""
+        played = played_samples - self._trimmed
+        spans = list(self.audio)
+        self.audio.clear()
+        self._trimmed = 0
+        if played < 0:
+            return None
+        for span in spans:
+            if played < span.samples:
+                return {
+                    "type": "conversation.item.truncate",
+                    "item_id": span.item_id,
+                    "content_index": 0,
+                    "audio_end_ms": played * 1000 // self.sample_rate,
+                }
+            played -= span.samples
+        return None
+
+    # memory accounting
+
+    def memory_report(self) -> dict[str, int]:
+        """Approximate bytes held, per structure."""
+        items = sys.getsizeof(self.items) + sum(
+            sys.getsizeof(item) + sum(sys.getsizeof(field) for field in item)
+            for item in self.items
+        )
+        audio = sys.getsizeof(self.audio) + sum(
+            sys.getsizeof(span) + sys.getsizeof(span.item_id) for span in self.audio
+        )
+        own = object.__sizeof__(self)
+        return {"items": items, "audio": audio, "total": own + items + audio}
+
+    def memory_bytes(self) -> int:
+        return self.memory_report()["total"]
+
+
+def live_state_bytes() -> int:
+    """Bytes held by the conversation state of every session still alive."""
+    return sum(state.memory_bytes() for state in list(_live_states))
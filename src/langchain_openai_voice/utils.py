@@ -1,25 +1,287 @@
 import asyncio
-from typing import AsyncIterator, TypeVar
+import base64
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Collection
+from dataclasses import dataclass
+from functools import cache, partial
+from typing import Any, Generic, Literal, TypeVar
 
 T = TypeVar("T")
 
+# how many leading characters of a raw event are inspected when sniffing its
+# type. Both OpenAI and the browser put "type" first, so this stays small.
+SNIFF_WINDOW = 64
 
-async def amerge(**streams: AsyncIterator[T]) -> AsyncIterator[tuple[str, T]]:
-    """Merge multiple streams into one stream."""
-    nexts: dict[asyncio.Task, str] = {
-        asyncio.create_task(anext(stream)): key for key, stream in streams.items()
-    }
-    while nexts:
-        done, _ = await asyncio.wait(nexts, return_when=asyncio.FIRST_COMPLETED)
-        for task in done:
-            key = nexts.pop(task)
-            stream = streams[key]
-            try:
-                yield key, task.result()
-                nexts[asyncio.create_task(anext(stream))] = key
-            except StopAsyncIteration:
-                pass
-            except Exception as e:
-                for task in nexts:
-                    task.cancel()
-                raise e
+
+@dataclass(frozen=True)
+class QueuePolicy:
+    """
+    How much of a source `merge_streams` buffers and what happens when it is full.
+
+    block: stop reading the source until the consumer catches up.
+    drop_oldest: discard the oldest buffered item that `droppable` accepts.
+    coalesce: fold the new item into the newest buffered one with `coalesce`.
+
+    drop_oldest and coalesce fall back to block when no item qualifies
+    (`droppable` accepts nothing buffered, or `coalesce` returns None).
+    """
+
+    maxsize: int = 64
+    on_full: Literal["block", "drop_oldest", "coalesce"] = "block"
+    droppable: Callable[[Any], bool] | None = None
+    coalesce: Callable[[Any, Any], Any | None] | None = None
+
+
+DEFAULT_QUEUE_POLICY = QueuePolicy()
+
+
+def _make_room(
+    key: str,
+    policy: QueuePolicy,
+    items: deque,
+    item: Any,
+    on_drop: Callable[[str], None] | None,
+) -> bool:
+    """Apply the full-queue policy to `items`; True if `item` was absorbed."""
+    if policy.on_full == "coalesce" and policy.coalesce is not None:
+        merged = policy.coalesce(items[-1], item)
+        if merged is not None:
+            items[-1] = merged
+            return True
+    elif policy.on_full == "drop_oldest":
+        for i, queued in enumerate(items):
+            if policy.droppable is None or policy.droppable(queued):
+                del items[i]
+                if on_drop is not None:
+                    on_drop(key)
+                break
+    return False
+
+
+class _Source:
+    __slots__ = ("done", "items", "key", "not_full", "policy", "stream")
+
+    def __init__(self, key: str, stream: AsyncIterator, policy: QueuePolicy) -> None:
+        self.key = key
+        self.stream = stream
+        self.policy = policy
+        self.items: deque = deque()
+        self.not_full = asyncio.Event()
+        self.done = False
+
+
+async def merge_streams(
+    streams: dict[str, AsyncIterator[T]],
+    policies: dict[str, QueuePolicy] | None = None,
+    *,
+    on_depth: Callable[[str, int], None] | None = None,
+    on_drop: Callable[[str], None] | None = None,
+) -> AsyncIterator[tuple[str, T]]:
+    """
+    Merge multiple streams into one stream of (key, item).
+
+    Every source is read by one long-lived pump task into its own bounded
+    buffer, handled according to its `QueuePolicy`. Sources are served
+    round-robin, so a busy source cannot starve the others. When a source
+    raises, every pump is cancelled and the error is re-raised here; sources
+    that simply end are dropped. `on_depth` is called with the buffer depth
+    left behind each yielded item, `on_drop` for every discarded item.
+    """
+    policies = policies or {}
+    sources = [
+        _Source(key, stream, policies.get(key, DEFAULT_QUEUE_POLICY))
+        for key, stream in streams.items()
+    ]
+    wakeup = asyncio.Event()
+    failure: list[BaseException] = []
+
+    async def pump(source: _Source) -> None:
+        items = source.items
+        maxsize = source.policy.maxsize
+        async for item in source.stream:
+            if len(items) >= maxsize and _make_room(
+                source.key, source.policy, items, item, on_drop
+            ):
+                continue
+            while len(items) >= maxsize:
+                source.not_full.clear()
+                await source.not_full.wait()
+            items.append(item)
+            wakeup.set()
+
+    def pumped(source: _Source, task: asyncio.Task) -> None:
+        # the error is recorded before the consumer can see the source done
+        if not task.cancelled() and task.exception() is not None:
+            failure.append(task.exception())
+        source.done = True
+        wakeup.set()
+
+    pumps = []
+    for source in sources:
+        task = asyncio.create_task(pump(source))
+        task.add_done_callback(partial(pumped, source))
+        pumps.append(task)
+    try:
+        n = len(sources)
+        turn = 0
+        while True:
+            if failure:
+                raise failure[0]
+            for offset in range(n):
+                source = sources[(turn + offset) % n]
+                if source.items:
+                    break
+            else:
+                if all(source.done for source in sources):
+                    return
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            turn = (turn + offset + 1) % n
+            item = source.items.popleft()
+            source.not_full.set()
+            if on_depth is not None:
+                on_depth(source.key, len(source.items))
+            yield source.key, item
+    finally:
+        for task in pumps:
+            task.cancel()
+        await asyncio.gather(*pumps, return_exceptions=True)
+
+
+class QueuedWriter(Generic[T]):
+    """
+    Bounded buffer in front of a sink, drained by its own task.
+
+    `write` returns as soon as the item is buffered, so a slow sink only
+    holds up its own items, not whoever writes to it. A full buffer is
+    handled according to `policy` as in `merge_streams`; only then can
+    `write` wait. A failed send is re-raised by the next `write`.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        send: Callable[[T], Awaitable[None]],
+        policy: QueuePolicy = DEFAULT_QUEUE_POLICY,
+        *,
+        on_depth: Callable[[str, int], None] | None = None,
+        on_drop: Callable[[str], None] | None = None,
+    ) -> None:
+        self.key = key
+        self.policy = policy
+        self._send = send
+        self._on_depth = on_depth
+        self._on_drop = on_drop
+        self._items: deque[T] = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._failure: BaseException | None = None
+        self._task: asyncio.Task | None = None
+
+    async def write(self, item: T) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._drain())
+            self._task.add_done_callback(self._drained)
+        items = self._items
+        maxsize = self.policy.maxsize
+        if len(items) >= maxsize and _make_room(
+            self.key, self.policy, items, item, self._on_drop
+        ):
+            return
+        while self._failure is None and len(items) >= maxsize:
+            self._not_full.clear()
+            await self._not_full.wait()
+        if self._failure is not None:
+            raise self._failure
+        items.append(item)
+        self._not_empty.set()
+
+    async def __aenter__(self) -> "QueuedWriter[T]":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Stop the writer task, dropping whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _drain(self) -> None:
+        items = self._items
+        while True:
+            while not items:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+            item = items.popleft()
+            self._not_full.set()
+            if self._on_depth is not None:
+                self._on_depth(self.key, len(items))
+            await self._send(item)
+
+    def _drained(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self._failure = task.exception()
+            # wake a write blocked on the full buffer
+            self._not_full.set()
+
+
+def amerge(**streams: AsyncIterator[T]) -> AsyncIterator[tuple[str, T]]:
+    """Merge multiple streams into one stream, blocking on full buffers."""
+    return merge_streams(streams)
+
+
+async def timestamped(stream: AsyncIterator[T]) -> AsyncIterator[tuple[float, T]]:
+    """Pair every item with the perf_counter() time it was received."""
+    async for item in stream:
+        yield time.perf_counter(), item
+
+
+@cache
+def _type_markers(event_type: str) -> tuple[str, str]:
+    return f'"type":"{event_type}"', f'"type": "{event_type}"'
+
+
+def sniff_event_type(raw: str, types: Collection[str]) -> str | None:
+    """Return the type of a raw JSON event if it is one of `types`.
+
+    Only the head of the string is looked at, so the cost does not depend on
+    the payload size. Anything that does not match returns None and should go
+    through regular JSON parsing.
+    """
+    head = raw[:SNIFF_WINDOW]
+    for event_type in types:
+        compact, spaced = _type_markers(event_type)
+        if compact in head or spaced in head:
+            return event_type
+    return None
+
+
+def extract_json_string(raw: str, field: str) -> str | None:
+    """Cut the value of a top-level string field out of a raw JSON event.
+
+    Meant for base64 payloads, which never contain quotes or escapes, so the
+    value ends at the next double quote.
+    """
+    for marker in (f'"{field}":"', f'"{field}": "'):
+        start = raw.find(marker)
+        if start >= 0:
+            start += len(marker)
+            end = raw.find('"', start)
+            return raw[start:end] if end >= 0 else None
+    return None
+
+
+def encode_audio_event(event_type: str, field: str, pcm: bytes) -> str:
+    """Build a raw JSON audio event around `pcm` without going through json.dumps."""
+    return f'{{"type":"{event_type}","{field}":"{base64.b64encode(pcm).decode()}"}}'
+
+
+def base64_decoded_len(data: str) -> int:
+    """Number of bytes `data` decodes to, without decoding it."""
+    padding = 2 if data.endswith("==") else 1 if data.endswith("=") else 0
+    return len(data) * 3 // 4 - padding
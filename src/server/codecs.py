@@ -0,0 +1,212 @@
+import json
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+import numpy as np
+
+from langchain_openai_voice.utils import sniff_event_type
+
+try:
+    import opuslib
+except ImportError:  # optional, only needed for the opus codec
+    opuslib = None
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000
+"""Rate of the PCM16 the agent and the Realtime API work with."""
+CODEC_EVENT = "session.codec"
+"""Sent by the browser as its first message to pick the codec of binary frames."""
+CODEC_PARAMS = ("codec", "sample_rate")
+"""/ws query parameters that pick the codec before any frame is sent."""
+CODEC_ACCEPTED_EVENT = "session.codec.accepted"
+
+
+def _mulaw_tables() -> tuple[np.ndarray, np.ndarray]:
+    # G.711 mu-law with the usual bias of 0x84 and clip at 32635
+    samples = np.arange(-32768, 32768, dtype=np.int32)
+    sign = np.where(samples < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(samples), 32635) + 0x84
+    exponent = np.floor(np.log2(magnitude >> 7)).astype(np.int32)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    encoded = ~(sign | (exponent << 4) | mantissa) & 0xFF
+    # indexed by the int16 sample reinterpreted as uint16
+    encode = np.roll(encoded.astype(np.uint8), -32768)
+
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    magnitude = ((((codes & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    decode = np.where(codes & 0x80, -magnitude, magnitude).astype("<i2")
+    return encode, decode
+
+
+MULAW_ENCODE, MULAW_DECODE = _mulaw_tables()
+
+
+class PCM16Codec:
+    """Raw 24 kHz PCM16, the frames are passed through untouched."""
+
+    name = "pcm16"
+    sample_rate = SAMPLE_RATE
+
+    def decode(self, payload: bytes) -> bytes:
+        return payload
+
+    def encode(self, pcm: bytes) -> list[bytes]:
+        return [pcm]
+
+
+class MuLawCodec:
+    """
+    G.711 mu-law, one byte per sample, at 8 kHz or at the native 24 kHz.
+
+    At 8 kHz the browser leg carries a sixth of the PCM16 bytes. Mic audio is
+    upsampled by linear interpolation and model audio downsampled by
+    averaging groups of three samples; the state for both carries over
+    between frames, so frames of any length can be fed in.
+    """
+
+    name = "pcmu"
+
+    def __init__(self, sample_rate: int = 8000) -> None:
+        if sample_rate not in (8000, SAMPLE_RATE):
+            raise ValueError("pcmu supports 8000 or 24000 Hz")
+        self.sample_rate = sample_rate
+        self._factor = SAMPLE_RATE // sample_rate
+        self._last = 0.0
+        self._pending = b""
+
+    def decode(self, payload: bytes) -> bytes:
+        samples = MULAW_DECODE[np.frombuffer(payload, dtype=np.uint8)]
+        if self._factor == 1 or not len(samples):
+            return samples.tobytes()
+        # each new sample gets the two interpolated points before it
+        previous = np.empty(len(samples), dtype=np.float32)
+        previous[0] = self._last
+        previous[1:] = samples[:-1]
+        steps = np.arange(1, self._factor + 1, dtype=np.float32) / self._factor
+        out = previous[:, None] + (samples - previous)[:, None] * steps
+        self._last = float(samples[-1])
+        return out.astype("<i2").tobytes()
+
+    def encode(self, pcm: bytes) -> list[bytes]:
+        if self._pending:
+            pcm = self._pending + pcm
+        usable = len(pcm) // (2 * self._factor) * 2 * self._factor
+        self._pending = pcm[usable:]
+        if not usable:
+            return []
+        samples = np.frombuffer(pcm, dtype="<i2", count=usable // 2)
+        if self._factor > 1:
+            samples = samples.reshape(-1, self._factor).mean(axis=1).astype("<i2")
+        return [MULAW_ENCODE[samples.view(np.uint16)].tobytes()]
+
+
+class OpusCodec:
+    """
+    Opus at 24 kHz through opuslib, one packet per binary frame.
+
+    Model audio is cut into `frame_ms` frames, each sent as its own packet;
+    a partial frame waits for the next chunk.
+    """
+
+    name = "opus"
+    sample_rate = SAMPLE_RATE
+    MAX_FRAME_SAMPLES = SAMPLE_RATE * 120 // 1000
+
+    def __init__(self, frame_ms: int = 20, bitrate: int = 24000) -> None:
+        self._frame_samples = SAMPLE_RATE * frame_ms // 1000
+        self._decoder = opuslib.Decoder(SAMPLE_RATE, 1)
+        self._encoder = opuslib.Encoder(SAMPLE_RATE, 1, opuslib.APPLICATION_VOIP)
+        self._encoder.bitrate = bitrate
+        self._pending = b""
+
+    def decode(self, payload: bytes) -> bytes:
+        return self._decoder.decode(payload, self.MAX_FRAME_SAMPLES)
+
+    def encode(self, pcm: bytes) -> list[bytes]:
+        if self._pending:
+            pcm = self._pending + pcm
+        frame_bytes = self._frame_samples * 2
+        usable = len(pcm) // frame_bytes * frame_bytes
+        self._pending = pcm[usable:]
+        return [
+            self._encoder.encode(pcm[offset : offset + frame_bytes], self._frame_samples)
+            for offset in range(0, usable, frame_bytes)
+        ]
+
+
+AudioCodec = PCM16Codec | MuLawCodec | OpusCodec
+
+CODECS: dict[str, Callable[..., AudioCodec]] = {
+    "pcm16": PCM16Codec,
+    "pcmu": MuLawCodec,
+}
+if opuslib is not None:
+    CODECS["opus"] = OpusCodec
+
+
+def open_codec(request: dict[str, Any]) -> AudioCodec:
+    """The codec a codec request asks for, PCM16 if it cannot be served."""
+    factory = CODECS.get(request.get("codec", "pcm16"))
+    try:
+        if factory is MuLawCodec:
+            return MuLawCodec(int(request.get("sample_rate", 8000)))
+        if factory is not None:
+            return factory()
+    except (ValueError, TypeError) as e:
+        logger.warning("codec request %s rejected: %s", request, e)
+    return PCM16Codec()
+
+
+class BrowserAudio:
+    """
+    Codec state of the browser leg of one call.
+
+    The codec is picked with a `request` naming one of `CODECS`, taken from
+    the /ws query parameters (`CODEC_PARAMS`), and the caller sends
+    `accepted_event()` before reading any frame. Alternatively the browser
+    opens with a session.codec event, which the server answers once the call
+    reads its first message. Either way the answer names the codec actually
+    in use, PCM16 when the request could not be honoured, and the browser
+    must not send binary audio before it: frames in both directions use that
+    codec from then on, while the agent keeps seeing 24 kHz PCM16. Without a
+    request nothing changes. JSON audio events are not affected.
+    """
+
+    def __init__(self, request: dict[str, Any] | None = None) -> None:
+        self.codec: AudioCodec = open_codec(request) if request else PCM16Codec()
+        # with a request the codec is settled before the first frame
+        self._negotiated = request is not None
+
+    def accepted_event(self) -> str:
+        return json.dumps(
+            {
+                "type": CODEC_ACCEPTED_EVENT,
+                "codec": self.codec.name,
+                "sample_rate": self.codec.sample_rate,
+                "supported": sorted(CODECS),
+            }
+        )
+
+    async def decoded(
+        self,
+        stream: AsyncIterator[str | bytes],
+        send_text: Callable[[str], Awaitable[None]],
+    ) -> AsyncIterator[str | bytes]:
+        async for message in stream:
+            if not self._negotiated:
+                self._negotiated = True
+                if isinstance(message, str) and sniff_event_type(message, (CODEC_EVENT,)):
+                    self.codec = open_codec(json.loads(message))
+                    await send_text(self.accepted_event())
+                    continue
+            if isinstance(message, bytes):
+                message = self.codec.decode(message)
+                if not message:
+                    continue
+            yield message
+
+    def encode(self, pcm: bytes) -> list[bytes]:
+        return self.codec.encode(pcm)
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Self
+
+logger = logging.getLogger(__name__)
+
+
+class JsonlFile:
+    """Append-only JSON Lines file, one event per line."""
+
+    suffix = ".jsonl"
+
+    def __init__(self, path: str) -> None:
+        # stays open until the file is rotated or the log is closed
+        self._file = open(path, "a", encoding="utf-8")  # noqa: SIM115
+
+    def write(self, events: list[dict[str, Any]]) -> None:
+        self._file.write(
+            "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+        )
+        self._file.flush()
+
+    def size(self) -> int:
+        return self._file.tell()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class SqliteFile:
+    """SQLite database with a single `events` table, one transaction per batch."""
+
+    suffix = ".sqlite3"
+
+    def __init__(self, path: str) -> None:
+        # only ever used by one writer at a time, from varying worker threads
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events"
+            " (ts REAL, session TEXT, type TEXT, data TEXT)"
+        )
+
+    def write(self, events: list[dict[str, Any]]) -> None:
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO events VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        event["ts"],
+                        event["session"],
+                        event["type"],
+                        json.dumps(event, ensure_ascii=False),
+                    )
+                    for event in events
+                ],
+            )
+
+    def size(self) -> int:
+        pages = self._db.execute("PRAGMA page_count").fetchone()[0]
+        return pages * self._db.execute("PRAGMA page_size").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+FORMATS = {"jsonl": JsonlFile, "sqlite": SqliteFile}
+
+
+class EventLog:
+    """
+    Process-wide log of session events, for analytics.
+
+    `emit` only enqueues the event; a background task hands whatever has
+    queued up to a worker thread in one batch, as soon as `batch_size`
+    events are waiting or `flush_interval` seconds after the first one.
+    Events go to `<directory>/events-<pid>-<time>-<n>` in one of `FORMATS`,
+    and a new file is started once the current one reaches `max_bytes` or
+    is `max_age` seconds old.
+
+    If the disk falls behind and the queue fills up, events are dropped and
+    counted in `dropped` rather than stalling the voice loop.
+    """
+
+    def __init__(
+        self,
+        directory: str = "logs",
+        format: str = "jsonl",
+        *,
+        max_bytes: int = 64 * 2**20,
+        max_age: float = 3600.0,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ) -> None:
+        if format not in FORMATS:
+            raise ValueError(
+                f"unknown event log format {format!r}, use one of {list(FORMATS)}"
+            )
+        self.directory = directory
+        self.format = format
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+        self._queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue(
+            maxsize=max_queue
+        )
+        self._wake = asyncio.Event()
+        self._file: JsonlFile | SqliteFile | None = None
+        self._opened_at = 0.0
+        self._closing = False
+        self._writer_task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Self:
+        await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+        self._writer_task = asyncio.create_task(self._writer())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def session(self, session_id: str) -> "SessionEvents":
+        return SessionEvents(self, session_id)
+
+    def emit(self, event: dict[str, Any]) -> None:
+        if self._writer_task is None:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    async def _writer(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            if (
+                batch[0] is not None
+                and not self._closing
+                and self._queue.qsize() < self.batch_size
+            ):
+                # let a batch build up, unless it fills up or we are closing
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except TimeoutError:
+                    pass
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            # events emitted while closing may have queued up behind the None
+            done = any(event is None for event in batch)
+            events = [event for event in batch if event is not None]
+            if events:
+                try:
+                    await asyncio.to_thread(self._write_batch, events)
+                    self.written += len(events)
+                except (OSError, sqlite3.Error) as e:
+                    logger.error("dropping %d events, write failed: %s", len(events), e)
+                    self.dropped += len(events)
+            if done:
+                return
+
+    def _write_batch(self, events: list[dict[str, Any]]) -> None:
+        if (
+            self._file is None
+            or self._file.size() >= self.max_bytes
+            or time.monotonic() - self._opened_at >= self.max_age
+        ):
+            self._rotate()
+        self._file.write(events)
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self.rotations += 1
+        writer = FORMATS[self.format]
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"events-{os.getpid()}-{stamp}-{self.rotations}{writer.suffix}"
+        self._file = writer(os.path.join(self.directory, name))
+        self._opened_at = time.monotonic()
+
+    async def aclose(self) -> None:
+        """Write the events still queued and close the file."""
+        if self._writer_task is None:
+            return
+        self._closing = True
+        await self._queue.put(None)
+        self._wake.set()
+        try:
+            await self._writer_task
+        finally:
+            self._writer_task = None
+            if self._file is not None:
+                await asyncio.to_thread(self._file.close)
+                self._file = None
+
+
+class SessionEvents:
+    """The events of one call, stamped with its session id and the wall-clock time."""
+
+    __slots__ = ("log", "session_id")
+
+    def __init__(self, log: EventLog, session_id: str) -> None:
+        self.log = log
+        self.session_id = session_id
+
+    def emit(self, type: str, **fields: Any) -> None:
+        self.log.emit(
+            {"ts": time.time(), "session": self.session_id, "type": type, **fields}
+        )
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import time
+import wave
+from typing import Self
+
+import numpy as np
+
+MIC = 0
+MODEL = 1
+
+# chunks arriving up to this late are appended back to back instead of being
+# separated by silence, so network jitter does not punch holes into speech
+JITTER_TOLERANCE_S = 0.1
+FINALIZE_BLOCK_SAMPLES = 24000 * 10
+
+
+class CallRecorder:
+    """
+    Streams both sides of a call to disk while it happens.
+
+    `write_input` and `write_output` only enqueue the PCM16 chunk with its
+    arrival time; a background task writes batches to one raw file per
+    direction from a worker thread, padding silence so both files stay on the
+    same timeline. When the call ends the two files are merged into
+    `<directory>/<session_id>.wav` (left: mic, right: model) and removed.
+
+    If the disk falls behind and the queue fills up, chunks are dropped and
+    counted in `dropped_chunks` rather than stalling the audio path.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        directory: str = "recordings",
+        sample_rate: int = 24000,
+        max_queue: int = 512,
+    ) -> None:
+        self.session_id = session_id
+        self.sample_rate = sample_rate
+        self.path = os.path.join(directory, f"{session_id}.wav")
+        self.dropped_chunks = 0
+
+        self._directory = directory
+        self._raw_paths = (
+            os.path.join(directory, f"{session_id}.mic.pcm"),
+            os.path.join(directory, f"{session_id}.model.pcm"),
+        )
+        self._queue: asyncio.Queue[tuple[int, int, bytes] | None] = asyncio.Queue(
+            maxsize=max_queue
+        )
+        self._files: list = []
+        self._cursors = [0, 0]
+        self._tolerance = int(JITTER_TOLERANCE_S * sample_rate)
+        self._start = 0.0
+        self._writer_task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Self:
+        def open_files() -> list:
+            os.makedirs(self._directory, exist_ok=True)
+            return [open(path, "wb") for path in self._raw_paths]
+
+        self._files = await asyncio.to_thread(open_files)
+        self._start = time.monotonic()
+        self._writer_task = asyncio.create_task(self._writer())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def write_input(self, pcm: bytes) -> None:
+        """Record mic audio; it was captured over the duration just before now."""
+        self._put(MIC, pcm, captured_before=True)
+
+    def write_output(self, pcm: bytes) -> None:
+        """Record model audio; it starts playing as soon as it arrives."""
+        self._put(MODEL, pcm, captured_before=False)
+
+    def _put(self, channel: int, pcm: bytes, captured_before: bool) -> None:
+        if not pcm or self._writer_task is None:
+            return
+        offset = int((time.monotonic() - self._start) * self.sample_rate)
+        if captured_before:
+            offset = max(0, offset - len(pcm) // 2)
+        try:
+            self._queue.put_nowait((channel, offset, pcm))
+        except asyncio.QueueFull:
+            self.dropped_chunks += 1
+
+    async def _writer(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            done = batch[-1] is None
+            chunks = [item for item in batch if item is not None]
+            if chunks:
+                await asyncio.to_thread(self._write_batch, chunks)
+            if done:
+                return
+
+    def _write_batch(self, chunks: list[tuple[int, int, bytes]]) -> None:
+        for channel, offset, pcm in chunks:
+            gap = offset - self._cursors[channel]
+            if gap > self._tolerance:
+                self._files[channel].write(bytes(gap * 2))
+                self._cursors[channel] = offset
+            self._files[channel].write(pcm)
+            self._cursors[channel] += len(pcm) // 2
+
+    async def aclose(self) -> None:
+        """Flush pending audio and write the final stereo WAV."""
+        if self._writer_task is None:
+            return
+        await self._queue.put(None)
+        try:
+            await self._writer_task
+        finally:
+            self._writer_task = None
+            await asyncio.to_thread(self._finalize)
+
+    def _finalize(self) -> None:
+        for f in self._files:
+            f.close()
+        channels = [
+            np.memmap(path, dtype="<i2", mode="r")
+            if os.path.getsize(path)
+            else np.zeros(0, dtype="<i2")
+            for path in self._raw_paths
+        ]
+        n_samples = max(len(channel) for channel in channels)
+        with wave.open(self.path, "wb") as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            for start in range(0, n_samples, FINALIZE_BLOCK_SAMPLES):
+                end = min(start + FINALIZE_BLOCK_SAMPLES, n_samples)
+                block = np.zeros((end - start, 2), dtype="<i2")
+                for index, channel in enumerate(channels):
+                    segment = channel[start:end]
+                    block[: len(segment), index] = segment
+                wav.writeframes(block.tobytes())
+        del channels
+        for path in self._raw_paths:
+            os.remove(path)
@@ -1,43 +1,227 @@
-import os 
-import subprocess
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+import wave
+from collections import OrderedDict
+from dataclasses import dataclass
+
 from starlette.requests import Request
-from starlette.responses import JSONResponse 
+from starlette.responses import JSONResponse
 
-async def save_recording(request: Request):
-    form = await request.form()
-    audio_file = form["recording"]
-    filename = audio_file.filename
+logger = logging.getLogger(__name__)
+
+RECORDINGS_DIR = "recordings"
+# İş durumları diske de yazılır: birden çok worker'da durum sorgusu, işi
+# başlatan worker'a düşmeyebilir
+JOBS_DIR = os.path.join(RECORDINGS_DIR, ".jobs")
+CHUNK_SIZE = 64 * 1024
+TARGET_SAMPLE_RATE = 48000
+TARGET_CHANNELS = 2
+TRANSCODE_WORKERS = int(os.getenv("RECORDING_TRANSCODE_WORKERS", "2"))
+MAX_QUEUED_JOBS = 64
+MAX_TRACKED_JOBS = 1000
+# Biten işlerin durum dosyaları bu kadar saniye sonra silinir
+JOB_STATUS_TTL = int(os.getenv("RECORDING_JOB_STATUS_TTL", str(24 * 3600)))
+
+
+@dataclass
+class RecordingJob:
+    id: str
+    upload_path: str
+    save_path: str
+    status: str = "queued"  # queued -> transcoding -> done | failed
+    message: str = ""
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "path": self.save_path,
+            "message": self.message,
+        }
+
+
+_jobs: OrderedDict[str, RecordingJob] = OrderedDict()
+_queue: asyncio.Queue[RecordingJob] | None = None
+_workers: list[asyncio.Task] = []
+
+
+def _ensure_workers() -> asyncio.Queue[RecordingJob]:
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=MAX_QUEUED_JOBS)
+        for _ in range(TRANSCODE_WORKERS):
+            _workers.append(asyncio.create_task(_worker(_queue)))
+    return _queue
+
+
+def _track(job: RecordingJob) -> None:
+    _jobs[job.id] = job
+    while len(_jobs) > MAX_TRACKED_JOBS:
+        _jobs.popitem(last=False)
+
+
+def _persist(job: RecordingJob) -> None:
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = os.path.join(JOBS_DIR, f"{job.id}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(job.to_dict(), f)
+    os.replace(path + ".tmp", path)
+
+
+def _prune_status_files(now: float) -> None:
+    """`JOB_STATUS_TTL` saniyeden eski durum dosyalarını siler."""
+    with os.scandir(JOBS_DIR) as entries:
+        for entry in entries:
+            try:
+                if now - entry.stat().st_mtime > JOB_STATUS_TTL:
+                    os.remove(entry.path)
+            except OSError:
+                # başka bir worker aynı anda silmiş ya da silinemiyor
+                continue
+
+
+def _load(job_id: str) -> dict | None:
+    try:
+        with open(os.path.join(JOBS_DIR, f"{job_id}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    # "recordings" klasörünü oluştur (zaten varsa hata vermez)
-    os.makedirs("recordings", exist_ok=True)
 
-    # Dosya yolunu oluştur ve kaydet
-    save_path = os.path.join("recordings", filename)
-    with open(save_path, "wb") as f:
-        f.write(await audio_file.read())
+def matches_target_format(path: str) -> bool:
+    """Dosya zaten hedef formatta (48 kHz, stereo WAV) mı?"""
+    try:
+        with wave.open(path, "rb") as wav:
+            return (
+                wav.getframerate() == TARGET_SAMPLE_RATE
+                and wav.getnchannels() == TARGET_CHANNELS
+            )
+    except (wave.Error, EOFError, OSError):
+        # WAV değil (ör. tarayıcının ürettiği webm/ogg), dönüştürülmeli
+        return False
+
 
-    # ffmpeg ile yüksek kaliteli dosyaya dönüştürme (aynı dosya üzerine yazılarak):
-    temp_path = os.path.join("recordings", "temp_" + filename)
+async def transcode(src: str, dst: str) -> None:
+    """ffmpeg'i event loop'u bloklamadan ayrı bir süreçte çalıştırır."""
     command = [
         "ffmpeg",
         "-y",             # otomatik olarak üzerine yaz
-        "-i", save_path,
-        "-ar", "48000",   # örnekleme hızı: 48000 Hz
-        "-ac", "2",       # stereo (2 kanal)
+        "-loglevel", "error",
+        "-i", src,
+        "-ar", str(TARGET_SAMPLE_RATE),   # örnekleme hızı: 48000 Hz
+        "-ac", str(TARGET_CHANNELS),      # stereo (2 kanal)
         "-b:a", "192k",   # ses bitrate: 192 kbps
-        temp_path
+        dst,
     ]
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"ffmpeg {process.returncode} koduyla çıktı: {stderr.decode(errors='replace')}"
+        )
+
+
+async def _process(job: RecordingJob) -> None:
+    job.status = "transcoding"
     try:
-        subprocess.run(command, check=True)
-        # Geçici dosyayı orijinal dosya adıyla yeniden adlandırarak üzerine yazıyoruz.
-        os.replace(temp_path, save_path)
-        message = f"Kayıt başarıyla kaydedildi ve yüksek kaliteli dosya üzerine yazıldı: {save_path}"
-    except subprocess.CalledProcessError as e:
-        message = f"Kayıt kaydedildi ancak ffmpeg dönüşümünde hata oluştu: {e}"
+        if await asyncio.to_thread(matches_target_format, job.upload_path):
+            # WAV'dan WAV'a ffmpeg geçişi gereksiz, dosyayı olduğu gibi taşıyoruz
+            os.replace(job.upload_path, job.save_path)
+            job.message = f"Kayıt zaten hedef formatta, dönüştürülmeden kaydedildi: {job.save_path}"
+        else:
+            temp_path = os.path.join(RECORDINGS_DIR, f"temp_{job.id}_{os.path.basename(job.save_path)}")
+            await transcode(job.upload_path, temp_path)
+            # Geçici dosyayı orijinal dosya adıyla yeniden adlandırarak üzerine yazıyoruz.
+            os.replace(temp_path, job.save_path)
+            os.remove(job.upload_path)
+            job.message = f"Kayıt başarıyla kaydedildi ve yüksek kaliteli dosya üzerine yazıldı: {job.save_path}"
+        job.status = "done"
     except Exception as ex:
-        message = f"Kayıt kaydedildi ancak dosya üzerine yazılırken hata oluştu: {ex}"
+        # dönüştürülemeyen kaydı kaybetmemek için ham yüklemeyi yerinde bırakıyoruz
+        job.status = "failed"
+        job.message = f"Kayıt kaydedildi ancak ffmpeg dönüşümünde hata oluştu: {ex}"
+    try:
+        await asyncio.to_thread(_persist, job)
+        await asyncio.to_thread(_prune_status_files, time.time())
+    except OSError as ex:
+        # disk dolu ya da izin yok; kaydın sonucu değişmez, bu worker'a gelen
+        # sorgular onu yine görür
+        logger.warning("recording job %s status could not be written: %s", job.id, ex)
+        job.message += f" (iş durumu diske yazılamadı: {ex})"
+
+
+async def _worker(queue: asyncio.Queue[RecordingJob]) -> None:
+    while True:
+        job = await queue.get()
+        try:
+            await _process(job)
+        except Exception:
+            # tek bir işin hatası işçiyi durdurmamalı, kuyruktakiler beklemede kalır
+            logger.exception("recording job %s failed", job.id)
+            job.status = "failed"
+        finally:
+            queue.task_done()
+
+
+async def save_recording(request: Request):
+    form = await request.form()
+    audio_file = form["recording"]
+    filename = os.path.basename(audio_file.filename)
+
+    # "recordings" klasörünü oluştur (zaten varsa hata vermez)
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
+
+    job_id = uuid.uuid4().hex
+    job = RecordingJob(
+        id=job_id,
+        upload_path=os.path.join(RECORDINGS_DIR, f"upload_{job_id}_{filename}"),
+        save_path=os.path.join(RECORDINGS_DIR, filename),
+    )
+
+    # Yüklemeyi parça parça, event loop dışında diske yazıyoruz
+    def copy_upload() -> None:
+        with open(job.upload_path, "wb") as f:
+            shutil.copyfileobj(audio_file.file, f, CHUNK_SIZE)
+
+    await asyncio.to_thread(copy_upload)
+
+    # durum, iş kuyruğa girmeden yazılır; işçi sonucu bunun üzerine yazar
+    _track(job)
+    await asyncio.to_thread(_persist, job)
+
+    queue = _ensure_workers()
+    try:
+        queue.put_nowait(job)
+    except asyncio.QueueFull:
+        job.status = "failed"
+        job.message = f"Dönüştürme kuyruğu dolu, ham kayıt saklandı: {job.upload_path}"
+        await asyncio.to_thread(_persist, job)
+        return JSONResponse(job.to_dict(), status_code=503)
+
+    return JSONResponse(
+        {**job.to_dict(), "status_url": f"/save_recording/{job_id}"},
+        status_code=202,
+    )
+
 
-    return JSONResponse({
-        "status": "success",
-        "message": message
-    })
+async def recording_status(request: Request):
+    job_id = request.path_params["job_id"]
+    job = _jobs.get(job_id)
+    if job is not None:
+        return JSONResponse(job.to_dict())
+    # başka bir worker'ın işi olabilir
+    state = None
+    if job_id.isalnum():
+        state = await asyncio.to_thread(_load, job_id)
+    if state is None:
+        return JSONResponse({"status": "unknown"}, status_code=404)
+    return JSONResponse(state)
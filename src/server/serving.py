@@ -0,0 +1,362 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from multiprocessing.connection import wait
+
+import uvicorn
+
+from langchain_openai_voice.metrics import MetricsRegistry, merge_snapshots
+
+logger = logging.getLogger(__name__)
+
+# Bir worker'ın görüşmeyi kabul edemediğinde websocket'i kapattığı kod
+TRY_AGAIN_LATER = 1013
+# Geri çevrilen görüşmeye kapatmadan önce gönderilen denetim mesajı
+REJECTED_EVENT = "session.rejected"
+# Kuyruğa alınan görüşmeye sırası, yer açıldığında da kabul bildirilir
+QUEUED_EVENT = "session.queued"
+ADMITTED_EVENT = "session.admitted"
+
+# Geri çevirme nedenleri
+FULL = "full"
+TIMEOUT = "timeout"
+OVERLOADED = "overloaded"
+DRAINING = "draining"
+REJECT_REASONS = (FULL, TIMEOUT, OVERLOADED, DRAINING)
+
+# Olay döngüsü gecikmesinin ölçülme aralığı (saniye) ve yumuşatma katsayısı
+LAG_INTERVAL = 0.1
+LAG_SMOOTHING = 0.3
+
+
+class CallSlots:
+    """
+    Bu worker'a görüşme kabulünü (admission control) yönetir.
+
+    En fazla `max_calls` görüşme aynı anda sürer (0: sınırsız). Yer yokken
+    gelen görüşme en fazla `max_waiting` kişilik kuyrukta `wait_timeout`
+    saniye bekler; biten görüşmenin yeri sıradakine doğrudan devredilir.
+    Olay döngüsünün ölçülen gecikmesi (`loop_lag`) `max_loop_lag` saniyeyi
+    aşarsa yer olsa bile yeni görüşme beklemeden geri çevrilir; ani yükte
+    süren görüşmelerin sesi hep birlikte bozulmasın diye. Boşaltma (drain)
+    başladığında yeni görüşme kabul edilmez, devam edenler bitene kadar
+    beklenir.
+    """
+
+    def __init__(
+        self,
+        max_calls: int = 0,
+        *,
+        max_waiting: int = 0,
+        wait_timeout: float = 10.0,
+        max_loop_lag: float = 0.0,
+        retry_after: float = 5.0,
+    ) -> None:
+        self.max_calls = max_calls
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.max_loop_lag = max_loop_lag
+        self.retry_after = retry_after
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.rejections = dict.fromkeys(REJECT_REASONS, 0)
+        self.draining = False
+        self.loop_lag = 0.0
+        # sıradaki görüşmeler; sonuç None (kabul) ya da geri çevirme nedeni
+        self._waiters: deque[asyncio.Future[str | None]] = deque()
+        self._lag_task: asyncio.Task | None = None
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def overloaded(self) -> bool:
+        return bool(self.max_loop_lag) and self.loop_lag > self.max_loop_lag
+
+    async def acquire(
+        self, on_queued: Callable[[int], Awaitable[None]] | None = None
+    ) -> str | None:
+        """
+        Görüşmeye yer ayırır; ayrılamazsa geri çevirme nedenini döndürür.
+
+        Kuyruğa girilirse `on_queued` sıra numarasıyla çağrılır.
+        """
+        if self._lag_task is None and self.max_loop_lag:
+            self._lag_task = asyncio.create_task(self._measure_lag())
+        if self.draining:
+            return self._reject(DRAINING)
+        if self.overloaded():
+            return self._reject(OVERLOADED)
+        if not self._waiters and not (self.max_calls and self.active >= self.max_calls):
+            self.active += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.max_waiting:
+            return self._reject(FULL)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            if on_queued is not None:
+                await on_queued(len(self._waiters))
+            reason = await asyncio.wait_for(waiter, self.wait_timeout)
+        except TimeoutError:
+            reason = TIMEOUT
+        except BaseException:
+            # tarayıcı beklerken ayrıldı; bu arada devredilen yer geri bırakılır
+            if waiter.done() and not waiter.cancelled() and waiter.result() is None:
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        if reason is not None:
+            return self._reject(reason)
+        self.admitted += 1
+        return None
+
+    def release(self) -> None:
+        self.active -= 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            if self.draining:
+                waiter.set_result(DRAINING)
+                continue
+            # yer sıradakine devredilir, `active` değişmez
+            self.active += 1
+            waiter.set_result(None)
+            return
+
+    def _reject(self, reason: str) -> str:
+        self.rejected += 1
+        self.rejections[reason] += 1
+        return reason
+
+    def retry_after_s(self, reason: str) -> float:
+        """Tarayıcının yeniden denemeden önce beklemesi gereken süre."""
+        if reason == DRAINING:
+            # yeni bağlantıları diğer worker'lar ya da yeni süreç karşılar
+            return 1.0
+        # aynı anda geri çevrilenler aynı anda geri gelmesin
+        return round(self.retry_after * random.uniform(1.0, 1.5), 1)
+
+    async def _measure_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            lag = max(0.0, loop.time() - started - LAG_INTERVAL)
+            self.loop_lag += LAG_SMOOTHING * (lag - self.loop_lag)
+
+
+CALLS = CallSlots(
+    int(os.getenv("MAX_CALLS_PER_WORKER", "0")),
+    max_waiting=int(os.getenv("MAX_WAITING_CALLS", "16")),
+    wait_timeout=float(os.getenv("CALL_WAIT_TIMEOUT", "10")),
+    max_loop_lag=float(os.getenv("MAX_LOOP_LAG_MS", "250")) / 1000,
+    retry_after=float(os.getenv("CALL_RETRY_AFTER", "5")),
+)
+
+
+# WORKERS>1 iken serve() worker'ların metrik dosyaları için bu dizini açar
+WORKER_METRICS_ENV = "WORKER_METRICS_DIR"
+
+
+class WorkerMetrics:
+    """
+    WORKERS>1 iken /metrics'in tüm worker'ları kapsamasını sağlar.
+
+    Worker'lar aynı dinleme soketini paylaştığından her scrape rastgele bir
+    worker'a düşer; yalnızca onun sayaçları dönseydi toplamlar scrape'ler
+    arasında geriye gider gibi görünürdü. Her worker kayıt defterini
+    `interval` saniyede bir `directory`/<pid>.json dosyasına yazar; scrape'i
+    karşılayan worker kendi güncel değerlerini yaşayan diğer worker'ların son
+    yazdıklarıyla birleştirir. Her örnek worker=<pid> etiketi taşır, toplamlar
+    Prometheus'ta `sum without (worker)` ile alınır.
+    """
+
+    def __init__(
+        self, registry: MetricsRegistry, directory: str, interval: float = 1.0
+    ) -> None:
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.pid = str(os.getpid())
+        self._path = os.path.join(directory, f"{self.pid}.json")
+
+    async def run(self) -> None:
+        try:
+            while True:
+                snapshot = self.registry.snapshot(worker=self.pid)
+                await asyncio.to_thread(self._write, snapshot)
+                await asyncio.sleep(self.interval)
+        finally:
+            # kapanan worker'ın son değerleri birleştirilmesin
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+
+    def _write(self, snapshot: dict[str, list[str]]) -> None:
+        with open(self._path + ".tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(self._path + ".tmp", self._path)
+
+    def _read_others(self) -> list[dict[str, list[str]]]:
+        snapshots = []
+        for name in os.listdir(self.directory):
+            pid, _, suffix = name.partition(".")
+            if suffix != "json" or pid == self.pid:
+                continue
+            if not _alive(int(pid)):
+                # yeniden başlatılan worker'dan kalan dosya
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    async def render(self) -> str:
+        snapshot = self.registry.snapshot(worker=self.pid)
+        others = await asyncio.to_thread(self._read_others)
+        return merge_snapshots([snapshot, *others])
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn sunucusu; ilk kapatma sinyalinde canlı görüşmeleri kesmez.
+
+    uvicorn kapanırken açık websocket'leri 1012 ile hemen kapatır. Burada
+    ilk SIGTERM/SIGINT yeni bağlantı kabulünü durdurur ve `CALLS.active`
+    sıfırlanana ya da `drain_timeout` dolana kadar bekler; ardından normal
+    kapanışa geçilir. Boşaltma sırasında ikinci bir SIGINT hemen kapatır.
+    """
+
+    def __init__(self, config: uvicorn.Config, drain_timeout: float = 600.0) -> None:
+        super().__init__(config)
+        self.drain_timeout = drain_timeout
+        self.drain_deadline: float | None = None
+
+    def handle_exit(self, sig: int, frame) -> None:
+        if self.drain_deadline is not None:
+            # boşaltma sürüyor: yalnızca Ctrl+C tekrarı beklemeyi keser
+            if sig == signal.SIGINT:
+                super().handle_exit(sig, frame)
+            return
+        if CALLS.active and not self.should_exit:
+            CALLS.draining = True
+            self.drain_deadline = time.monotonic() + self.drain_timeout
+            return
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        if self.drain_deadline is not None and not self.should_exit:
+            for server in self.servers:
+                # yeni bağlantıları diğer worker'lar karşılasın
+                server.close()
+            if not CALLS.active or time.monotonic() >= self.drain_deadline:
+                logger.info("drain finished, %d calls still active", CALLS.active)
+                self.should_exit = True
+        return await super().on_tick(counter)
+
+
+def _run_worker(
+    config: uvicorn.Config, sockets: list[socket.socket], drain_timeout: float
+) -> None:
+    config.configure_logging()
+    DrainingServer(config, drain_timeout).run(sockets=sockets)
+
+
+def serve(
+    app: str,
+    *,
+    host: str = "0.0.0.0",
+    port: int = 3000,
+    workers: int = 1,
+    drain_timeout: float = 600.0,
+    **uvicorn_options,
+) -> None:
+    """
+    `app`'i ("modül:değişken") `workers` süreçte çalıştırır.
+
+    Süreçler aynı dinleme soketini paylaşır; her websocket görüşmesi onu kabul
+    eden worker'da kalır. Kapatma sinyali worker'lara iletilir ve her biri
+    kendi görüşmelerini boşaltır. Beklenmedik şekilde ölen worker yeniden
+    başlatılır. Worker'ların metrikleri `WorkerMetrics` ile birleştirilir.
+    """
+    config = uvicorn.Config(app, host=host, port=port, **uvicorn_options)
+    if workers <= 1:
+        DrainingServer(config, drain_timeout).run()
+        return
+
+    sock = config.bind_socket()
+    # worker'lar ortam değişkenlerini başlatılırken devralır
+    metrics_dir = tempfile.mkdtemp(prefix="voice-metrics-")
+    os.environ[WORKER_METRICS_ENV] = metrics_dir
+    context = multiprocessing.get_context("spawn")
+    stopping = 0
+
+    def start() -> multiprocessing.Process:
+        process = context.Process(
+            target=_run_worker, args=(config, [sock], drain_timeout)
+        )
+        process.start()
+        return process
+
+    def forward(sig: int, frame) -> None:
+        nonlocal stopping
+        stopping += 1
+        # ilk sinyal boşaltır, ikincisi worker'ları hemen kapatır
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM if stopping == 1 else signal.SIGINT)
+
+    processes = [start() for _ in range(workers)]
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    logger.info("started %d workers on %s:%d", workers, host, port)
+    try:
+        while any(process.is_alive() for process in processes):
+            wait([process.sentinel for process in processes], timeout=1.0)
+            if stopping:
+                continue
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    logger.warning(
+                        "worker %d exited with %s, restarting", process.pid, process.exitcode
+                    )
+                    processes[i] = start()
+    finally:
+        sock.close()
+        shutil.rmtree(metrics_dir, ignore_errors=True)
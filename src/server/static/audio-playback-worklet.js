@@ -1,32 +1,105 @@
 // source: https://github.com/Azure-Samples/aisearch-openai-rag-audio/blob/7f685a8969e3b63e8c3ef345326c21f5ab82b1c3/app/frontend/public/audio-playback-worklet.js
+// Önceden ayrılmış Int16 halka tampon (ring buffer) ile oynatma: render başına
+// dizi kopyalama/ayırma yapılmaz.
+const DEFAULT_CAPACITY_SECONDS = 120;
+const DEFAULT_JITTER_MS = 60;
+const POSITION_REPORT_QUANTA = 20; // ~100 ms @ 24 kHz
+
 class AudioPlaybackWorklet extends AudioWorkletProcessor {
-    constructor() {
+    constructor(options) {
         super();
+        const opts = (options && options.processorOptions) || {};
+        const capacitySeconds = opts.capacitySeconds || DEFAULT_CAPACITY_SECONDS;
+        const jitterMs = opts.jitterMs ?? DEFAULT_JITTER_MS;
+
+        this.ring = new Int16Array(Math.ceil(capacitySeconds * sampleRate));
+        this.readIndex = 0;
+        this.available = 0;
+        this.targetDepth = Math.round(jitterMs * sampleRate / 1000);
+        this.playing = false;
+        this.waited = 0;
+        this.played = 0;     // son sıfırlamadan beri çalınan örnek sayısı
+        this.dropped = 0;    // tampon taştığı için atılan örnek sayısı
+        this.quanta = 0;
+        this.lastReported = 0;
+
         this.port.onmessage = this.handleMessage.bind(this);
-        this.buffer = [];
     }
 
     handleMessage(event) {
         if (event.data === null) {
-            this.buffer = [];
+            // Söz kesme: kullanıcının gerçekten duyduğu konumu bildirip tamponu boşalt.
+            this.port.postMessage({ type: "stopped", played: this.played });
+            this.readIndex = 0;
+            this.available = 0;
+            this.playing = false;
+            this.waited = 0;
+            this.played = 0;
+            this.lastReported = 0;
             return;
         }
-        this.buffer.push(...event.data);
+        this.write(event.data);
+    }
+
+    write(samples) {
+        const capacity = this.ring.length;
+        let offset = 0;
+        if (samples.length > capacity) {
+            offset = samples.length - capacity;
+            this.dropped += offset;
+        }
+        const overflow = this.available + samples.length - offset - capacity;
+        if (overflow > 0) {
+            // en eski örnekleri at
+            this.readIndex = (this.readIndex + overflow) % capacity;
+            this.available -= overflow;
+            this.dropped += overflow;
+        }
+        let writeIndex = (this.readIndex + this.available) % capacity;
+        while (offset < samples.length) {
+            const n = Math.min(samples.length - offset, capacity - writeIndex);
+            this.ring.set(samples.subarray(offset, offset + n), writeIndex);
+            offset += n;
+            this.available += n;
+            writeIndex = (writeIndex + n) % capacity;
+        }
     }
 
     process(inputs, outputs, parameters) {
-        const output = outputs[0];
-        const channel = output[0];
-
-        if (this.buffer.length > channel.length) {
-            const toProcess = this.buffer.slice(0, channel.length);
-            this.buffer = this.buffer.slice(channel.length);
-            channel.set(toProcess.map(v => v / 32768));
-        } else {
-            channel.set(this.buffer.map(v => v / 32768));
-            this.buffer = [];
+        const channel = outputs[0][0];
+        const frames = channel.length;
+
+        if (!this.playing && this.available > 0) {
+            // Hedef jitter derinliği dolana kadar ya da o kadar süre bekleyene kadar tut.
+            this.waited += frames;
+            if (this.available >= this.targetDepth || this.waited >= this.targetDepth) {
+                this.playing = true;
+            }
         }
 
+        let n = 0;
+        if (this.playing) {
+            const capacity = this.ring.length;
+            n = Math.min(frames, this.available);
+            let readIndex = this.readIndex;
+            for (let i = 0; i < n; i++) {
+                channel[i] = this.ring[readIndex] / 32768;
+                readIndex = readIndex + 1 === capacity ? 0 : readIndex + 1;
+            }
+            this.readIndex = readIndex;
+            this.available -= n;
+            this.played += n;
+            if (this.available === 0) {
+                this.playing = false;
+                this.waited = 0;
+            }
+        }
+        channel.fill(0, n);
+
+        if (++this.quanta % POSITION_REPORT_QUANTA === 0 && this.played !== this.lastReported) {
+            this.lastReported = this.played;
+            this.port.postMessage({ type: "position", played: this.played, dropped: this.dropped });
+        }
         return true;
     }
 }
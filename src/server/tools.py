@@ -1,15 +1,41 @@
-from langchain_community.tools import GoogleSerperResults
+import logging
 import os
+from functools import cache
 
-from dotenv import load_dotenv
+from langchain_core.tools import StructuredTool
 
-load_dotenv()
+from config import SERPER_API_KEY
+from langchain_openai_voice.cache import ToolResultCache
+from langchain_openai_voice.metrics import TOOL_CACHE_UPSTREAM
 
-SERPER_API_KEY = os.getenv("SERPER_API_KEY")
+logger = logging.getLogger(__name__)
 
-serper_tool = GoogleSerperResults(
-    max_results=5,
-    include_answer=True,
+if not SERPER_API_KEY:
+    logger.warning("SERPER_API_KEY is not set, web searches will fail")
+
+
+@cache
+def serper_api():
+    """
+    The Serper client, created on first use.
+
+    langchain_community and aiohttp take longer to import than the rest of
+    the server, so they are only loaded when a search runs or `app` preloads
+    them in the background.
+    """
+    from langchain_community.utilities import GoogleSerperAPIWrapper
+
+    return GoogleSerperAPIWrapper()
+
+
+async def google_serper_results_json(query: str) -> str:
+    # same output as langchain_community's GoogleSerperResults tool
+    return str(await serper_api().aresults(query))
+
+
+serper_tool = StructuredTool.from_function(
+    coroutine=google_serper_results_json,
+    name="google_serper_results_json",
     description=(
         "This is a search tool for accessing the internet using Google Serper API. "
         "When using this tool, retrieve the most recent and accurate information. "
@@ -20,3 +46,9 @@ serper_tool = GoogleSerperResults(
 
 TOOLS = [serper_tool]
 
+# Serper answers for the same store/branch queries barely change during the day
+TOOL_CACHE = ToolResultCache(
+    ttl=float(os.getenv("TOOL_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "2048")),
+    upstream_latency=TOOL_CACHE_UPSTREAM.labels(),
+)
@@ -1,23 +1,75 @@
-from typing import AsyncIterator
-from starlette.websockets import WebSocket
-import webrtcvad
+import atexit
+import hashlib
+import logging
+import logging.handlers
+import queue
+from collections.abc import AsyncIterator
 
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, Response
+from starlette.websockets import WebSocket, WebSocketDisconnect
 
-async def websocket_stream(websocket: WebSocket) -> AsyncIterator[str]:
+_log_listener: logging.handlers.QueueListener | None = None
+
+
+def configure_logging(level: int | str = logging.INFO) -> None:
+    """
+    Route log records through a queue so the event loop never blocks on stdout.
+
+    Handlers attached to the root logger only enqueue; a background thread
+    formats and writes them.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _log_listener = logging.handlers.QueueListener(records, stream)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+
+
+async def websocket_stream(websocket: WebSocket) -> AsyncIterator[str | bytes]:
+    """
+    Yield browser messages as they arrive.
+
+    Text messages are JSON events and come out as `str`. Binary messages carry
+    raw PCM16 mic audio and come out as the `bytes` object starlette received.
+    """
     while True:
-        data = await websocket.receive_text()
-        yield data
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        data = message.get("bytes")
+        yield data if data is not None else message["text"]
+
+
+class CachedPage:
+    """
+    An HTML file read once and served from memory with an ETag.
 
-vad = webrtcvad.Vad(3)
+    Browsers revalidate with If-None-Match and get a 304 without a body.
+    """
 
-def is_speech(audio_bytes: bytes, sample_rate: int = 16000) -> bool:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._body: bytes | None = None
+        self._etag = ""
 
-    frame_duration = 0.02  # 20ms
-    frame_size = int(sample_rate * frame_duration) * 2  # 2 byte per sample
-    if len(audio_bytes) < frame_size:
-        return False
-    frame = audio_bytes[:frame_size]
-    if len(frame) != frame_size:
-        return False
-    return vad.is_speech(frame, sample_rate)
+    def _load(self) -> None:
+        with open(self.path, "rb") as f:
+            self._body = f.read()
+        self._etag = f'"{hashlib.sha1(self._body).hexdigest()[:20]}"'
 
+    def response(self, request: Request) -> Response:
+        if self._body is None:
+            self._load()
+        headers = {"ETag": self._etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == self._etag:
+            return Response(status_code=304, headers=headers)
+        return HTMLResponse(self._body, headers=headers)
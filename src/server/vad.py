@@ -0,0 +1,135 @@
+from collections import deque
+
+import numpy as np
+
+# sample rates and frame lengths webrtcvad accepts
+VAD_SAMPLE_RATES = (8000, 16000, 32000, 48000)
+VAD_FRAME_MS = (10, 20, 30)
+
+
+def preload_vad() -> None:
+    """
+    Import webrtcvad ahead of the first VADGate, e.g. from a worker thread.
+
+    It imports pkg_resources, which takes longer than the rest of the audio
+    path, so it is not loaded when this module is.
+    """
+    import webrtcvad  # noqa: F401
+
+
+def resample_frames(frames: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Resample a (n_frames, frame_len) int16 matrix along its last axis.
+
+    24 kHz -> 16 kHz, the browser's capture rate, is done by mapping every
+    3 samples onto 2 with reshapes only. Other ratios fall back to linear
+    interpolation over the whole matrix at once.
+    """
+    if src_rate == dst_rate:
+        return frames
+    n_frames, frame_len = frames.shape
+    if src_rate * 2 == dst_rate * 3 and frame_len % 3 == 0:
+        groups = frames.reshape(n_frames, -1, 3).astype(np.int32)
+        out = np.empty((n_frames, groups.shape[1], 2), dtype=np.int16)
+        out[..., 0] = groups[..., 0]
+        out[..., 1] = (groups[..., 1] + groups[..., 2]) >> 1
+        return out.reshape(n_frames, -1)
+    dst_len = frame_len * dst_rate // src_rate
+    positions = np.linspace(0, frame_len - 1, dst_len)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, frame_len - 1)
+    weight = positions - lower
+    out = frames[:, lower] * (1 - weight) + frames[:, upper] * weight
+    return out.astype(np.int16)
+
+
+class VADGate:
+    """
+    Per-session voice activity gate for 16-bit mono PCM.
+
+    Every complete frame of every chunk is classified. Speech frames are kept,
+    followed by `hangover_ms` of trailing audio so word endings are not cut,
+    and preceded by up to `preroll_ms` of the audio dropped just before them
+    so onsets are not clipped. Partial frames are carried over to the next
+    chunk.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 24000,
+        mode: int = 3,
+        frame_ms: int = 20,
+        hangover_ms: int = 300,
+        preroll_ms: int = 200,
+    ) -> None:
+        if frame_ms not in VAD_FRAME_MS:
+            raise ValueError(f"frame_ms must be one of {VAD_FRAME_MS}")
+        self.sample_rate = sample_rate
+        self.vad_rate = (
+            sample_rate
+            if sample_rate in VAD_SAMPLE_RATES
+            else min(VAD_SAMPLE_RATES, key=lambda rate: abs(rate - sample_rate))
+        )
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.hangover_frames = hangover_ms // frame_ms
+        self.frames_total = 0
+        self.frames_forwarded = 0
+        # whether the last classified chunk forwarded any audio
+        self.forwarding = False
+
+        import webrtcvad
+
+        self._vad = webrtcvad.Vad(mode)
+        self._pending = b""
+        self._hangover = 0
+        self._preroll: deque[bytes] = deque(maxlen=preroll_ms // frame_ms)
+
+    @property
+    def drop_ratio(self) -> float:
+        if not self.frames_total:
+            return 0.0
+        return 1 - self.frames_forwarded / self.frames_total
+
+    def classify(self, frames: np.ndarray) -> list[bool]:
+        """Run the VAD over a (n_frames, frame_len) matrix at the input rate."""
+        vad_frames = resample_frames(frames, self.sample_rate, self.vad_rate)
+        return [
+            self._vad.is_speech(frame.tobytes(), self.vad_rate) for frame in vad_frames
+        ]
+
+    def process(self, chunk: bytes) -> bytes:
+        """Return the part of `chunk` that should be forwarded, possibly empty."""
+        if self._pending:
+            chunk = self._pending + chunk
+        samples = np.frombuffer(chunk, dtype="<i2", count=len(chunk) // 2)
+        n_frames = len(samples) // self.frame_len
+        usable = n_frames * self.frame_len
+        self._pending = chunk[usable * 2 :]
+        if n_frames == 0:
+            return b""
+
+        frames = samples[:usable].reshape(n_frames, self.frame_len)
+        flags = self.classify(frames)
+
+        out: list[bytes] = []
+        kept = 0
+        for frame, speech in zip(frames, flags):
+            if speech:
+                self._hangover = self.hangover_frames
+            elif self._hangover > 0:
+                self._hangover -= 1
+            else:
+                self._preroll.append(frame.tobytes())
+                continue
+            if self._preroll:
+                out.extend(self._preroll)
+                self._preroll.clear()
+            out.append(frame.tobytes())
+            kept += 1
+
+        self.frames_total += n_frames
+        self.frames_forwarded += len(out)
+        self.forwarding = bool(out)
+        if kept == len(out) == n_frames:
+            # nothing dropped or prepended, hand back the input untouched
+            return chunk[: usable * 2]
+        return b"".join(out)
@@ -3,10 +3,10 @@ import subprocess
 import os
 import sys
 import time
-from app import brand_name
+from config import PORT, brand_name
 
 # Sabit değişkenler
-APP_PORT = 3000  # app.py'nin kullandığı port
+APP_PORT = PORT  # app.py'nin kullandığı port
 
 # Session state kontrolü
 if "process" not in st.session_state:
@@ -25,13 +25,9 @@ def start_server():
                 return False
 
         cmd = [sys.executable, app_path]
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            env=env
-        )
+        # Çıktı okunmayan bir PIPE'a yönlendirilirse tampon dolunca sunucu
+        # kilitlenir; bu yüzden Streamlit'in terminalini devralıyor.
+        process = subprocess.Popen(cmd, env=env)
         st.session_state.process = process
         return True
     except Exception as e:
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import socket
+
+import websockets
+
+from bench.admission import scrape
+from bench.fake_realtime import FakeRealtimeServer
+from bench.loadtest import start_app
+from server.serving import TRY_AGAIN_LATER
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def next_event(websocket, event_type: str) -> dict:
+    """The next control message of `event_type`, skipping the call's own events."""
+    async with asyncio.timeout(10):
+        while True:
+            message = await websocket.recv()
+            if isinstance(message, str) and json.loads(message)["type"] == event_type:
+                return json.loads(message)
+
+
+async def turned_away(websocket) -> dict:
+    rejection = await next_event(websocket, "session.rejected")
+    await websocket.wait_closed()
+    assert websocket.close_code == TRY_AGAIN_LATER
+    assert rejection["retry_after"] > 0
+    return rejection
+
+
+async def wait_for(port: int, sample: str, value: float) -> None:
+    async with asyncio.timeout(10):
+        while (await asyncio.to_thread(scrape, port)).get(sample) != value:
+            await asyncio.sleep(0.05)
+
+
+def test_calls_are_queued_admitted_or_turned_away():
+    port = free_port()
+
+    async def main() -> dict[str, float]:
+        async with FakeRealtimeServer() as upstream:
+            # one call at a time, one waiting for at most a second
+            process = start_app(
+                port,
+                upstream.url,
+                {
+                    "MAX_CALLS_PER_WORKER": "1",
+                    "MAX_WAITING_CALLS": "1",
+                    "CALL_WAIT_TIMEOUT": "1",
+                    "MAX_LOOP_LAG_MS": "0",
+                    "EVENT_LOG": "",
+                },
+            )
+            url = f"ws://127.0.0.1:{port}/ws"
+            try:
+                first = await websockets.connect(url)
+                await wait_for(port, "voice_calls_active", 1)
+
+                second = await websockets.connect(url)
+                assert (await next_event(second, "session.queued"))["position"] == 1
+
+                # the queue is full too
+                async with websockets.connect(url) as third:
+                    assert (await turned_away(third))["reason"] == "full"
+
+                # the slot of the first call goes to the waiting one
+                await first.close()
+                await next_event(second, "session.admitted")
+
+                async with websockets.connect(url) as fourth:
+                    await next_event(fourth, "session.queued")
+                    assert (await turned_away(fourth))["reason"] == "timeout"
+
+                await second.close()
+                await wait_for(port, "voice_calls_active", 0)
+                return await asyncio.to_thread(scrape, port)
+            finally:
+                process.terminate()
+                process.wait()
+
+    samples = asyncio.run(main())
+    assert samples["voice_calls_admitted_total"] == 2
+    assert samples["voice_calls_queued_total"] == 2
+    assert samples['voice_calls_rejected_total{reason="full"}'] == 1
+    assert samples['voice_calls_rejected_total{reason="timeout"}'] == 1
+    assert samples['voice_calls_rejected_total{reason="overloaded"}'] == 0
+    assert samples["voice_calls_waiting"] == 0
@@ -0,0 +1,84 @@
+import asyncio
+
+from bench.fake_realtime import FakeRealtimeServer, FakeScript
+from langchain_openai_voice import SINK_POLICIES, OpenAIVoiceReactAgent
+from langchain_openai_voice.utils import QueuedWriter
+
+FRAME_20MS = b"\x01\x00" * 480
+FRAMES = 25
+
+
+class _CallEnded(Exception):
+    pass
+
+
+def test_stalled_browser_does_not_hold_up_mic_audio():
+    browser_chunks = 0
+    appended = []
+
+    async def main() -> None:
+        # the model answers after the first 100 ms of mic audio
+        script = FakeScript(turn_audio_ms=100, response_delay_ms=0, speed=10)
+        async with FakeRealtimeServer(script) as upstream:
+
+            async def mic():
+                for _ in range(FRAMES):
+                    yield FRAME_20MS
+                    await asyncio.sleep(0.02)
+                try:
+                    async with asyncio.timeout(2):
+                        while upstream.stats.appended_bytes < FRAMES * len(FRAME_20MS):
+                            await asyncio.sleep(0.01)
+                finally:
+                    appended.append(upstream.stats.appended_bytes)
+                raise _CallEnded
+
+            async def stalled_browser(chunk: str | bytes) -> None:
+                nonlocal browser_chunks
+                browser_chunks += 1
+                # the browser socket never drains
+                await asyncio.Event().wait()
+
+            agent = OpenAIVoiceReactAgent(
+                model="fake", api_key="fake", url=upstream.url, vad_mode=None
+            )
+            try:
+                # before the fix the loop never got back from the stalled send
+                await asyncio.wait_for(
+                    agent.aconnect(mic(), stalled_browser, binary_audio=True), 5
+                )
+            except _CallEnded:
+                pass
+
+    asyncio.run(main())
+    assert browser_chunks == 1
+    assert appended == [FRAMES * len(FRAME_20MS)]
+
+
+def test_full_browser_sink_drops_old_audio_but_keeps_events():
+    sent = []
+
+    async def main() -> None:
+        release = asyncio.Event()
+
+        async def slow_browser(chunk: str | bytes) -> None:
+            await release.wait()
+            sent.append(chunk)
+
+        policy = SINK_POLICIES["browser_out"]
+        async with QueuedWriter("browser_out", slow_browser, policy) as writer:
+            await writer.write('{"type":"session.reconnected"}')
+            # the first write is taken by the sender, which then waits
+            await asyncio.sleep(0)
+            for n in range(policy.maxsize + 10):
+                await writer.write(n.to_bytes(2, "little"))
+            await writer.write('{"type":"input_audio_buffer.speech_started"}')
+            release.set()
+            while len(sent) < policy.maxsize + 1:
+                await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert sent[0] == '{"type":"session.reconnected"}'
+    assert sent[-1] == '{"type":"input_audio_buffer.speech_started"}'
+    # the oldest frames made room for the newest ones
+    assert sent[1] == (11).to_bytes(2, "little")
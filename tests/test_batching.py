@@ -0,0 +1,58 @@
+import asyncio
+
+from bench.fake_realtime import FakeRealtimeServer, FakeScript
+from langchain_openai_voice import OpenAIVoiceReactAgent
+from langchain_openai_voice.batching import MicBatcher
+
+FRAME_20MS = b"\x01\x00" * 480
+
+
+def test_batches_grow_up_to_max_ms():
+    batcher = MicBatcher(min_ms=40, max_ms=100)
+    # the first chunk after silence goes out at once
+    assert batcher.push(FRAME_20MS) == FRAME_20MS
+    assert batcher.push(FRAME_20MS) is None
+    assert len(batcher.push(FRAME_20MS)) == 2 * len(FRAME_20MS)
+    assert batcher.pending == 0
+    batcher.push(FRAME_20MS)
+    assert batcher.end() == FRAME_20MS
+    assert batcher.batches == 3
+
+
+class _CallEnded(Exception):
+    pass
+
+
+def test_partial_batch_is_sent_when_the_mic_goes_quiet():
+    appended_before_end = None
+
+    async def main() -> None:
+        nonlocal appended_before_end
+        async with FakeRealtimeServer(FakeScript(turn_audio_ms=10_000)) as upstream:
+
+            async def mic():
+                nonlocal appended_before_end
+                yield FRAME_20MS
+                yield FRAME_20MS
+                # muted: the second frame is left waiting for a fuller batch
+                await asyncio.sleep(0.4)
+                appended_before_end = upstream.stats.appended_bytes
+                raise _CallEnded
+
+            async def discard(chunk: str | bytes) -> None:
+                pass
+
+            agent = OpenAIVoiceReactAgent(
+                model="fake",
+                api_key="fake",
+                url=upstream.url,
+                vad_mode=None,
+                mic_batch_ms=(40, 100),
+            )
+            try:
+                await agent.aconnect(mic(), discard, binary_audio=True)
+            except _CallEnded:
+                pass
+
+    asyncio.run(main())
+    assert appended_before_end == 2 * len(FRAME_20MS)
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from langchain_openai_voice.cache import ToolResultCache, make_cache_key
+from langchain_openai_voice.metrics import LATENCY_BUCKETS, Histogram
+
+
+def test_entries_expire_after_ttl():
+    cache = ToolResultCache(ttl=0.05)
+    cache.put("a", "result")
+    assert cache.get("a") == "result"
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.size_bytes == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ToolResultCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_results_are_capped_by_size():
+    cache = ToolResultCache(max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.put("c", "cccc")
+    assert cache.get("a") is None
+    assert cache.size_bytes == 8
+    # a result larger than the whole cache is not kept at all
+    cache.put("d", "d" * 11)
+    assert cache.get("d") is None
+    assert cache.size_bytes == 8
+
+
+def test_concurrent_misses_call_upstream_once():
+    latency = Histogram(LATENCY_BUCKETS)
+    cache = ToolResultCache(upstream_latency=latency)
+    calls = 0
+
+    async def search() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main() -> list[str]:
+        key = make_cache_key("search", {"query": "Tesla  İzmir"})
+        results = await asyncio.gather(
+            *(cache.get_or_call(key, search) for _ in range(5))
+        )
+        # same arguments up to whitespace, now answered from the cache
+        again = make_cache_key("search", {"query": "Tesla İzmir"})
+        return results + [await cache.get_or_call(again, search)]
+
+    assert asyncio.run(main()) == ["result"] * 6
+    assert calls == 1
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 4, 1)
+    assert latency.count == 1
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import numpy as np
+
+from server.codecs import (
+    CODEC_ACCEPTED_EVENT,
+    CODEC_EVENT,
+    MULAW_ENCODE,
+    BrowserAudio,
+)
+
+PCM = (np.arange(480, dtype="<i2") * 50).tobytes()
+MULAW = MULAW_ENCODE[np.frombuffer(PCM, dtype="<i2")[::3].view(np.uint16)].tobytes()
+
+
+def run(browser_audio: BrowserAudio, messages: list) -> tuple[list, list]:
+    sent = []
+
+    async def stream():
+        for message in messages:
+            yield message
+
+    async def send_text(text: str) -> None:
+        sent.append(json.loads(text))
+
+    async def main() -> list:
+        return [m async for m in browser_audio.decoded(stream(), send_text)]
+
+    return asyncio.run(main()), sent
+
+
+def test_codec_from_the_query_decodes_the_first_frame():
+    browser_audio = BrowserAudio({"codec": "pcmu", "sample_rate": "8000"})
+    # sent before any frame is read
+    accepted = json.loads(browser_audio.accepted_event())
+    assert (accepted["type"], accepted["codec"]) == (CODEC_ACCEPTED_EVENT, "pcmu")
+
+    decoded, sent = run(browser_audio, [MULAW, MULAW])
+    assert sent == []
+    assert [len(frame) for frame in decoded] == [len(PCM)] * 2
+
+
+def test_frames_after_the_codec_event_are_decoded_with_it():
+    request = json.dumps({"type": CODEC_EVENT, "codec": "pcmu", "sample_rate": 8000})
+    decoded, sent = run(BrowserAudio(), [request, MULAW])
+    assert [event["codec"] for event in sent] == ["pcmu"]
+    assert len(decoded) == 1 and len(decoded[0]) == len(PCM)
+
+
+def test_frames_without_a_codec_request_stay_pcm16():
+    update = json.dumps({"type": "session.update"})
+    decoded, sent = run(BrowserAudio(), [PCM, update, PCM])
+    assert sent == []
+    assert decoded == [PCM, update, PCM]
+
+
+def test_codec_event_after_audio_does_not_switch_the_codec():
+    request = json.dumps({"type": CODEC_EVENT, "codec": "pcmu", "sample_rate": 8000})
+    decoded, sent = run(BrowserAudio(), [PCM, request, PCM])
+    assert sent == []
+    assert decoded == [PCM, request, PCM]
@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+from bench.fake_realtime import FakeRealtimeServer
+from langchain_openai_voice.pool import RealtimeConnectionPool
+
+UPDATE = json.dumps({"type": "session.update", "session": {"voice": "alloy"}})
+
+
+def spec(upstream: FakeRealtimeServer, **overrides) -> dict:
+    return {
+        "api_key": "fake",
+        "model": "model-a",
+        "url": upstream.url,
+        "update_event": UPDATE,
+        **overrides,
+    }
+
+
+async def wait_until(condition, timeout: float = 5.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+def run_pool(test, **pool_options) -> None:
+    async def main() -> None:
+        async with FakeRealtimeServer() as upstream:
+            pool = RealtimeConnectionPool(**pool_options)
+            try:
+                await test(pool, upstream)
+            finally:
+                await pool.aclose()
+
+    asyncio.run(main())
+
+
+def test_checkout_takes_a_configured_connection_and_refills():
+    async def test(pool, upstream):
+        await pool.prewarm(**spec(upstream))
+        assert pool.idle_count() == 1
+        assert upstream.stats.event_types["session.update"] == 1
+
+        websocket = await pool.acquire(**spec(upstream))
+        assert (pool.hits, pool.misses) == (1, 0)
+        assert websocket.open
+        # handed over as is, not connected or configured again
+        assert upstream.stats.sessions == 1
+
+        await wait_until(lambda: pool.idle_count() == 1)
+        assert upstream.stats.sessions == 2
+        assert upstream.stats.event_types["session.update"] == 2
+        await websocket.close()
+
+    run_pool(test, size=1)
+
+
+def test_connection_past_max_age_is_not_handed_out():
+    async def test(pool, upstream):
+        await pool.prewarm(**spec(upstream))
+        stale = pool._idle[next(iter(pool._idle))][0][1]
+        await asyncio.sleep(0.3)
+
+        websocket = await pool.acquire(**spec(upstream))
+        assert websocket is not stale
+        assert (pool.hits, pool.misses) == (0, 1)
+        await wait_until(lambda: stale.closed)
+        await websocket.close()
+
+    run_pool(test, size=1, max_age=0.2)
+
+
+def test_connection_failing_its_ping_is_replaced():
+    async def test(pool, upstream):
+        await pool.prewarm(**spec(upstream))
+        idle = pool._idle[next(iter(pool._idle))]
+        unresponsive = idle[0][1]
+        # the upstream stops reading, so the ping is never answered
+        (session,) = upstream._sessions
+        session.websocket.transport.pause_reading()
+
+        await wait_until(lambda: idle and idle[0][1] is not unresponsive)
+        assert upstream.stats.sessions == 2
+        # let the dropped connection finish its close handshake
+        session.websocket.transport.resume_reading()
+        await wait_until(lambda: unresponsive.closed)
+
+    run_pool(test, size=1, ping_interval=0.2)
+
+
+def test_connection_is_only_reused_for_the_same_configuration():
+    async def test(pool, upstream):
+        async with FakeRealtimeServer() as other_upstream:
+            await pool.prewarm(**spec(upstream))
+            other_update = json.dumps(
+                {"type": "session.update", "session": {"voice": "echo"}}
+            )
+            for overrides in (
+                {"model": "model-b"},
+                {"url": other_upstream.url},
+                {"update_event": other_update},
+                {"api_key": "other"},
+            ):
+                websocket = await pool.acquire(**spec(upstream, **overrides))
+                await websocket.close()
+            assert (pool.hits, pool.misses) == (0, 4)
+
+            websocket = await pool.acquire(**spec(upstream))
+            assert (pool.hits, pool.misses) == (1, 4)
+            await websocket.close()
+
+    run_pool(test, size=1)
+
+
+def test_connections_keep_the_callers_keepalive():
+    async def test(pool, upstream):
+        keepalive = {"ping_interval": 5.0, "ping_timeout": 5.0}
+        await pool.prewarm(**spec(upstream, **keepalive))
+        warm = await pool.acquire(**spec(upstream, **keepalive))
+        # a different keepalive does not share the warm group
+        cold = await pool.acquire(**spec(upstream))
+        assert (pool.hits, pool.misses) == (1, 1)
+        assert (warm.ping_interval, warm.ping_timeout) == (5.0, 5.0)
+        assert (cold.ping_interval, cold.ping_timeout) == (20.0, 20.0)
+        await warm.close()
+        await cold.close()
+
+    run_pool(test, size=1)
@@ -0,0 +1,131 @@
+import asyncio
+import base64
+import json
+
+from bench.fake_realtime import FakeRealtimeServer, FakeScript
+from langchain_openai_voice import OpenAIVoiceReactAgent
+from langchain_openai_voice.pool import open_realtime_websocket
+from langchain_openai_voice.reconnect import (
+    RECONNECTED_EVENT,
+    ReconnectPolicy,
+    UpstreamLink,
+)
+
+UPDATE = json.dumps({"type": "session.update", "session": {"voice": "alloy"}})
+# answers every 100 ms of mic audio at once, drops every connection after 400 ms
+SCRIPT = FakeScript(
+    turn_audio_ms=100,
+    response_delay_ms=0,
+    response_audio_ms=100,
+    speed=100,
+    kill_after_ms=400,
+)
+
+
+def append(pcm: bytes) -> dict:
+    return {"type": "input_audio_buffer.append", "audio": base64.b64encode(pcm).decode()}
+
+
+async def wait_until(condition, timeout: float = 5.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+def test_link_replays_the_session_and_flushes_held_audio():
+    received = []
+    held = append(b"\x07\x00" * 240)
+
+    async def main() -> None:
+        async with FakeRealtimeServer(SCRIPT, on_event=received.append) as upstream:
+            opened = 0
+            resume = asyncio.Event()
+
+            async def open_websocket():
+                nonlocal opened
+                opened += 1
+                if opened > 1:
+                    # keep the link reconnecting until the test sent audio
+                    await resume.wait()
+                websocket = await open_realtime_websocket(
+                    api_key="fake", model="fake", url=upstream.url
+                )
+                await websocket.send(UPDATE)
+                return websocket
+
+            link = UpstreamLink(
+                await open_websocket(), open_websocket, policy=ReconnectPolicy()
+            )
+            events = []
+
+            async def collect() -> None:
+                async for event in link.events():
+                    events.append(event)
+
+            collector = asyncio.create_task(collect())
+            try:
+                # one user turn and its answer make up the history
+                await link.send(append(b"\x00\x00" * 2400))
+                await wait_until(lambda: len(link.history.items) == 2)
+
+                await wait_until(lambda: link._reconnecting)
+                await link.send(held)
+                resume.set()
+                await wait_until(
+                    lambda: any(e.get("type") == RECONNECTED_EVENT for e in events)
+                )
+                # sent before the event, but the upstream may not have read it yet
+                await wait_until(lambda: held in received)
+            finally:
+                collector.cancel()
+                await link.aclose()
+
+        assert upstream.stats.kills >= 1
+        (reconnected,) = [e for e in events if e.get("type") == RECONNECTED_EVENT]
+        assert reconnected["replayed_items"] == 2
+        assert reconnected["recovery_ms"] > 0
+
+        # the new session gets the config, then the history, then the held audio
+        second = [i for i, e in enumerate(received) if e["type"] == "session.update"][1]
+        replayed = [e["type"] for e in received[second + 1 : second + 4]]
+        assert replayed == ["conversation.item.create"] * 2 + [held["type"]]
+        assert received[second + 1]["item"]["role"] == "user"
+        assert received[second + 3] == held
+
+    asyncio.run(main())
+
+
+class _CallEnded(Exception):
+    pass
+
+
+def test_browser_is_told_about_the_reconnect():
+    sent_to_browser = []
+
+    async def mic():
+        for _ in range(30):
+            yield b"\x00\x00" * 2400
+            await asyncio.sleep(0.05)
+        raise _CallEnded
+
+    async def send_browser(chunk: str | bytes) -> None:
+        sent_to_browser.append(chunk)
+
+    async def main() -> None:
+        async with FakeRealtimeServer(SCRIPT) as upstream:
+            agent = OpenAIVoiceReactAgent(
+                model="fake", api_key="fake", url=upstream.url, vad_mode=None
+            )
+            try:
+                await agent.aconnect(mic(), send_browser, binary_audio=True)
+            except _CallEnded:
+                pass
+
+    asyncio.run(main())
+    reconnects = [
+        json.loads(chunk)
+        for chunk in sent_to_browser
+        if isinstance(chunk, str) and RECONNECTED_EVENT in chunk
+    ]
+    assert reconnects
+    assert all(event["recovery_ms"] > 0 for event in reconnects)
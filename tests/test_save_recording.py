@@ -0,0 +1,61 @@
+import asyncio
+import os
+import time
+import wave
+
+from server import save_recording
+from server.save_recording import RecordingJob
+
+
+def write_wav(path) -> None:
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(save_recording.TARGET_CHANNELS)
+        wav.setsampwidth(2)
+        wav.setframerate(save_recording.TARGET_SAMPLE_RATE)
+        wav.writeframes(b"\0" * 4800)
+
+
+def test_worker_survives_a_failed_status_write(tmp_path, monkeypatch):
+    def disk_full(job: RecordingJob) -> None:
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(save_recording, "RECORDINGS_DIR", str(tmp_path))
+    monkeypatch.setattr(save_recording, "_persist", disk_full)
+    jobs = []
+    for n in range(2):
+        write_wav(tmp_path / f"upload_{n}.wav")
+        jobs.append(
+            RecordingJob(
+                id=str(n),
+                upload_path=str(tmp_path / f"upload_{n}.wav"),
+                save_path=str(tmp_path / f"call_{n}.wav"),
+            )
+        )
+
+    async def main() -> None:
+        queue = asyncio.Queue()
+        worker = asyncio.create_task(save_recording._worker(queue))
+        for job in jobs:
+            queue.put_nowait(job)
+        await asyncio.wait_for(queue.join(), 5)
+        assert not worker.done()
+        worker.cancel()
+
+    asyncio.run(main())
+    # the recordings were saved, only their status files are missing
+    assert [job.status for job in jobs] == ["done", "done"]
+    assert all("iş durumu diske yazılamadı" in job.message for job in jobs)
+    assert all((tmp_path / f"call_{n}.wav").exists() for n in range(2))
+
+
+def test_old_status_files_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(save_recording, "JOBS_DIR", str(tmp_path))
+    old, recent = tmp_path / "old.json", tmp_path / "recent.json"
+    for path in (old, recent):
+        path.write_text("{}")
+    stale = time.time() - save_recording.JOB_STATUS_TTL - 60
+    os.utime(old, (stale, stale))
+
+    save_recording._prune_status_files(time.time())
+    assert not old.exists()
+    assert recent.exists()
@@ -0,0 +1,41 @@
+from langchain_core.tools import StructuredTool
+
+from langchain_openai_voice.session import SessionTemplateRegistry
+
+
+def make_tool(description: str = "Look something up.") -> StructuredTool:
+    async def lookup(query: str) -> str:
+        return query
+
+    return StructuredTool.from_function(
+        coroutine=lookup, name="lookup", description=description
+    )
+
+
+def test_templates_are_shared_by_equal_definitions():
+    registry = SessionTemplateRegistry()
+    tool, same, changed = make_tool(), make_tool(), make_tool("Search the web.")
+    template = registry.get(model="m", instructions="hi", tools=[tool])
+
+    again = registry.get(model="m", instructions="hi", tools=[same])
+    assert again.update_event is template.update_event
+    # calls go to the tool object of the caller
+    assert again.tools_by_name["lookup"] is same
+
+    other = registry.get(model="m", instructions="hi", tools=[changed])
+    assert other.update_event != template.update_event
+    assert len(registry) == 2
+
+
+def test_least_recently_used_template_is_evicted():
+    registry = SessionTemplateRegistry(maxsize=2)
+    tools = [make_tool()]
+    first = registry.get(model="m", instructions="a", tools=tools)
+    second = registry.get(model="m", instructions="b", tools=tools)
+    assert registry.get(model="m", instructions="a", tools=tools) is first
+    registry.get(model="m", instructions="c", tools=tools)
+
+    assert len(registry) == 2
+    assert registry.get(model="m", instructions="a", tools=tools) is first
+    # "b" was the least recently used one and is built again
+    assert registry.get(model="m", instructions="b", tools=tools) is not second
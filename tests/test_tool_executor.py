@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from langchain_core.tools import StructuredTool
+
+import langchain_openai_voice
+from langchain_openai_voice import VoiceToolExecutor
+
+
+async def lookup(query: str) -> str:
+    """Look something up."""
+    await asyncio.sleep(0.01)
+    return f"result for {query}"
+
+
+LOOKUP = StructuredTool.from_function(coroutine=lookup, name="lookup")
+
+
+async def answer(executor: VoiceToolExecutor, count: int) -> list[dict]:
+    """Collect the outputs of `count` calls, up to the response.create."""
+    outputs = []
+    async for event in executor.output_iterator():
+        if event["type"] == "response.create":
+            return outputs
+        outputs.append(event["item"])
+        assert len(outputs) <= count
+
+
+async def call_twice() -> list[dict]:
+    executor = VoiceToolExecutor(tools_by_name={"lookup": LOOKUP})
+    for n in range(2):
+        await executor.add_tool_call(
+            {"call_id": f"call_{n}", "name": "lookup", "arguments": '{"query": "q"}'}
+        )
+    executor.response_done()
+    return await asyncio.wait_for(answer(executor, 2), 5)
+
+
+def test_process_limit_works_across_event_loops(monkeypatch):
+    # with a limit of one the second call waits, binding the semaphore to the loop
+    monkeypatch.setattr(langchain_openai_voice, "TOOL_PROCESS_CONCURRENCY", 1)
+    for _ in range(2):
+        outputs = asyncio.run(call_twice())
+        assert [json.loads(item["output"]) for item in outputs] == ["result for q"] * 2
+
+
+async def search(query: str, brand: str | None = None) -> str:
+    """Search the catalogue."""
+    await asyncio.sleep(0.01)
+    return f"{query} in {brand}"
+
+
+SEARCH = StructuredTool.from_function(coroutine=search, name="search")
+
+
+async def stream_call(deltas: list[str], final_arguments: str) -> tuple[dict, int]:
+    """Stream a search call like the model does; the output and the discards."""
+    executor = VoiceToolExecutor(
+        tools_by_name={"search": SEARCH}, speculative_tools=frozenset({"search"})
+    )
+    executor.tool_call_started({"call_id": "call_0", "name": "search"})
+    for delta in deltas:
+        executor.add_arguments_delta({"call_id": "call_0", "delta": delta})
+    assert "call_0" in executor._speculations
+    await executor.add_tool_call(
+        {"call_id": "call_0", "name": "search", "arguments": final_arguments}
+    )
+    executor.response_done()
+    (item,) = await asyncio.wait_for(answer(executor, 1), 5)
+    return json.loads(item["output"]), executor._wasted
+
+
+def test_speculation_is_confirmed_by_the_same_arguments():
+    # the required field completes first, the missing brand is its default
+    output, wasted = asyncio.run(
+        stream_call(['{"query": "tyres"', ', "brand"'], '{"query": "tyres"}')
+    )
+    assert (output, wasted) == ("tyres in None", 0)
+
+
+def test_speculation_is_discarded_when_final_arguments_drop_a_field():
+    output, wasted = asyncio.run(
+        stream_call(['{"brand": "Tesla", ', '"query": "tyres",'], '{"query": "tyres"}')
+    )
+    assert (output, wasted) == ("tyres in None", 1)
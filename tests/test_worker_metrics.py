@@ -0,0 +1,32 @@
+import asyncio
+import json
+import os
+
+from langchain_openai_voice.metrics import MetricsRegistry
+from server.serving import WorkerMetrics
+
+
+def test_scrape_merges_every_live_worker(tmp_path):
+    registry = MetricsRegistry()
+    calls = registry.counter("voice_calls_total", "Calls.")
+    calls.labels(brand="Tesla").inc(3)
+    registry.gauge("voice_calls_active", "Calls in progress.", lambda: 1)
+
+    # another live worker, and one that exited without removing its file
+    other = MetricsRegistry()
+    other.counter("voice_calls_total", "Calls.").labels(brand="Tesla").inc(5)
+    other_pid = str(os.getppid())
+    (tmp_path / f"{other_pid}.json").write_text(
+        json.dumps(other.snapshot(worker=other_pid))
+    )
+    (tmp_path / "999999999.json").write_text(json.dumps(other.snapshot(worker="x")))
+
+    text = asyncio.run(WorkerMetrics(registry, str(tmp_path)).render())
+    lines = text.splitlines()
+    pid = str(os.getpid())
+    assert lines.count("# TYPE voice_calls_total counter") == 1
+    assert f'voice_calls_total{{worker="{pid}",brand="Tesla"}} 3.0' in lines
+    assert f'voice_calls_total{{worker="{other_pid}",brand="Tesla"}} 5.0' in lines
+    assert f'voice_calls_active{{worker="{pid}"}} 1' in lines
+    assert 'worker="x"' not in text
+    assert not (tmp_path / "999999999.json").exists()